@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Пакетная загрузка карточек товаров из card.wb.ru.
+
+Эндпоинт cards/v2/detail принимает несколько артикулов через ";" в параметре nm.
+Запросы, пришедшие в течение короткого окна, собираются в один HTTP-запрос,
+а найденные товары раздаются ожидающим вызовам. Ответ 200 без артикула означает,
+что товара нет; ошибка API завершает вызовы исключением. Пачки проходят через предохранитель
+эндпоинта (circuit_breaker): пока он отключен, запросы завершаются ошибкой без обращения к API.
+"""
+
+import time
+import asyncio
+import logging
+from urllib.parse import urlencode
+from typing import Any, Dict, List, Optional, Set
+
+from http_client import get_http_client
+from circuit_breaker import CircuitOpenError, breakers, is_failure_status
+
+logger = logging.getLogger(__name__)
+
+CARD_DETAIL_URL = "https://card.wb.ru/cards/v2/detail"
+CARD_DETAIL_PARAMS = {
+    "appType": "1",
+    "curr": "rub",
+    "dest": "-6972066",
+    "hide_dtype": "13",
+    "spp": "30",
+    "ab_testing": "false",
+    "lang": "ru",
+}
+
+class CardApiError(ConnectionError):
+    """card.wb.ru ответил ошибкой: по ответу нельзя судить, есть ли товар"""
+
+
+BATCH_WINDOW = 0.03  # Время ожидания других запросов перед отправкой пачки в секундах
+MAX_BATCH_SIZE = 20  # Максимальное количество артикулов в одном запросе
+
+
+class CardBatcher:
+    """
+    Собирает запросы карточек в пачки.
+
+    Пачка отправляется, когда истекло окно ожидания или набралось max_batch_size
+    артикулов. Один и тот же артикул в пачке запрашивается один раз.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW, max_batch_size: int = MAX_BATCH_SIZE,
+                 timeout: float = 15):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        # {артикул: [future, ...]} для текущей собираемой пачки
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Задачи отправленных пачек: event loop хранит только слабые ссылки на задачи
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0  # Количество отправленных запросов
+        self.articles = 0  # Количество запрошенных артикулов
+
+    async def get(self, article: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает карточку товара из ответа card.wb.ru
+
+        Args:
+            article: Артикул товара
+
+        Returns:
+            Optional[Dict[str, Any]]: Объект товара из data.products или None,
+                если успешный ответ не содержит этого артикула
+
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: При сетевой ошибке запроса пачки
+            CardApiError: Если API ответил статусом, отличным от 200
+            CircuitOpenError: Если эндпоинт отключен предохранителем
+        """
+        article = str(article)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(article, []).append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Отправляет собранную пачку и начинает новую"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._fetch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: Dict[str, List[asyncio.Future]]) -> None:
+        """Запрашивает карточки пачки одним запросом и раздает результаты"""
+        self.batches += 1
+        self.articles += len(batch)
+        nm = ";".join(batch)
+        # Разделитель ";" передается как есть, без процентного кодирования
+        url = f"{CARD_DETAIL_URL}?{urlencode(CARD_DETAIL_PARAMS)}&nm={nm}"
+        products: Dict[str, Dict[str, Any]] = {}
+        error: Optional[BaseException] = None
+
+        if not breakers.allow(url):
+            error = CircuitOpenError(f"Эндпоинт {CARD_DETAIL_URL} отключен предохранителем")
+        else:
+            started = time.monotonic()
+            try:
+                logger.info(f"Пакетный запрос карточек: {len(batch)} арт.")
+                response = await get_http_client().get(url, timeout=self.timeout)
+                if response.status == 200:
+                    data = response.json()
+                    for product in (data.get("data") or {}).get("products") or []:
+                        products[str(product.get("id"))] = product
+                else:
+                    logger.error(f"Ошибка API: статус {response.status} для артикулов {nm}")
+                    error = CardApiError(f"{CARD_DETAIL_URL} вернул статус {response.status}")
+                breakers.record(url, not is_failure_status(response.status), time.monotonic() - started)
+            except Exception as e:
+                breakers.record(url, False)
+                error = e
+
+        for article, futures in batch.items():
+            for future in futures:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(products.get(article))
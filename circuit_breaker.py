@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Предохранители (circuit breakers) для эндпоинтов Wildberries.
+
+Для каждого шаблона эндпоинта (хост и путь без артикула) хранится окно последних
+результатов. Если доля ошибок превышает порог, эндпоинт "размыкается" и пропускается
+без запроса; по истечении паузы пропускается один пробный запрос (half-open).
+Живые эндпоинты упорядочиваются по доле успешных ответов и задержке.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from hedging import endpoint_key
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+WINDOW_SIZE = 20  # Сколько последних результатов учитывать
+MIN_CALLS = 5  # Минимум результатов в окне для размыкания
+FAILURE_RATE_THRESHOLD = 0.5  # Доля ошибок, при которой предохранитель размыкается
+OPEN_TIMEOUT = 30.0  # Пауза перед пробным запросом в секундах
+MAX_OPEN_TIMEOUT = 300.0  # Максимальная пауза при повторных неудачных пробах
+PROBE_TIMEOUT = 30.0  # Через сколько секунд неответивший пробный запрос считается потерянным
+LATENCY_ALPHA = 0.3  # Коэффициент сглаживания задержки
+
+
+class CircuitOpenError(ConnectionError):
+    """Запрос не отправлялся: эндпоинт отключен предохранителем"""
+
+
+def is_failure_status(status: int) -> bool:
+    """
+    Определяет, говорит ли HTTP статус о неисправности эндпоинта
+
+    404 означает, что товара нет, а не что эндпоинт недоступен.
+
+    Args:
+        status: HTTP статус ответа
+
+    Returns:
+        bool: True для 403, 429 и 5xx
+    """
+    return status in (403, 429) or status >= 500
+
+
+class CircuitBreaker:
+    """Предохранитель одного эндпоинта"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.state = CLOSED
+        self.results: Deque[bool] = deque(maxlen=WINDOW_SIZE)
+        self.latency: Optional[float] = None
+        self.open_timeout = OPEN_TIMEOUT
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+
+    @property
+    def success_rate(self) -> float:
+        """Доля успешных ответов в окне (1.0, если данных нет)"""
+        if not self.results:
+            return 1.0
+        return sum(self.results) / len(self.results)
+
+    def allow(self, now: float) -> bool:
+        """Разрешает ли предохранитель запрос прямо сейчас"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if now - self.opened_at < self.open_timeout:
+                return False
+            self.state = HALF_OPEN
+            self.probe_started_at = now
+            logger.info(f"Эндпоинт {self.key}: пробный запрос после паузы {self.open_timeout:.0f} с")
+            return True
+        # HALF_OPEN: одновременно допускается только один пробный запрос
+        if self.probe_started_at is None or now - self.probe_started_at >= PROBE_TIMEOUT:
+            self.probe_started_at = now
+            return True
+        return False
+
+    def record(self, success: bool, latency: Optional[float], now: float) -> None:
+        """Учитывает результат запроса"""
+        if latency is not None:
+            self.latency = latency if self.latency is None else (
+                LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency
+            )
+
+        if self.state == HALF_OPEN:
+            self.probe_started_at = None
+            if success:
+                self.state = CLOSED
+                self.results.clear()
+                self.open_timeout = OPEN_TIMEOUT
+                logger.info(f"Эндпоинт {self.key} снова доступен")
+            else:
+                self._open(now, min(MAX_OPEN_TIMEOUT, self.open_timeout * 2))
+            return
+
+        self.results.append(success)
+        if (self.state == CLOSED and len(self.results) >= MIN_CALLS
+                and 1 - self.success_rate >= FAILURE_RATE_THRESHOLD):
+            self._open(now, OPEN_TIMEOUT)
+
+    def _open(self, now: float, timeout: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.open_timeout = timeout
+        logger.warning(f"Эндпоинт {self.key} отключен на {timeout:.0f} с "
+                       f"(успешных ответов: {self.success_rate:.0%})")
+
+
+class BreakerRegistry:
+    """Реестр предохранителей по шаблонам эндпоинтов"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, url: str) -> CircuitBreaker:
+        key = endpoint_key(url)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(key)
+        return breaker
+
+    def allow(self, url: str) -> bool:
+        """
+        Проверяет, можно ли отправить запрос к эндпоинту
+
+        Args:
+            url: URL запроса
+
+        Returns:
+            bool: False, если эндпоинт отключен
+        """
+        with self._lock:
+            return self._get(url).allow(time.monotonic())
+
+    def record(self, url: str, success: bool, latency: Optional[float] = None) -> None:
+        """
+        Учитывает результат запроса к эндпоинту
+
+        Args:
+            url: URL запроса
+            success: Ответил ли эндпоинт исправно (см. is_failure_status)
+            latency: Длительность запроса в секундах
+        """
+        with self._lock:
+            self._get(url).record(success, latency, time.monotonic())
+
+    def rank(self, urls: Sequence[str]) -> List[str]:
+        """
+        Убирает отключенные эндпоинты и упорядочивает остальные
+
+        Сначала идут эндпоинты с большей долей успешных ответов, при равной
+        доле - с меньшей задержкой; при отсутствии статистики порядок сохраняется.
+
+        Args:
+            urls: URL в порядке приоритета по умолчанию
+
+        Returns:
+            List[str]: URL, к которым стоит обращаться, в порядке обращения
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for index, url in enumerate(urls):
+                breaker = self._get(url)
+                if breaker.state == OPEN and now - breaker.opened_at < breaker.open_timeout:
+                    continue
+                candidates.append((
+                    -round(breaker.success_rate, 1),
+                    breaker.latency if breaker.latency is not None else 0.0,
+                    index,
+                    url
+                ))
+        skipped = len(urls) - len(candidates)
+        if skipped:
+            logger.debug(f"Пропущено отключенных эндпоинтов: {skipped}")
+        return [url for *_, url in sorted(candidates)]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает состояние, долю успешных ответов и задержку по эндпоинтам"""
+        with self._lock:
+            return {
+                key: {
+                    "state": breaker.state,
+                    "success_rate": round(breaker.success_rate, 3),
+                    "latency": round(breaker.latency, 3) if breaker.latency is not None else None,
+                }
+                for key, breaker in self._breakers.items()
+            }
+
+
+# Реестр, общий для всего процесса
+breakers = BreakerRegistry()
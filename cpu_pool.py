@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Пул процессов для CPU-ёмкой работы (разбор HTML, оценка релевантности).
+
+Такая работа в event loop или в пуле потоков блокирует обработку сообщений
+других пользователей (GIL), поэтому она выполняется в отдельных процессах.
+Очередь ограничена: при переполнении вызывающий код ждет освобождения места.
+Функции и аргументы должны сериализоваться pickle: передаются функции уровня
+модуля, на вход - сырые данные (bytes, простые списки), на выход - компактные записи.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "0")) or max(1, min(4, (os.cpu_count() or 2) - 1))
+CPU_QUEUE_PER_WORKER = 4  # Сколько задач может ждать на один процесс
+# Способ запуска процессов: fork копирует процесс бота вместе с потоками и их блокировками
+# (логирование, пулы соединений), поэтому процессы запускаются через forkserver
+CPU_START_METHOD = os.getenv("CPU_START_METHOD", "forkserver")
+
+
+def _warm_up() -> None:
+    """Загружает модули и прогревает парсер в процессе пула"""
+    import html_extractor
+    import relevance  # Загружает NumPy до первой задачи
+    html_extractor.extract_product_page("<html><head><title>warm-up</title></head><body><h1>warm-up</h1>"
+                                        + " " * 100 + "</body></html>")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    """Возвращает контекст multiprocessing для CPU_START_METHOD (spawn, если метод недоступен)"""
+    method = CPU_START_METHOD
+    if method not in multiprocessing.get_all_start_methods():
+        method = "spawn"
+    return multiprocessing.get_context(method)
+
+
+class CpuPool:
+    """
+    Пул процессов с ограниченной очередью.
+
+    До start() и после stop() задачи выполняются в вызывающем потоке, поэтому
+    модули, использующие пул, работают и вне бота (например, из командной строки).
+    """
+
+    def __init__(self, workers: int = CPU_WORKERS, max_pending: Optional[int] = None):
+        self.workers = workers
+        self.max_pending = max_pending or workers * CPU_QUEUE_PER_WORKER
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._sync_slots = threading.BoundedSemaphore(self.max_pending)
+        self._restart_lock = threading.Lock()
+        self.completed = 0  # Задач выполнено в процессах пула
+        self.inline = 0  # Задач выполнено в вызывающем потоке
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    async def start(self) -> None:
+        """Запускает процессы и дожидается их прогрева"""
+        if self._executor is not None:
+            return
+        self._executor = self._new_executor()
+        self._async_slots = asyncio.Semaphore(self.max_pending)
+        loop = asyncio.get_running_loop()
+        try:
+            pids = await asyncio.gather(*(loop.run_in_executor(self._executor, _ping)
+                                          for _ in range(self.workers)))
+            logger.info(f"Пул процессов запущен: {len(set(pids))} из {self.workers} процессов, "
+                        f"очередь до {self.max_pending} задач")
+        except Exception as e:
+            logger.error(f"Не удалось запустить пул процессов, задачи будут выполняться в потоках: {e}")
+            self._shutdown()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up, mp_context=_mp_context())
+
+    async def stop(self) -> None:
+        """Останавливает процессы пула"""
+        self._shutdown()
+
+    def _shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет функцию в процессе пула, не блокируя event loop
+
+        Args:
+            func: Функция уровня модуля
+            *args: Аргументы (сериализуемые pickle)
+
+        Returns:
+            Any: Результат функции
+        """
+        if self._executor is None:
+            # Пул не запущен: выполняем в потоке, чтобы не блокировать event loop
+            self.inline += 1
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        async with self._async_slots:
+            return await self._submit(asyncio.get_running_loop(), func, args)
+
+    async def _submit(self, loop: asyncio.AbstractEventLoop, func: Callable[..., Any], args: tuple) -> Any:
+        executor = self._executor
+        try:
+            result = await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool as e:
+            logger.error(f"Пул процессов неисправен ({e}), перезапускаю")
+            self._restart(executor)
+            self.inline += 1
+            return await loop.run_in_executor(None, func, *args)
+        self.completed += 1
+        return result
+
+    def run_sync(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет функцию в процессе пула из синхронного кода (в потоке)
+
+        Args:
+            func: Функция уровня модуля
+            *args: Аргументы (сериализуемые pickle)
+
+        Returns:
+            Any: Результат функции
+        """
+        executor = self._executor
+        if executor is None:
+            self.inline += 1
+            return func(*args)
+        with self._sync_slots:
+            try:
+                result = executor.submit(func, *args).result()
+            except BrokenProcessPool as e:
+                logger.error(f"Пул процессов неисправен ({e}), перезапускаю")
+                self._restart(executor)
+                self.inline += 1
+                return func(*args)
+        self.completed += 1
+        return result
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """
+        Заменяет неисправный пул новым (процесс мог быть убит, например, по памяти)
+
+        Все задачи сломанного пула получают BrokenProcessPool одновременно, из event loop
+        и из потоков; пул заменяется один раз - только если он все еще текущий.
+
+        Args:
+            broken: Пул, в котором задача завершилась с BrokenProcessPool
+        """
+        with self._restart_lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Возвращает размер пула и количество выполненных задач"""
+        return {
+            "workers": self.workers if self.running else 0,
+            "completed": self.completed,
+            "inline": self.inline,
+        }
+
+
+# Пул, общий для всего процесса бота
+cpu_pool = CpuPool()
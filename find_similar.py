@@ -11,11 +11,41 @@ import re
 from typing import List, Dict, Any, Optional
 import asyncio
 
+import aiohttp
+
+from http_client import request_sync, get_http_client, close_http_client
+from single_flight import SingleFlight
+from cpu_pool import cpu_pool
+from product import Product
+from circuit_breaker import breakers, is_failure_status
+from relevance import compact_products, score_products, source_features
+
 # Настраиваем логирование
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("find_similar")
 
-def get_product_details(article: str) -> Optional[Dict[str, Any]]:
+DETAILS_URL = "https://card.wb.ru/cards/detail?spp=30&regions=68,83,4,38,80,33,70,82,86,30,69,22,66,31,40,1,48&dest=-1257786&nm={article}"
+SEARCH_URL = "https://search.wb.ru/exactmatch/ru/common/v4/search"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept": "application/json",
+    "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Origin": "https://www.wildberries.ru",
+    "Referer": "https://www.wildberries.ru/",
+}
+SEARCH_TIMEOUT = 10  # Таймаут одного поискового запроса в секундах
+
+def _product_from_details(data: Dict[str, Any], article: str) -> Optional[Product]:
+    """Возвращает товар из ответа cards/detail или None, если товара в ответе нет"""
+    # Проверяем наличие данных о товаре
+    if 'data' in data and 'products' in data['data'] and data['data']['products']:
+        product = Product.from_card(data['data']['products'][0], article)
+        logger.info(f"Получены данные о товаре {article}: {product.name}")
+        return product
+    logger.warning(f"Не найдены данные для товара с артикулом {article}")
+    return None
+
+def get_product_details(article: str) -> Optional[Product]:
     """
     Получает информацию о товаре по артикулу из Wildberries API
     
@@ -23,59 +53,25 @@ def get_product_details(article: str) -> Optional[Dict[str, Any]]:
         article: Артикул товара
         
     Returns:
-        Словарь с информацией о товаре или None при ошибке
+        Товар или None при ошибке
     """
-    # Импортируем переменные настроек прокси
-    try:
-        from wb_bot import PROXY_ENABLED, PROXIES, PROXY_IP, PROXY_PORT
-        proxy_enabled = PROXY_ENABLED
-        proxies = PROXIES
-    except ImportError:
-        # Если не удалось импортировать из wb_bot, используем локальные настройки
-        proxy_enabled = False
-        proxies = None
-    
-    # Формируем URL для запроса деталей о товаре
-    url = f"https://card.wb.ru/cards/detail?spp=30&regions=68,83,4,38,80,33,70,82,86,30,69,22,66,31,40,1,48&dest=-1257786&nm={article}"
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-        "Accept": "application/json",
-        "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
-        "Origin": "https://www.wildberries.ru",
-        "Referer": "https://www.wildberries.ru/",
-    }
-    
+    url = DETAILS_URL.format(article=article)
+    # Пока эндпоинт отключен предохранителем, запрос не отправляется
+    if not breakers.allow(url):
+        logger.warning(f"Эндпоинт {DETAILS_URL} отключен предохранителем, данные о товаре {article} не запрошены")
+        return None
     try:
-        logger.info(f"Получаем данные о товаре {article}" + 
-                   (f" через прокси {PROXY_IP}:{PROXY_PORT}" if proxy_enabled else ""))
-        
-        # Пробуем с прокси, если он включен
-        if proxy_enabled:
-            try:
-                response = requests.get(url, headers=headers, proxies=proxies, timeout=10)
-                response.raise_for_status()
-            except requests.RequestException as e:
-                logger.warning(f"Ошибка при запросе через прокси: {str(e)}. Пробуем без прокси.")
-                # Fallback на запрос без прокси при ошибке
-                response = requests.get(url, headers=headers, timeout=10)
-                response.raise_for_status()
-        else:
-            # Запрос без прокси
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
+        logger.info(f"Получаем данные о товаре {article}")
         
-        data = response.json()
+        # Прокси выбирается из общего пула, при ошибках - другой прокси, затем запрос напрямую
+        response = request_sync("GET", url, headers=HEADERS, timeout=10)
+        breakers.record(url, not is_failure_status(response.status_code), response.elapsed.total_seconds())
+        response.raise_for_status()
         
-        # Проверяем наличие данных о товаре
-        if 'data' in data and 'products' in data['data'] and data['data']['products']:
-            product = data['data']['products'][0]
-            logger.info(f"Получены данные о товаре {article}: {product.get('name', 'Неизвестное название')}")
-            return product
-        else:
-            logger.warning(f"Не найдены данные для товара с артикулом {article}")
-            return None
+        return _product_from_details(response.json(), article)
     except requests.RequestException as e:
+        if e.response is None:
+            breakers.record(url, False)
         logger.error(f"Ошибка сети при получении данных о товаре {article}: {str(e)}")
         return None
     except (KeyError, IndexError, ValueError, json.JSONDecodeError) as e:
@@ -85,6 +81,40 @@ def get_product_details(article: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Непредвиденная ошибка при получении данных о товаре {article}: {str(e)}")
         return None
 
+async def fetch_product_details(article: str) -> Optional[Product]:
+    """
+    Асинхронно получает информацию о товаре по артикулу (см. get_product_details)
+    
+    Args:
+        article: Артикул товара
+        
+    Returns:
+        Товар или None при ошибке
+    """
+    url = DETAILS_URL.format(article=article)
+    if not breakers.allow(url):
+        logger.warning(f"Эндпоинт {DETAILS_URL} отключен предохранителем, данные о товаре {article} не запрошены")
+        return None
+    started = time.monotonic()
+    try:
+        logger.info(f"Получаем данные о товаре {article}")
+        response = await get_http_client().get(url, headers=HEADERS, timeout=SEARCH_TIMEOUT)
+        breakers.record(url, not is_failure_status(response.status), time.monotonic() - started)
+        if response.status != 200:
+            logger.error(f"HTTP {response.status} при получении данных о товаре {article}")
+            return None
+        return _product_from_details(response.json(), article)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        breakers.record(url, False)
+        logger.error(f"Ошибка сети при получении данных о товаре {article}: {str(e)}")
+        return None
+    except (KeyError, IndexError, ValueError) as e:
+        logger.error(f"Ошибка при обработке данных о товаре {article}: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Непредвиденная ошибка при получении данных о товаре {article}: {str(e)}")
+        return None
+
 def extract_category_and_keywords(name: str) -> tuple:
     """
     Извлекает категорию товара и ключевые слова из названия
@@ -148,28 +178,126 @@ def extract_category_and_keywords(name: str) -> tuple:
     
     return category, keywords
 
-def get_similar_products(article: str, limit: int = 30) -> List[Dict[str, Any]]:
+# Одновременные запросы похожих товаров для одного артикула выполняются один раз
+_similar_flight = SingleFlight("similar")
+
+# Сколько похожих товаров оценивать при поиске более дешевого аналога
+CHEAPER_CANDIDATES = 300
+
+async def get_similar_products(article: str, limit: int = 30, source: Optional[Product] = None) -> List[Product]:
+    """
+    Получает список похожих товаров; одновременные вызовы с тем же артикулом
+    и лимитом объединяются в один (см. _get_similar_products)
+    """
+    return await _similar_flight.do((str(article), limit), lambda: _get_similar_products(article, limit, source))
+
+def build_search_queries(brand: str, name: str, category: str, keywords: List[str]) -> List[str]:
+    """
+    Составляет поисковые запросы по убыванию специфичности
+    
+    Args:
+        brand: Бренд исходного товара
+        name: Название исходного товара
+        category: Категория исходного товара
+        keywords: Ключевые слова из названия
+        
+    Returns:
+        Уникальные поисковые запросы
+    """
+    search_queries = []
+    
+    # 1. Самый специфичный запрос: бренд + категория + первое ключевое слово
+    if brand and category and keywords:
+        search_queries.append(f"{brand} {category} {keywords[0]}")
+    
+    # 2. Бренд + категория
+    if brand and category:
+        search_queries.append(f"{brand} {category}")
+    
+    # 3. Категория + основные ключевые слова (без бренда)
+    if category and keywords:
+        main_keywords = " ".join(keywords[:3]) if len(keywords) >= 3 else " ".join(keywords)
+        search_queries.append(f"{category} {main_keywords}")
+    
+    # 4. Запрос с конкретными техническими характеристиками (если они есть в названии)
+    specs_match = re.search(r'(\d+(?:\.\d+)?\s*(?:вт|w|ватт|мм|м|см)|\d+\.\d+|\d+x\d+)', name, flags=re.IGNORECASE)
+    if specs_match and category:
+        specs = specs_match.group(1)
+        search_queries.append(f"{category} {specs}")
+    
+    # 5. Только бренд (запасной вариант)
+    if brand:
+        search_queries.append(brand)
+    
+    # Удаляем повторяющиеся запросы, оставляя уникальные
+    return list(dict.fromkeys(search_queries))
+
+async def search_cards(search_query: str, subject_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Выполняет один поисковый запрос к search.wb.ru
+    
+    Args:
+        search_query: Поисковый запрос
+        subject_id: Идентификатор категории для фильтрации (если известен)
+        
+    Returns:
+        Карточки товаров из ответа поиска
+        
+    Raises:
+        aiohttp.ClientError, asyncio.TimeoutError, ValueError: При ошибке запроса или разбора ответа
+    """
+    params = {
+        "appType": "1",
+        "curr": "rub",
+        "dest": "-1257786",
+        "query": search_query,
+        "resultset": "catalog",
+        "sort": "popular",
+        "spp": "0",
+        "suppressSpellcheck": "false"
+    }
+    
+    # Добавляем параметр subjectId, если он есть
+    if subject_id:
+        params["subject"] = str(subject_id)
+    
+    # Запрос идет через пул прокси (с запросом напрямую при ошибках)
+    response = await get_http_client().get(SEARCH_URL, params=params, headers=HEADERS, timeout=SEARCH_TIMEOUT)
+    if response.status != 200:
+        raise ValueError(f"HTTP {response.status}")
+    
+    data = response.json()
+    if 'data' in data and 'products' in data['data']:
+        return data['data']['products']
+    return []
+
+async def _get_similar_products(article: str, limit: int = 30, source: Optional[Product] = None) -> List[Product]:
     """
     Получает список похожих товаров по артикулу с улучшенным алгоритмом поиска
     
+    Все поисковые запросы выполняются одновременно, результаты объединяются
+    по мере поступления. Когда набрано limit товаров, оставшиеся запросы отменяются.
+    
     Args:
         article: Артикул товара
         limit: Максимальное количество товаров
+        source: Уже полученный исходный товар (если нет - запрашивается по артикулу)
         
     Returns:
-        Список словарей с данными о похожих товарах
+        Похожие товары по убыванию релевантности
     """
-    # Получаем данные о товаре
-    product_data = get_product_details(article)
+    # Получаем данные о товаре, если вызывающий код их еще не получил
+    product_data = source or await fetch_product_details(article)
     if not product_data:
         logger.warning(f"Не удалось получить данные о товаре {article}")
         return []
     
+    pending = set()
     try:
         # Получаем ключевые параметры товара
-        brand = product_data.get('brand', '')
-        name = product_data.get('name', '')
-        subject_id = product_data.get('subjectId')  # Идентификатор категории товара
+        brand = product_data.brand
+        name = product_data.name
+        subject_id = product_data.subject_id  # Идентификатор категории товара
         
         if not name:
             logger.warning(f"Не найдено название товара для артикула {article}")
@@ -179,207 +307,66 @@ def get_similar_products(article: str, limit: int = 30) -> List[Dict[str, Any]]:
         
         # Получаем категорию и ключевые слова из названия
         category, keywords = extract_category_and_keywords(name)
+        search_queries = build_search_queries(brand, name, category, keywords)
         
-        # Составляем поисковые запросы по убыванию специфичности
-        search_queries = []
-        
-        # 1. Самый специфичный запрос: бренд + категория + первое ключевое слово
-        if brand and category and keywords:
-            search_queries.append(f"{brand} {category} {keywords[0]}")
-        
-        # 2. Бренд + категория
-        if brand and category:
-            search_queries.append(f"{brand} {category}")
-        
-        # 3. Категория + основные ключевые слова (без бренда)
-        if category and keywords:
-            main_keywords = " ".join(keywords[:3]) if len(keywords) >= 3 else " ".join(keywords)
-            search_queries.append(f"{category} {main_keywords}")
-        
-        # 4. Запрос с конкретными техническими характеристиками (если они есть в названии)
-        specs_match = re.search(r'(\d+(?:\.\d+)?\s*(?:вт|w|ватт|мм|м|см)|\d+\.\d+|\d+x\d+)', name, flags=re.IGNORECASE)
-        if specs_match and category:
-            specs = specs_match.group(1)
-            search_queries.append(f"{category} {specs}")
-        
-        # 5. Только бренд (запасной вариант)
-        if brand:
-            search_queries.append(brand)
-        
-        # Удаляем повторяющиеся запросы, оставляя уникальные
-        search_queries = list(dict.fromkeys(search_queries))
-        
-        # URL для поиска товаров
-        search_url = "https://search.wb.ru/exactmatch/ru/common/v4/search"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-            "Accept": "application/json",
-            "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Origin": "https://www.wildberries.ru",
-            "Referer": "https://www.wildberries.ru/",
-        }
-        
-        # Получаем настройки прокси из wb_bot.py
-        try:
-            from wb_bot import PROXY_ENABLED, PROXIES, PROXY_IP, PROXY_PORT
-            proxy_enabled = PROXY_ENABLED
-            proxies = PROXIES
-        except ImportError:
-            proxy_enabled = False
-            proxies = None
+        # Признаки исходного товара вычисляются один раз для всех страниц поиска
+        features = source_features(brand, name, category, keywords)
         
         all_results = []
         result_ids = set()  # Для отслеживания уже найденных товаров
         
-        # Перебираем все поисковые запросы, пока не найдем достаточное количество товаров
+        # Запускаем все поисковые запросы одновременно
+        queries = {}
         for query_idx, search_query in enumerate(search_queries):
-            if len(all_results) >= limit:
-                break
-                
             logger.info(f"Поисковый запрос #{query_idx+1}: '{search_query}'")
-            
-            params = {
-                "appType": "1",
-                "curr": "rub",
-                "dest": "-1257786",
-                "query": search_query,
-                "resultset": "catalog",
-                "sort": "popular",
-                "spp": "0",
-                "suppressSpellcheck": "false"
-            }
-            
-            # Добавляем параметр subjectId, если он есть
-            if subject_id:
-                params["subject"] = str(subject_id)
-            
-            try:
-                # Выполняем запрос с поддержкой прокси
-                if proxy_enabled:
-                    try:
-                        logger.info(f"Выполняем запрос с прокси {PROXY_IP}:{PROXY_PORT}")
-                        response = requests.get(search_url, params=params, headers=headers, proxies=proxies, timeout=10)
-                        response.raise_for_status()
-                    except requests.RequestException as e:
-                        logger.warning(f"Ошибка при запросе через прокси: {str(e)}. Пробуем без прокси.")
-                        # Fallback на запрос без прокси
-                        response = requests.get(search_url, params=params, headers=headers, timeout=10)
-                        response.raise_for_status()
-                else:
-                    # Запрос без прокси
-                    response = requests.get(search_url, params=params, headers=headers, timeout=10)
-                    response.raise_for_status()
+            queries[asyncio.ensure_future(search_cards(search_query, subject_id))] = (query_idx, search_query)
+        pending = set(queries)
+        
+        # Обрабатываем ответы по мере поступления, пока не найдем достаточное количество товаров
+        while pending and len(all_results) < limit:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                query_idx, search_query = queries[task]
+                try:
+                    products = task.result()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"Ошибка сети при выполнении поискового запроса '{search_query}': {str(e)}")
+                    continue
+                except (KeyError, IndexError, ValueError) as e:
+                    logger.warning(f"Ошибка при обработке результатов поиска для запроса '{search_query}': {str(e)}")
+                    continue
+                except Exception as e:
+                    logger.warning(f"Непредвиденная ошибка при обработке запроса '{search_query}': {str(e)}")
+                    continue
                 
-                data = response.json()
+                if len(all_results) >= limit:
+                    continue
                 
-                # Проверяем наличие товаров в ответе
-                if 'data' in data and 'products' in data['data']:
-                    products = data['data']['products']
-                    
-                    # Подсчитываем количество новых товаров (не включая текущий артикул)
-                    new_products = [p for p in products if str(p.get('id')) != str(article) and p.get('id') not in result_ids]
-                    logger.info(f"Найдено {len(new_products)} новых товаров по запросу '{search_query}'")
+                # Подсчитываем количество новых товаров (не включая текущий артикул)
+                new_products = [p for p in products if str(p.get('id')) != str(article) and str(p.get('id')) not in result_ids]
+                logger.info(f"Найдено {len(new_products)} новых товаров по запросу '{search_query}'")
+                
+                # Оцениваем релевантность в пуле процессов, чтобы не занимать event loop
+                min_relevance = 3 if query_idx == 0 else 2
+                scored = await cpu_pool.run(score_products, compact_products(new_products),
+                                            features, min_relevance, limit - len(all_results))
+                
+                for result_item in scored:
+                    # Пропускаем товары, которые уже добавлены
+                    if result_item.article in result_ids:
+                        continue
+                    result_ids.add(result_item.article)
+                    all_results.append(result_item)
                     
-                    # Обрабатываем каждый товар
-                    for product in new_products:
-                        # Пропускаем товары, которые уже добавлены
-                        product_id = product.get('id')
-                        if product_id in result_ids:
-                            continue
-                        
-                        # Проверяем наличие цены
-                        price = 0
-                        if 'salePriceU' in product and product['salePriceU']:
-                            price = float(product['salePriceU']) / 100
-                        elif 'priceU' in product and product['priceU']:
-                            price = float(product['priceU']) / 100
-                        
-                        # Пропускаем товары с нулевой или нереалистичной ценой
-                        if price <= 10:
-                            continue
-                        
-                        # Проверяем релевантность товара
-                        product_name = product.get('name', '').lower()
-                        product_brand = product.get('brand', '').lower()
-                        original_brand = brand.lower()
-                        original_name = name.lower()
-                        
-                        # Определяем релевантность товара
-                        relevance_score = 0
-                        
-                        # 1. Совпадение бренда = +3 балла
-                        if original_brand and product_brand and original_brand in product_brand:
-                            relevance_score += 3
-                        
-                        # 2. Совпадение категории = +2 балла
-                        if category and category.lower() in product_name:
-                            relevance_score += 2
-                        
-                        # 3. Совпадение ключевых слов = +1 балл за каждое
-                        for keyword in keywords:
-                            if keyword.lower() in product_name:
-                                relevance_score += 1
-                                
-                        # 4. Штраф за сильное несоответствие в размерах/характеристиках
-                        original_specs = re.findall(r'(\d+(?:\.\d+)?\s*(?:вт|w|ватт)|\d+x\d+)', original_name, flags=re.IGNORECASE)
-                        product_specs = re.findall(r'(\d+(?:\.\d+)?\s*(?:вт|w|ватт)|\d+x\d+)', product_name, flags=re.IGNORECASE)
-                        
-                        # Если у обоих товаров есть спецификации, но они сильно отличаются
-                        if original_specs and product_specs and original_specs[0] != product_specs[0]:
-                            # Извлекаем числовые значения
-                            try:
-                                orig_value = float(re.search(r'\d+(?:\.\d+)?', original_specs[0]).group())
-                                prod_value = float(re.search(r'\d+(?:\.\d+)?', product_specs[0]).group())
-                                
-                                # Если разница больше 50%
-                                if orig_value > 0 and (abs(orig_value - prod_value) / orig_value) > 0.5:
-                                    relevance_score -= 2
-                            except (AttributeError, ValueError):
-                                pass
-                        
-                        # Добавляем только товары с минимальной релевантностью
-                        min_relevance = 3 if query_idx == 0 else 2
-                        if relevance_score >= min_relevance:
-                            # Добавляем товар в результаты
-                            result_ids.add(product_id)
-                            
-                            # Извлекаем рейтинг и отзывы
-                            rating = product.get('reviewRating', 0)
-                            if not rating and 'rating' in product:
-                                rating = product.get('rating', 0)
-                            
-                            feedbacks = product.get('feedbacks', 0)
-                            
-                            # Создаем объект товара
-                            result_item = {
-                                'id': product_id,
-                                'name': product.get('name', ''),
-                                'brand': product.get('brand', ''),
-                                'price': price,
-                                'rating': rating,
-                                'feedbacks': feedbacks,
-                                'relevance': relevance_score,
-                                'url': f"https://www.wildberries.ru/catalog/{product_id}/detail.aspx"
-                            }
-                            
-                            all_results.append(result_item)
-                            
-                            # Ограничиваем количество результатов
-                            if len(all_results) >= limit:
-                                break
-            
-            except requests.RequestException as e:
-                logger.warning(f"Ошибка сети при выполнении поискового запроса '{search_query}': {str(e)}")
-                continue
-            except (KeyError, IndexError, ValueError, json.JSONDecodeError) as e:
-                logger.warning(f"Ошибка при обработке результатов поиска для запроса '{search_query}': {str(e)}")
-                continue
-            except Exception as e:
-                logger.warning(f"Непредвиденная ошибка при обработке запроса '{search_query}': {str(e)}")
-                continue
+                    # Ограничиваем количество результатов
+                    if len(all_results) >= limit:
+                        break
+        
+        if pending:
+            logger.info(f"Набрано {len(all_results)} товаров, отменяю оставшиеся запросы: {len(pending)}")
         
         # Сортируем результаты по релевантности (в порядке убывания)
-        sorted_results = sorted(all_results, key=lambda x: x.get('relevance', 0), reverse=True)
+        sorted_results = sorted(all_results, key=lambda x: x.relevance, reverse=True)
         
         if sorted_results:
             logger.info(f"Всего найдено {len(sorted_results)} релевантных товаров для артикула {article}")
@@ -391,31 +378,33 @@ def get_similar_products(article: str, limit: int = 30) -> List[Dict[str, Any]]:
     except Exception as e:
         logger.error(f"Непредвиденная ошибка при получении похожих товаров для {article}: {str(e)}")
         return []
+    finally:
+        for task in pending:
+            task.cancel()
 
-async def find_similar_products(article: str, limit: int = 30, max_price=None, min_rating=None) -> List[Dict[str, Any]]:
+async def find_similar_products(article: str, limit: int = 30, max_price=None, min_rating=None,
+                                source: Optional[Product] = None) -> List[Product]:
     """
-    Асинхронная обертка для функции get_similar_products.
-    Используется для вызова синхронной функции из асинхронного кода.
+    Получает похожие товары (get_similar_products) с фильтрацией по цене и рейтингу
     
     Args:
         article: Артикул товара
         limit: Максимальное количество товаров
         max_price: Максимальная цена товара (если указано)
         min_rating: Минимальный рейтинг товара (если указано)
+        source: Уже полученный исходный товар
         
     Returns:
-        Список словарей с данными о похожих товарах
+        Похожие товары
     """
-    # Вызываем синхронную функцию через run_in_executor
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(None, lambda: get_similar_products(article, limit))
+    result = await get_similar_products(article, limit, source)
     
     # Если заданы ограничения по цене или рейтингу, фильтруем результаты
     if max_price is not None or min_rating is not None:
         filtered_results = []
         for product in result:
-            price = product.get('price', 0)
-            rating = product.get('rating', 0)
+            price = product.price or 0
+            rating = product.rating or 0
             
             if (max_price is None or price <= max_price) and (min_rating is None or rating >= min_rating):
                 filtered_results.append(product)
@@ -424,7 +413,8 @@ async def find_similar_products(article: str, limit: int = 30, max_price=None, m
     
     return result
 
-def find_similar_cheaper_products(article: str, max_price_percent: int = 100, min_rating: float = 4.0, min_feedbacks: int = 10) -> Optional[Dict[str, Any]]:
+async def find_similar_cheaper_products(article: str, max_price_percent: int = 100, min_rating: float = 4.0, min_feedbacks: int = 10,
+                                        source: Optional[Product] = None) -> Optional[Product]:
     """
     Находит похожие товары с ценой не выше указанного процента от цены исходного товара
     
@@ -433,23 +423,20 @@ def find_similar_cheaper_products(article: str, max_price_percent: int = 100, mi
         max_price_percent: Максимальный процент от исходной цены (100% означает не дороже исходного товара)
         min_rating: Минимальный рейтинг товара
         min_feedbacks: Минимальное количество отзывов
+        source: Уже полученный исходный товар (если нет - запрашивается по артикулу)
         
     Returns:
         Самый дешевый похожий товар, удовлетворяющий условиям, или None
     """
-    # Получаем данные о товаре
-    product_data = get_product_details(article)
+    # Получаем данные о товаре, если вызывающий код их еще не получил
+    product_data = source or await fetch_product_details(article)
     if not product_data:
         logger.warning(f"Не удалось получить данные о товаре {article}")
         return None
     
     try:
         # Проверяем цену товара
-        price = 0
-        if 'salePriceU' in product_data and product_data['salePriceU']:
-            price = float(product_data['salePriceU']) / 100
-        elif 'priceU' in product_data and product_data['priceU']:
-            price = float(product_data['priceU']) / 100
+        price = product_data.price or 0
             
         if price <= 0:
             logger.warning(f"Некорректная цена товара {article}: {price}")
@@ -458,7 +445,8 @@ def find_similar_cheaper_products(article: str, max_price_percent: int = 100, mi
         logger.info(f"Найден товар {article}: цена {price:.2f} ₽")
         
         # Получаем похожие товары с увеличенным лимитом для лучшего выбора
-        similar_products = get_similar_products(article, limit=100)  
+        # Исходный товар передается дальше, чтобы не запрашивать его карточку повторно
+        similar_products = await get_similar_products(article, limit=CHEAPER_CANDIDATES, source=product_data)
         
         if not similar_products:
             logger.warning(f"Не найдены похожие товары для {article}")
@@ -476,22 +464,22 @@ def find_similar_cheaper_products(article: str, max_price_percent: int = 100, mi
         
         for product in similar_products:
             # Пропускаем товар с тем же артикулом
-            if product["id"] == int(article):
+            if product.article == str(article):
                 continue
                 
             # Проверяем цену
-            if product["price"] > max_price:
+            if product.price > max_price:
                 continue
                 
             # Проверяем минимальный рейтинг и количество отзывов
-            product_rating = product.get("rating", 0) or 0
-            product_feedbacks = product.get("feedbacks", 0) or 0
+            product_rating = product.rating or 0
+            product_feedbacks = product.feedbacks or 0
             
             if product_rating < min_rating or product_feedbacks < min_feedbacks:
                 continue
                 
             # Определяем уровень релевантности товара
-            relevance = product.get("relevance", 0)
+            relevance = product.relevance
             
             if relevance >= 5:  # Высокая релевантность
                 highly_relevant.append(product)
@@ -501,8 +489,8 @@ def find_similar_cheaper_products(article: str, max_price_percent: int = 100, mi
                 continue
         
         # Сортируем товары внутри каждой группы по цене
-        highly_relevant.sort(key=lambda p: p["price"])
-        medium_relevant.sort(key=lambda p: p["price"])
+        highly_relevant.sort(key=lambda p: p.price)
+        medium_relevant.sort(key=lambda p: p.price)
         
         # Объединяем результаты, сначала высокорелевантные, потом среднерелевантные
         filtered_products = highly_relevant + medium_relevant
@@ -514,8 +502,8 @@ def find_similar_cheaper_products(article: str, max_price_percent: int = 100, mi
         # Возвращаем самый дешевый товар или None, если ничего не найдено
         if filtered_products:
             best_product = filtered_products[0]
-            discount_percent = int((1 - best_product["price"]/price) * 100)
-            logger.info(f"Найден более дешевый товар: {best_product['name']}, цена: {best_product['price']} (дешевле на {discount_percent}%)")
+            discount_percent = int((1 - best_product.price/price) * 100)
+            logger.info(f"Найден более дешевый товар: {best_product.name}, цена: {best_product.price} (дешевле на {discount_percent}%)")
             return best_product
         else:
             logger.info(f"Не найдено похожих товаров, соответствующих критериям")
@@ -564,6 +552,20 @@ def parse_arguments():
     
     return parser.parse_args()
 
+async def _find_cheaper(article: str, max_price_percent: int, min_rating: float, min_feedbacks: int,
+                        source: Optional[Product] = None) -> Optional[Product]:
+    """Ищет похожий товар дешевле и закрывает HTTP-клиент (для запуска из командной строки)"""
+    try:
+        return await find_similar_cheaper_products(
+            article=article,
+            max_price_percent=max_price_percent,
+            min_rating=min_rating,
+            min_feedbacks=min_feedbacks,
+            source=source
+        )
+    finally:
+        await close_http_client()
+
 def main():
     """
     Основная функция программы
@@ -588,43 +590,35 @@ def main():
         return 1
     
     # Выводим информацию о товаре
-    price = 0
-    if 'salePriceU' in product and product['salePriceU']:
-        price = float(product['salePriceU']) / 100
-    elif 'priceU' in product and product['priceU']:
-        price = float(product['priceU']) / 100
+    price = product.price or 0
         
     print("\nИнформация о товаре:")
-    print(f"  Название: {product.get('name', 'Н/Д')}")
-    print(f"  Бренд: {product.get('brand', 'Н/Д')}")
+    print(f"  Название: {product.name}")
+    print(f"  Бренд: {product.brand or 'Н/Д'}")
     print(f"  Цена: {format_price(price)} ₽")
-    print(f"  Рейтинг: {product.get('reviewRating', 'Н/Д')}")
-    print(f"  Отзывы: {product.get('feedbacks', 'Н/Д')}")
-    print(f"  URL: https://www.wildberries.ru/catalog/{article}/detail.aspx")
+    print(f"  Рейтинг: {product.rating if product.rating is not None else 'Н/Д'}")
+    print(f"  Отзывы: {product.feedbacks if product.feedbacks is not None else 'Н/Д'}")
+    print(f"  URL: {product.url}")
     
     # Ищем похожие товары дешевле
     print("\nПоиск похожих товаров дешевле...")
     
-    cheaper = find_similar_cheaper_products(
-        article=article,
-        max_price_percent=max_price_percent,
-        min_rating=min_rating,
-        min_feedbacks=min_feedbacks
-    )
+    # Исходный товар уже получен - передаем его, чтобы не запрашивать повторно
+    cheaper = asyncio.run(_find_cheaper(article, max_price_percent, min_rating, min_feedbacks, source=product))
     
     elapsed_time = time.time() - start_time
     
     if cheaper:
-        cheaper_price = cheaper.get('price')
+        cheaper_price = cheaper.price
         discount_percent = int((1 - cheaper_price/price) * 100)
         
         print(f"\nНайден более дешевый похожий товар (за {elapsed_time:.2f} сек):")
-        print(f"  Название: {cheaper.get('name')}")
-        print(f"  Бренд: {cheaper.get('brand')}")
+        print(f"  Название: {cheaper.name}")
+        print(f"  Бренд: {cheaper.brand}")
         print(f"  Цена: {format_price(cheaper_price)} ₽ (дешевле на {discount_percent}%)")
-        print(f"  Рейтинг: {cheaper.get('rating')}")
-        print(f"  Отзывы: {cheaper.get('feedbacks')}")
-        print(f"  URL: {cheaper.get('url')}")
+        print(f"  Рейтинг: {cheaper.rating}")
+        print(f"  Отзывы: {cheaper.feedbacks}")
+        print(f"  URL: {cheaper.url}")
         return 0
     else:
         print(f"\nНе найдено похожих товаров дешевле артикула {article} с заданными критериями")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Измерение эффекта кеша ответов ChatGPT без сети.
+
+Скрипт поднимает фейковый OpenAI API: локальный HTTP-сервер с потоковым
+/v1/chat/completions, который отдает --tokens фрагментов с паузой --token-delay.
+Запросы строятся из --questions исходных вопросов с вариациями (регистр,
+пунктуация, вежливые слова, опечатка) и проходят тот же путь, что и в боте:
+поиск в кеше, а при промахе - потоковый ответ с сохранением в кеш. Ответ из
+кеша, полученный на другой исходный вопрос, считается ошибкой.
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+import statistics
+from typing import Dict, List, Tuple
+
+from aiohttp import web
+
+import gpt_client
+from gpt_cache import GptCache
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("gpt_bench")
+
+SUBJECTS = ["кроссовки", "наушники", "пылесос", "куртку", "смартфон", "рюкзак", "чайник", "планшет",
+            "часы", "кофемашину", "монитор", "велосипед", "палатку", "матрас", "утюг", "блендер"]
+TEMPLATES = ["Стоит ли покупать {} на Wildberries?", "Как выбрать {} для дома?",
+             "На что обратить внимание, когда покупаешь {}?", "Как вернуть {} на Wildberries?"]
+PREFIXES = ["", "", "Подскажите, пожалуйста, ", "Привет! ", "скажи "]
+
+
+class FakeOpenAI:
+    """Локальный сервер с потоковым методом chat.completions"""
+
+    def __init__(self, tokens: int, token_delay: float):
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.completions = 0  # Запросов к модели
+        self._runner = None
+
+    async def start(self) -> int:
+        """Запускает сервер и возвращает его порт"""
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        return self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.completions += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        question = body["messages"][-1]["content"]
+        for i in range(self.tokens):
+            await asyncio.sleep(self.token_delay)
+            # Первый фрагмент повторяет вопрос, чтобы ответы на разные вопросы различались
+            content = f"{question}: " if i == 0 else f"слово{i} "
+            chunk = {"id": "bench", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                     "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]}
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+
+class FakeMessage:
+    """Сообщение бота: считает правки"""
+
+    edits = 0
+
+    async def edit_text(self, text: str) -> None:
+        FakeMessage.edits += 1
+
+
+def make_question(rng: random.Random, questions: int) -> Tuple[int, str]:
+    """Создает вариацию одного из исходных вопросов (популярные вопросы задаются чаще)"""
+    index = min(int(rng.paretovariate(1.2)) - 1, questions - 1)
+    question = TEMPLATES[index % len(TEMPLATES)].format(SUBJECTS[index // len(TEMPLATES) % len(SUBJECTS)])
+    question = rng.choice(PREFIXES) + question
+    if rng.random() < 0.3:
+        question = question.lower().rstrip("?")
+    if rng.random() < 0.2:
+        # Опечатка: перестановка двух соседних букв
+        position = rng.randrange(len(question) - 1)
+        question = question[:position] + question[position + 1] + question[position] + question[position + 2:]
+    return index, question
+
+
+async def run_bench(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    Выполняет измерение
+
+    Args:
+        args: Аргументы командной строки
+
+    Returns:
+        dict: Результаты измерения
+    """
+    server = FakeOpenAI(args.tokens, args.token_delay)
+    port = await server.start()
+    gpt_client.start_gpt_client("sk-bench", base_url=f"http://127.0.0.1:{port}/v1")
+    cache = GptCache(similarity=args.similarity)
+    rng = random.Random(args.seed)
+    questions = [make_question(rng, args.questions) for _ in range(args.requests)]
+    latencies: Dict[str, List[float]] = {"hit": [], "miss": []}
+    answered: Dict[str, int] = {}  # Исходный вопрос, на который получен ответ
+    wrong_hits = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def ask(index: int, question: str) -> None:
+        nonlocal wrong_hits
+        async with semaphore:
+            started = time.perf_counter()
+            if not args.no_cache:
+                reply = cache.get(question, scope="bench")
+                if reply is not None:
+                    latencies["hit"].append(time.perf_counter() - started)
+                    wrong_hits += answered[reply] != index
+                    return
+            chunks = gpt_client.stream_chat([{"role": "user", "content": question}], model="bench")
+            reply = await gpt_client.stream_to_message(FakeMessage(), chunks, 10000, interval=args.edit_interval)
+            answered[reply] = index
+            cache.set(question, reply, scope="bench")
+            latencies["miss"].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(ask(index, question) for index, question in questions))
+    elapsed = time.perf_counter() - started
+
+    await gpt_client.close_gpt_client()
+    await server.stop()
+
+    def percentiles(values: List[float]) -> str:
+        if not values:
+            return "-"
+        values = sorted(values)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        return f"p50 {statistics.median(values) * 1000:.2f} мс, p95 {p95 * 1000:.2f} мс"
+
+    return {
+        "elapsed": elapsed,
+        "completions": server.completions,
+        "hit": percentiles(latencies["hit"]),
+        "miss": percentiles(latencies["miss"]),
+        "edits": FakeMessage.edits,
+        "wrong_hits": wrong_hits,
+        "cache": cache.stats(),
+    }
+
+
+def parse_arguments():
+    """
+    Парсит аргументы командной строки
+
+    Returns:
+        Объект с аргументами командной строки
+    """
+    parser = argparse.ArgumentParser(description='Измерение эффекта кеша ответов ChatGPT без сети')
+    parser.add_argument('--requests', type=int, default=1000, help='Количество вопросов пользователей')
+    parser.add_argument('--questions', type=int, default=64, help='Количество разных исходных вопросов')
+    parser.add_argument('--tokens', type=int, default=50, help='Фрагментов в ответе модели')
+    parser.add_argument('--token-delay', type=float, default=0.02, help='Пауза между фрагментами в секундах')
+    parser.add_argument('--concurrency', type=int, default=20, help='Одновременных вопросов')
+    parser.add_argument('--similarity', type=float, default=0.6, help='Порог сходства почти одинаковых вопросов')
+    parser.add_argument('--edit-interval', type=float, default=1.0, help='Интервал правок сообщения в секундах')
+    parser.add_argument('--no-cache', action='store_true', help='Отключить кеш (для сравнения)')
+    parser.add_argument('--seed', type=int, default=1, help='Зерно генератора вопросов')
+    return parser.parse_args()
+
+
+def main():
+    """
+    Основная функция программы
+    """
+    args = parse_arguments()
+    print(f"Вопросов: {args.requests} (исходных: {args.questions}), ответ: {args.tokens} фрагментов "
+          f"по {args.token_delay} сек, одновременно: {args.concurrency}, кеш: {'нет' if args.no_cache else 'да'}")
+    result = asyncio.run(run_bench(args))
+    print(f"Выполнено за {result['elapsed']:.2f} сек, запросов к модели: {result['completions']}, "
+          f"правок сообщений: {result['edits']}")
+    print(f"Ответ из кеша: {result['hit']}")
+    print(f"Ответ модели: {result['miss']}")
+    print(f"Ответов из кеша на другой вопрос: {result['wrong_hits']}")
+    print(f"Кеш: {result['cache']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
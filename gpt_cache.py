@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Кеш ответов ChatGPT по нормализованному вопросу.
+
+Вопрос нормализуется: регистр, "ё", пунктуация, лишние пробелы и вежливые слова
+не влияют на ключ. Точные совпадения находятся по ключу, почти совпадающие
+вопросы (опечатка, лишнее слово) - по отпечатку из символьных триграмм:
+подпись MinHash разбита на полосы, кандидаты ищутся по совпадению любой полосы
+и проверяются по коэффициенту Жаккара триграмм. Кроме того, каждое слово,
+которого нет в другом вопросе, должно отличаться от какого-то его слова лишь
+написанием: "куртку"/"куртки" и опечатки допускаются, "чайник"/"часы" и разные
+числа ("iphone 13" и "iphone 14") - нет.
+
+Записи вытесняются по LRU и устаревают через ttl. Состояние можно сохранить
+в JSON-файл при остановке и загрузить при запуске.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from difflib import SequenceMatcher
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GPT_CACHE_TTL = float(os.getenv("GPT_CACHE_TTL", str(24 * 3600)))  # Время жизни ответа в секундах
+GPT_CACHE_MAX_ENTRIES = int(os.getenv("GPT_CACHE_MAX_ENTRIES", "2000"))  # Максимальное количество ответов
+GPT_CACHE_SIMILARITY = float(os.getenv("GPT_CACHE_SIMILARITY", "0.6"))  # Порог сходства триграмм почти одинаковых вопросов
+GPT_CACHE_PATH = os.getenv("GPT_CACHE_PATH", "")  # Файл для сохранения кеша между перезапусками
+
+WORD_SIMILARITY = 0.75  # Минимальное сходство написания слов, которые считаются одним словом
+MAX_CHANGED_WORDS = 2  # Сколько слов может отличаться у почти одинаковых вопросов
+
+# Подпись MinHash из MINHASH_BANDS полос по MINHASH_ROWS значений. Вопросы с
+# коэффициентом Жаккара 0.6 попадают в кандидаты с вероятностью 1 - (1 - 0.6^2)^8 > 0.97, 0.8 - больше 0.999
+MINHASH_BANDS = 8
+MINHASH_ROWS = 2
+_MINHASH_SIZE = MINHASH_BANDS * MINHASH_ROWS
+# Хеш-функции вида (x * a + b) mod 2^64 с нечетными a; старшие биты результата перемешаны лучше младших
+_rng = np.random.default_rng(20240601)
+_MINHASH_A = _rng.integers(1, 2 ** 63, _MINHASH_SIZE, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_MINHASH_B = _rng.integers(0, 2 ** 63, _MINHASH_SIZE, dtype=np.uint64)
+
+# Слова, которые не меняют смысл вопроса
+FILLER_WORDS = frozenset((
+    "пожалуйста", "плиз", "подскажите", "подскажи", "скажите", "скажи", "расскажите", "расскажи",
+    "а", "и", "ну", "вот", "привет", "здравствуйте",
+))
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+WHITESPACE_RE = re.compile(r"\s+")
+NUMBER_RE = re.compile(r"\d+")
+
+
+def normalize_question(text: str) -> str:
+    """
+    Приводит вопрос к каноническому виду
+
+    Args:
+        text: Текст вопроса
+
+    Returns:
+        str: Вопрос в нижнем регистре без пунктуации, лишних пробелов и вежливых слов
+    """
+    text = PUNCTUATION_RE.sub(" ", text.casefold().replace("ё", "е"))
+    return " ".join(word for word in WHITESPACE_RE.split(text) if word and word not in FILLER_WORDS)
+
+
+def trigrams(normalized: str) -> FrozenSet[str]:
+    """Возвращает множество символьных триграмм нормализованного вопроса"""
+    padded = f" {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def minhash_bands(shingles: FrozenSet[str]) -> Tuple[int, ...]:
+    """
+    Вычисляет полосы подписи MinHash множества триграмм
+
+    У похожих вопросов большая часть значений подписи совпадает, поэтому хотя
+    бы одна из MINHASH_BANDS полос почти наверняка одинакова. Используется
+    встроенный hash(): полосы не сохраняются на диск и пересчитываются при загрузке.
+    """
+    values = np.fromiter((hash(shingle) for shingle in shingles), dtype=np.int64, count=len(shingles))
+    if not len(values):
+        return ()
+    with np.errstate(over="ignore"):
+        hashed = values.view(np.uint64)[None, :] * _MINHASH_A[:, None] + _MINHASH_B[:, None]
+    signature = (hashed >> np.uint64(32)).min(axis=1).reshape(MINHASH_BANDS, MINHASH_ROWS)
+    return tuple(hash(band.tobytes()) for band in signature)
+
+
+def same_words(a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+    """
+    Проверяет, что вопросы состоят из одних и тех же слов с точностью до написания
+
+    Args:
+        a: Слова первого вопроса
+        b: Слова второго вопроса
+
+    Returns:
+        bool: True, если отличающиеся слова попарно похожи и их не больше MAX_CHANGED_WORDS
+    """
+    only_a, only_b = sorted(a - b), list(b - a)
+    if len(only_a) != len(only_b) or len(only_a) > MAX_CHANGED_WORDS:
+        return False
+    # Числа (модели, размеры, годы) должны совпадать точно
+    if any(NUMBER_RE.search(word) for word in only_a + only_b):
+        return False
+    for word in only_a:
+        for other in only_b:
+            if SequenceMatcher(None, word, other).ratio() >= WORD_SIMILARITY:
+                only_b.remove(other)
+                break
+        else:
+            return False
+    return True
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Коэффициент Жаккара двух множеств"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _Entry(NamedTuple):
+    answer: str
+    expires_at: float  # По time.monotonic()
+    shingles: FrozenSet[str]
+    words: FrozenSet[str]
+    bands: Tuple[int, ...]
+
+
+class GptCache:
+    """
+    Потокобезопасный LRU-кеш ответов с TTL и поиском почти одинаковых вопросов.
+
+    Ответы хранятся отдельно для каждой области (scope): модели и контекста
+    запроса, чтобы ответ с одним системным промптом не выдавался для другого.
+    """
+
+    def __init__(self, ttl: float = GPT_CACHE_TTL, max_entries: int = GPT_CACHE_MAX_ENTRIES,
+                 similarity: float = GPT_CACHE_SIMILARITY):
+        """
+        Args:
+            ttl: Время жизни ответа в секундах
+            max_entries: Максимальное количество ответов
+            similarity: Минимальный коэффициент Жаккара триграмм для почти одинаковых вопросов
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        # {(область, нормализованный вопрос): _Entry}
+        self._data: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # {(область, номер полосы, значение полосы): ключи записей}
+        self._index: Dict[Tuple[str, int, int], Set[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _now() -> float:
+        return time.monotonic()
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._data.pop(key)
+        for band, value in enumerate(entry.bands):
+            index_key = (key[0], band, value)
+            keys = self._index.get(index_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[index_key]
+
+    def _find_similar(self, scope: str, shingles: FrozenSet[str], words: FrozenSet[str],
+                      bands: Tuple[int, ...]) -> Optional[Tuple[str, str]]:
+        """Возвращает ключ самой похожей действующей записи или None"""
+        candidates: Set[Tuple[str, str]] = set()
+        for band, value in enumerate(bands):
+            candidates.update(self._index.get((scope, band, value), ()))
+        best_key, best_score = None, self.similarity
+        now = self._now()
+        for key in candidates:
+            entry = self._data[key]
+            if entry.expires_at <= now:
+                continue
+            score = jaccard(shingles, entry.shingles)
+            if score >= best_score and same_words(words, entry.words):
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, question: str, scope: str = "") -> Optional[str]:
+        """
+        Возвращает сохраненный ответ на такой же или почти такой же вопрос
+
+        Args:
+            question: Текст вопроса
+            scope: Область кеша (модель, контекст запроса)
+
+        Returns:
+            Optional[str]: Ответ или None, если подходящего ответа нет
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        key = (scope, normalized)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry.expires_at > self._now():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry.answer
+                self._remove(key)
+                self.expirations += 1
+
+        # Почти одинаковые вопросы: отпечаток считается вне блокировки
+        shingles = trigrams(normalized)
+        words = frozenset(normalized.split())
+        bands = minhash_bands(shingles)
+        with self._lock:
+            similar_key = self._find_similar(scope, shingles, words, bands)
+            if similar_key is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(similar_key)
+            self.near_hits += 1
+            return self._data[similar_key].answer
+
+    def set(self, question: str, answer: str, scope: str = "", ttl: Optional[float] = None) -> None:
+        """
+        Сохраняет ответ на вопрос
+
+        Args:
+            question: Текст вопроса
+            answer: Ответ модели
+            scope: Область кеша (модель, контекст запроса)
+            ttl: Время жизни ответа в секундах (по умолчанию self.ttl)
+        """
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        shingles = trigrams(normalized)
+        entry = _Entry(answer, self._now() + (self.ttl if ttl is None else ttl), shingles,
+                       frozenset(normalized.split()), minhash_bands(shingles))
+        key = (scope, normalized)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = entry
+            for band, value in enumerate(entry.bands):
+                self._index.setdefault((scope, band, value), set()).add(key)
+            while len(self._data) > self.max_entries:
+                oldest_key, oldest = next(iter(self._data.items()))
+                self._remove(oldest_key)
+                if oldest.expires_at <= self._now():
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
+
+    def clear(self) -> None:
+        """Полностью очищает кеш"""
+        with self._lock:
+            self._data.clear()
+            self._index.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def dump(self) -> List[Dict[str, Any]]:
+        """
+        Возвращает действующие записи для сохранения в JSON
+
+        Время истечения переводится в настенные часы, чтобы оставаться
+        корректным после перезапуска процесса.
+        """
+        now, wall_now = self._now(), time.time()
+        with self._lock:
+            return [{"scope": scope, "question": question, "answer": entry.answer,
+                     "expires_at": wall_now + entry.expires_at - now}
+                    for (scope, question), entry in self._data.items() if entry.expires_at > now]
+
+    def restore(self, data: List[Dict[str, Any]]) -> None:
+        """Загружает записи, сохраненные dump(), пропуская устаревшие"""
+        wall_now = time.time()
+        restored = 0
+        for item in data:
+            try:
+                remaining = float(item["expires_at"]) - wall_now
+                if remaining > 0:
+                    self.set(item["question"], item["answer"], scope=item.get("scope", ""), ttl=remaining)
+                    restored += 1
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Пропущена некорректная запись кеша ChatGPT: {e}")
+        logger.info(f"Загружено ответов ChatGPT из кеша: {restored}")
+
+    def save(self, path: str) -> None:
+        """Сохраняет кеш в JSON-файл"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.dump(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        """Загружает кеш из JSON-файла, если он есть"""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать кеш ChatGPT {path}: {e}")
+            return
+        if isinstance(data, list):
+            self.restore(data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику работы кеша
+
+        Returns:
+            Dict[str, Any]: Количество записей и счетчики попаданий/промахов/вытеснений
+        """
+        with self._lock:
+            hits = self.hits + self.near_hits
+            total = hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+            }
+
+
+gpt_cache = GptCache()
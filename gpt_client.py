@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Общий асинхронный клиент OpenAI и потоковый вывод ответов в Telegram.
+
+Клиент AsyncOpenAI создается один раз при запуске приложения и закрывается при
+остановке, поэтому соединения с API переиспользуются, а запрос не блокирует цикл
+событий. Ответ запрашивается потоком (stream=True) и по мере генерации
+дописывается в сообщение Telegram. Редактирования сообщения выполняются не чаще
+GPT_EDIT_INTERVAL: Telegram ограничивает частоту изменений сообщений в чате.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+# Проверяем наличие модуля OpenAI
+try:
+    from openai import AsyncOpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    AsyncOpenAI = None
+    OPENAI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))  # Таймаут запроса к OpenAI в секундах
+OPENAI_MAX_RETRIES = 2  # Повторов запроса при сетевых ошибках и 429/5xx
+GPT_EDIT_INTERVAL = float(os.getenv("GPT_EDIT_INTERVAL", "1.0"))  # Минимальный интервал между правками сообщения
+TYPING_CURSOR = " ▌"  # Признак того, что ответ еще генерируется
+EMPTY_REPLY = "Пустой ответ от ChatGPT."
+
+_client: Optional["AsyncOpenAI"] = None
+
+
+def start_gpt_client(api_key: str, base_url: Optional[str] = None) -> None:
+    """
+    Создает общий клиент OpenAI
+
+    Args:
+        api_key: Ключ OpenAI API
+        base_url: Адрес API (по умолчанию OPENAI_BASE_URL или api.openai.com)
+    """
+    global _client
+    if not OPENAI_AVAILABLE or not api_key or _client is not None:
+        return
+    _client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=OPENAI_TIMEOUT,
+                          max_retries=OPENAI_MAX_RETRIES)
+    logger.info("Клиент OpenAI создан")
+
+
+def get_gpt_client() -> "AsyncOpenAI":
+    """
+    Возвращает общий клиент OpenAI
+
+    Raises:
+        RuntimeError: Если клиент не создан (start_gpt_client не вызывался)
+    """
+    if _client is None:
+        raise RuntimeError("Клиент OpenAI не создан: вызовите start_gpt_client() при запуске приложения")
+    return _client
+
+
+async def close_gpt_client() -> None:
+    """Закрывает общий клиент OpenAI и его соединения"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+        logger.info("Клиент OpenAI закрыт")
+
+
+async def stream_chat(messages: List[Dict[str, str]], model: str, **params: Any) -> AsyncIterator[str]:
+    """
+    Запрашивает ответ модели потоком
+
+    Args:
+        messages: Сообщения диалога
+        model: Модель OpenAI
+        **params: Дополнительные параметры запроса (max_tokens, temperature)
+
+    Yields:
+        str: Очередной фрагмент ответа
+    """
+    stream = await get_gpt_client().chat.completions.create(model=model, messages=messages, stream=True, **params)
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        # Закрываем поток и при досрочном выходе, чтобы соединение вернулось в пул
+        await stream.close()
+
+
+async def _edit(message: Message, text: str) -> Optional[float]:
+    """
+    Изменяет текст сообщения
+
+    Returns:
+        Optional[float]: Сколько секунд Telegram просит подождать перед следующей правкой
+    """
+    try:
+        await message.edit_text(text)
+    except RetryAfter as e:
+        retry_after = e.retry_after
+        return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+    except BadRequest as e:
+        # Текст не изменился - не ошибка
+        if "not modified" not in str(e).lower():
+            raise
+    return None
+
+
+async def stream_to_message(message: Message, chunks: AsyncIterator[str], max_length: int,
+                            interval: float = GPT_EDIT_INTERVAL) -> str:
+    """
+    Дописывает фрагменты ответа в сообщение Telegram по мере их поступления
+
+    Первый фрагмент показывается сразу, следующие - не чаще interval секунд.
+    Когда ответ превышает max_length, генерация прекращается, а ответ обрезается.
+
+    Args:
+        message: Сообщение бота, которое будет заменено ответом
+        chunks: Фрагменты ответа (см. stream_chat)
+        max_length: Максимальная длина ответа в символах
+        interval: Минимальный интервал между правками сообщения в секундах
+
+    Returns:
+        str: Итоговый текст ответа
+    """
+    parts: List[str] = []
+    length = 0
+    truncated = False
+    next_edit = 0.0
+
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            length += len(chunk)
+            if length > max_length:
+                # Остаток ответа не нужен: генерация прекращается при закрытии потока
+                truncated = True
+                break
+            if time.monotonic() < next_edit:
+                continue
+            text = "".join(parts)
+            if text.strip():
+                try:
+                    delay = await _edit(message, text + TYPING_CURSOR)
+                except Exception as e:
+                    # Промежуточная правка не обязательна: ответ будет показан итоговой правкой
+                    logger.warning(f"Не удалось обновить сообщение с ответом ChatGPT: {e}")
+                    delay = None
+                next_edit = time.monotonic() + max(interval, delay or 0)
+    finally:
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+
+    text = "".join(parts)
+    if truncated:
+        text = text[:max_length] + "..."
+    if not text.strip():
+        text = EMPTY_REPLY
+    # Итоговая правка без курсора должна дойти, поэтому при RetryAfter ждем и повторяем
+    delay = await _edit(message, text)
+    if delay is not None:
+        await asyncio.sleep(delay)
+        await _edit(message, text)
+    return text
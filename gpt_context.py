@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Контекст о товарах для запросов к ChatGPT.
+
+Бот запоминает последние товары, которые пользователь смотрел по артикулу, и
+добавляет к вопросу краткую сводку о них (название, бренд, цена, рейтинг,
+отзывы). Данные берутся только из кеша товаров, новых запросов к Wildberries
+не выполняется. Размер сводки ограничен бюджетом токенов: товары добавляются
+от последнего просмотренного, пока сводка помещается в бюджет.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+from product import Product
+
+logger = logging.getLogger(__name__)
+
+GPT_CONTEXT_PRODUCTS = int(os.getenv("GPT_CONTEXT_PRODUCTS", "3"))  # Сколько последних товаров добавлять в контекст
+GPT_CONTEXT_TOKENS = int(os.getenv("GPT_CONTEXT_TOKENS", "300"))  # Бюджет токенов на сводку о товарах
+MAX_USERS = 10000  # Пользователей, для которых хранятся последние товары
+MAX_NAME_LENGTH = 80  # Длина названия товара в сводке
+CHARS_PER_TOKEN = 3  # Оценка с запасом: русский текст занимает 3-4 символа на токен
+
+CONTEXT_HEADER = ("Товары, которые пользователь недавно смотрел (первый - последний просмотренный; "
+                  "\"этот товар\" в вопросе - обычно он):")
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценивает число токенов в тексте без токенизатора"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _format_price(price: float) -> str:
+    return f"{price:,.0f}".replace(",", " ") + " ₽"
+
+
+def product_line(product: Product) -> str:
+    """
+    Формирует строку сводки о товаре
+
+    Args:
+        product: Товар из кеша
+
+    Returns:
+        str: Строка вида "арт. 123: Название | бренд X | 1 990 ₽ | рейтинг 4.8, отзывов 120"
+    """
+    name = (product.name or f"Товар {product.article}").strip()
+    if len(name) > MAX_NAME_LENGTH:
+        name = name[:MAX_NAME_LENGTH - 1] + "…"
+    parts = [f"арт. {product.article}: {name}"]
+    if product.brand:
+        parts.append(f"бренд {product.brand}")
+    parts.append(_format_price(product.price) if product.price is not None else "цена неизвестна")
+    if product.rating is not None:
+        rating = f"рейтинг {product.rating:.1f}"
+        if product.feedbacks is not None:
+            rating += f", отзывов {product.feedbacks}"
+        parts.append(rating)
+    elif product.feedbacks is not None:
+        parts.append(f"отзывов {product.feedbacks}")
+    return " | ".join(parts)
+
+
+class RecentProducts:
+    """
+    Последние просмотренные пользователями товары.
+
+    Для пользователя хранится не больше limit артикулов, повторный просмотр
+    переносит артикул в конец. Число пользователей ограничено max_users:
+    дольше всех не смотревшие товары пользователи вытесняются.
+    """
+
+    def __init__(self, limit: int = GPT_CONTEXT_PRODUCTS, max_users: int = MAX_USERS):
+        self.limit = limit
+        self.max_users = max_users
+        self._articles: "OrderedDict[Hashable, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    def remember(self, user_id: Hashable, article: str) -> None:
+        """
+        Запоминает, что пользователь посмотрел товар
+
+        Args:
+            user_id: Идентификатор пользователя
+            article: Артикул товара
+        """
+        if self.limit <= 0:
+            return
+        article = str(article)
+        with self._lock:
+            articles = self._articles.pop(user_id, [])
+            if article in articles:
+                articles.remove(article)
+            articles.append(article)
+            self._articles[user_id] = articles[-self.limit:]
+            while len(self._articles) > self.max_users:
+                self._articles.popitem(last=False)
+
+    def articles(self, user_id: Hashable) -> List[str]:
+        """Возвращает артикулы товаров пользователя, начиная с последнего просмотренного"""
+        with self._lock:
+            return list(reversed(self._articles.get(user_id, ())))
+
+
+def build_product_context(articles: List[str], cache, token_budget: int = GPT_CONTEXT_TOKENS) -> Optional[str]:
+    """
+    Составляет сводку о товарах для системного сообщения
+
+    Args:
+        articles: Артикулы, начиная с самого важного (последнего просмотренного)
+        cache: Кеш товаров (product_cache.ProductCache); отсутствующие в памяти товары пропускаются,
+            хранилище не читается, чтобы не блокировать event loop
+        token_budget: Максимальный размер сводки в токенах
+
+    Returns:
+        Optional[str]: Сводка или None, если в кеше нет ни одного товара
+    """
+    lines: List[str] = []
+    tokens = estimate_tokens(CONTEXT_HEADER)
+    for article in articles:
+        product = cache.get(article, use_store=False)
+        if not isinstance(product, Product):
+            continue
+        line = product_line(product)
+        line_tokens = estimate_tokens(line)
+        if tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        tokens += line_tokens
+    if not lines:
+        return None
+    return "\n".join([CONTEXT_HEADER] + lines)
+
+
+def context_scope(model: str, product_context: Optional[str]) -> str:
+    """
+    Возвращает область кеша ответов (gpt_cache) для модели и сводки о товарах
+
+    Ответ, полученный со сводкой, зависит от товаров и не должен выдаваться
+    на тот же вопрос с другими товарами или без них.
+    """
+    if not product_context:
+        return model
+    digest = hashlib.blake2b(product_context.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{model}:{digest}"
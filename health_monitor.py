@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Фоновый мониторинг доступности интернета и хостов Wildberries.
+
+Проверки выполняются по расписанию в отдельной задаче, а обработчики сообщений
+читают уже готовое состояние без сетевых вызовов.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROBE_INTERVAL = 30  # Интервал между проверками в секундах
+PROBE_TIMEOUT = 3  # Таймаут одной проверки в секундах
+HISTORY_SIZE = 50  # Сколько последних изменений состояния хранить для каждого хоста
+INTERNET_PROBE_ADDRESS = ("8.8.8.8", 53)  # Google DNS
+
+
+class HostStatus:
+    """Текущее состояние хоста и история его переходов между up/down"""
+
+    __slots__ = ("host", "up", "last_check", "history")
+
+    def __init__(self, host: str, history_size: int = HISTORY_SIZE):
+        self.host = host
+        # До первой проверки считаем хост доступным, чтобы не отклонять запросы при старте
+        self.up = True
+        self.last_check: Optional[float] = None
+        self.history: Deque[Tuple[float, bool]] = deque(maxlen=history_size)
+
+    def update(self, up: bool, timestamp: float) -> bool:
+        """
+        Обновляет состояние хоста
+
+        Args:
+            up: Результат проверки
+            timestamp: Время проверки
+
+        Returns:
+            bool: True, если состояние изменилось
+        """
+        changed = self.last_check is None or up != self.up
+        self.up = up
+        self.last_check = timestamp
+        if changed:
+            self.history.append((timestamp, up))
+        return changed
+
+
+class HealthMonitor:
+    """
+    Периодически проверяет доступность интернета и хостов Wildberries.
+
+    Методы is_online(), any_host_up() и hosts_status() не выполняют сетевых
+    операций и возвращают результат последней проверки.
+    """
+
+    def __init__(self, hosts: Sequence[str], interval: float = PROBE_INTERVAL,
+                 timeout: float = PROBE_TIMEOUT, history_size: int = HISTORY_SIZE,
+                 internet_address: Tuple[str, int] = INTERNET_PROBE_ADDRESS):
+        self.interval = interval
+        self.timeout = timeout
+        self.internet_address = internet_address
+        self._internet = HostStatus(f"{internet_address[0]}:{internet_address[1]}", history_size)
+        self._hosts: Dict[str, HostStatus] = {host: HostStatus(host, history_size) for host in hosts}
+        self._task: Optional[asyncio.Task] = None
+
+    def is_online(self) -> bool:
+        """Возвращает True, если при последней проверке интернет был доступен"""
+        return self._internet.up
+
+    def any_host_up(self) -> bool:
+        """Возвращает True, если при последней проверке был доступен хотя бы один хост Wildberries"""
+        return any(status.up for status in self._hosts.values())
+
+    def hosts_status(self) -> Dict[str, bool]:
+        """
+        Возвращает доступность хостов по результатам последней проверки
+
+        Returns:
+            Dict[str, bool]: Словарь {хост: доступен}
+        """
+        return {host: status.up for host, status in self._hosts.items()}
+
+    def history(self, host: str) -> List[Tuple[float, bool]]:
+        """
+        Возвращает историю переходов хоста между состояниями up/down
+
+        Args:
+            host: Имя хоста
+
+        Returns:
+            List[Tuple[float, bool]]: Список (время, доступен) от старых к новым
+        """
+        status = self._hosts.get(host)
+        return list(status.history) if status else []
+
+    async def _probe_internet(self) -> bool:
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(*self.internet_address), timeout=self.timeout
+            )
+            writer.close()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+    async def _probe_host(self, host: str) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(loop.getaddrinfo(host, 80), timeout=self.timeout)
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+    async def probe_once(self) -> None:
+        """Выполняет все проверки параллельно и публикует новое состояние"""
+        hosts = list(self._hosts)
+        results = await asyncio.gather(
+            self._probe_internet(),
+            *(self._probe_host(host) for host in hosts)
+        )
+        now = time.time()
+
+        if self._internet.update(results[0], now):
+            if results[0]:
+                logger.info("Интернет-соединение доступно")
+            else:
+                logger.error("Интернет-соединение недоступно")
+
+        for host, up in zip(hosts, results[1:]):
+            if self._hosts[host].update(up, now):
+                if up:
+                    logger.info(f"Хост {host} доступен")
+                else:
+                    logger.warning(f"Хост {host} недоступен")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_once()
+            except Exception as e:
+                logger.error(f"Ошибка при проверке доступности хостов: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        """Запускает фоновую задачу проверок"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Мониторинг доступности запущен (интервал {self.interval} сек)")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу проверок"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Мониторинг доступности остановлен")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Хеджированные запросы к нескольким эндпоинтам Wildberries.
+
+Вместо последовательного перебора эндпоинтов (каждый со своим таймаутом)
+запускается основной запрос, а следующий - если основной не ответил за время,
+типичное для этого эндпоинта (перцентиль его задержек). Побеждает первый
+валидный результат, остальные запросы отменяются.
+"""
+
+import re
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+HEDGE_PERCENTILE = 0.95  # Перцентиль задержки, после которого запускается следующий запрос
+HEDGE_DEFAULT_DELAY = 1.0  # Задержка, пока по эндпоинту мало статистики, в секундах
+HEDGE_MIN_DELAY = 0.05  # Минимальная задержка хеджирования в секундах
+HEDGE_MAX_DELAY = 5.0  # Максимальная задержка хеджирования в секундах
+LATENCY_WINDOW = 200  # Сколько последних замеров хранить для эндпоинта
+MIN_SAMPLES = 5  # Минимум замеров для расчета перцентиля
+
+
+def endpoint_key(url: str) -> str:
+    """
+    Возвращает шаблон эндпоинта: хост и путь без артикулов и параметров
+
+    Args:
+        url: URL запроса
+
+    Returns:
+        str: Ключ вида card.wb.ru/cards/v2/detail или www.wildberries.ru/catalog/{nm}/detail.aspx
+    """
+    parts = urlsplit(url)
+    path = re.sub(r"\d{5,}", "{nm}", parts.path)
+    return f"{parts.hostname}{path}"
+
+
+class LatencyTracker:
+    """Скользящее окно задержек по каждому эндпоинту"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        """
+        Сохраняет замер задержки
+
+        Args:
+            key: Ключ эндпоинта
+            seconds: Длительность запроса в секундах
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """
+        Возвращает перцентиль задержки эндпоинта
+
+        Args:
+            key: Ключ эндпоинта
+            q: Перцентиль от 0 до 1
+
+        Returns:
+            Optional[float]: Значение в секундах или None, если замеров мало
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples or len(samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def hedge_delay(self, key: str, q: float = HEDGE_PERCENTILE) -> float:
+        """
+        Возвращает время ожидания ответа эндпоинта перед запуском следующего запроса
+
+        Args:
+            key: Ключ эндпоинта
+            q: Перцентиль задержки
+
+        Returns:
+            float: Задержка в секундах
+        """
+        value = self.percentile(key, q)
+        if value is None:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, min(HEDGE_MAX_DELAY, value))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Возвращает p50/p95 и количество замеров по эндпоинтам"""
+        return {
+            key: {
+                "count": len(self._samples.get(key, ())),
+                "p50": self.percentile(key, 0.5),
+                "p95": self.percentile(key, 0.95),
+            }
+            for key in list(self._samples)
+        }
+
+
+# Замеры задержек, общие для всего процесса
+latency_tracker = LatencyTracker()
+
+
+def _is_valid(result: Any) -> bool:
+    return result is not None
+
+
+async def hedged_first(attempts: Sequence[Tuple[str, Callable[[], Awaitable[Any]]]],
+                       tracker: LatencyTracker = latency_tracker,
+                       is_valid: Callable[[Any], bool] = _is_valid) -> Tuple[Optional[str], Optional[Any]]:
+    """
+    Выполняет попытки с хеджированием и возвращает первый валидный результат вместе с его эндпоинтом
+
+    Следующая попытка запускается, когда текущая не ответила за hedge_delay
+    своего эндпоинта, или сразу, если текущая завершилась без валидного результата.
+
+    Args:
+        attempts: Список (ключ эндпоинта, функция без аргументов, возвращающая корутину) по приоритету
+        tracker: Трекер задержек
+        is_valid: Проверка результата
+
+    Returns:
+        Tuple[Optional[str], Optional[Any]]: (ключ эндпоинта, первый валидный результат)
+        или (None, None), если валидного результата нет
+    """
+    running: Dict[asyncio.Task, str] = {}
+    next_index = 0
+
+    async def timed(key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        try:
+            return await func()
+        finally:
+            # Учитываются и ошибки, и проигравшие (отмененные) попытки - не меньше, чем они
+            # успели проработать; иначе перцентиль строится по быстрым победителям и занижается
+            tracker.record(key, time.monotonic() - started)
+
+    def launch() -> Optional[str]:
+        nonlocal next_index
+        if next_index >= len(attempts):
+            return None
+        key, func = attempts[next_index]
+        next_index += 1
+        running[asyncio.ensure_future(timed(key, func))] = key
+        return key
+
+    try:
+        last_key = launch()
+        while running:
+            timeout = tracker.hedge_delay(last_key) if next_index < len(attempts) else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # Текущие запросы медленнее обычного - запускаем следующий, не отменяя их
+                logger.info(f"Эндпоинт {last_key} не ответил за {timeout:.2f} с, запускаю следующий")
+                last_key = launch()
+                continue
+
+            for task in done:
+                key = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.warning(f"Ошибка запроса к {key}: {e}")
+                    continue
+                if is_valid(result):
+                    return key, result
+
+            # Завершившиеся попытки не дали результата - сразу запускаем следующую
+            if next_index < len(attempts):
+                last_key = launch()
+        return None, None
+    finally:
+        for task in running:
+            task.cancel()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Извлечение данных о товаре из HTML-страницы Wildberries.
+
+Страница разбирается lxml один раз, все нужные элементы (h1, мета-теги, блоки
+цены и рейтинга, JSON-LD) собираются за один проход по дереву. Регулярные
+выражения по исходному HTML применяются только для полей, которые не удалось
+найти в разметке.
+"""
+
+import re
+import json
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from lxml import etree, html as lxml_html
+
+from product import Product
+
+logger = logging.getLogger(__name__)
+
+MIN_PRICE = 10  # Цены не больше этого значения считаются ошибкой разбора
+
+# Тексты, по которым страница считается страницей ошибки
+ERROR_TEXTS = (
+    "извините, такой страницы не существует",
+    "страница не найдена",
+    "товар не найден",
+)
+
+# Шаблоны для поиска по исходному HTML, если поле не найдено в разметке
+NAME_PATTERNS = [re.compile(pattern) for pattern in (
+    r'<h1[^>]*class="[^"]*product-page__title[^"]*"[^>]*>(.*?)</h1>',
+    r'<meta property="og:title" content="([^"]+)"',
+    r'"name":\s*"([^"]+)"',
+    r'<span itemprop="name">([^<]+)</span>',
+)]
+PRICE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'(\d[\d\s&nbsp;]*)\s*₽',
+    r'price-block__final-price[^>]*>([^<]+)',
+    r'final-price[^>]*>([^<]+)',
+    r'"finalPrice":(\d+)',
+    r'"price":(\d+)',
+    r'<meta property="product:price:amount" content="(\d+\.?\d*)',
+)]
+RATING_PATTERNS = [re.compile(pattern) for pattern in (
+    r'rating":\s*"?([\d.]+)"?',
+    r'reviewRating":\s*"?([\d.]+)"?',
+    r'<meta itemprop="ratingValue" content="([\d.]+)"',
+    r'<span class="[^"]*star[^"]*"[^>]*>([\d.,]+)</span>',
+)]
+RUBLE_AMOUNT_RE = re.compile(r'(\d[\d\s]*)\s*₽')
+NUMBER_RE = re.compile(r'([\d.,]+)')
+PRICE_JUNK_RE = re.compile(r'[^\d.,]')
+
+# Теги, которые просматриваются при разборе страницы
+SCANNED_TAGS = ("h1", "meta", "ins", "div", "span", "p", "script")
+
+
+class ProductPage(NamedTuple):
+    """Данные о товаре, извлеченные из HTML-страницы"""
+    name: Optional[str]
+    price: Optional[float]
+    rating: Optional[float]
+    json_ld: List[Dict[str, Any]]
+
+
+def is_error_page(html: str) -> bool:
+    """Проверяет, является ли страница сообщением об ошибке (товар не найден)"""
+    lowered = html.lower()
+    return any(error_text in lowered for error_text in ERROR_TEXTS)
+
+
+def _valid_name(name: Optional[str]) -> bool:
+    return bool(name) and len(name) >= 3 and '{{:~t(' not in name
+
+
+def _to_price(text: str) -> Optional[float]:
+    text = text.replace('\xa0', '').replace('&nbsp;', '').replace(' ', '').replace('₽', '').replace('руб', '')
+    text = PRICE_JUNK_RE.sub('', text).replace(',', '.')
+    try:
+        price = float(text)
+    except ValueError:
+        return None
+    return price if price > MIN_PRICE else None
+
+
+def _to_rating(text: str) -> Optional[float]:
+    try:
+        rating = float(str(text).replace(',', '.'))
+    except ValueError:
+        return None
+    return rating if 0 <= rating <= 5 else None
+
+
+def _first_number(text: str, convert) -> Optional[float]:
+    """Возвращает первое число из текста, прошедшее проверку convert"""
+    for match in NUMBER_RE.findall(text):
+        value = convert(match)
+        if value is not None:
+            return value
+    return None
+
+
+def _search(patterns, html: str, convert) -> Optional[Any]:
+    """Возвращает первое совпадение шаблонов в исходном HTML, прошедшее проверку convert"""
+    for pattern in patterns:
+        for match in pattern.findall(html):
+            value = convert(match)
+            if value is not None:
+                return value
+    return None
+
+
+def _parse(body: bytes) -> Optional[etree._Element]:
+    # Разбор байтов, чтобы lxml не отклонял строки с объявлением кодировки
+    parser = lxml_html.HTMLParser(encoding="utf-8")
+    try:
+        return lxml_html.document_fromstring(body, parser=parser)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"Не удалось разобрать HTML: {e}")
+        return None
+
+
+def extract_product_page(html: Union[str, bytes]) -> Optional[ProductPage]:
+    """
+    Извлекает название, цену, рейтинг и JSON-LD из HTML-страницы товара
+
+    Функция уровня модуля без внешнего состояния, поэтому может выполняться
+    в пуле процессов (см. cpu_pool); тело страницы лучше передавать в bytes (UTF-8).
+
+    Args:
+        html: HTML-код страницы (str или bytes в UTF-8)
+
+    Returns:
+        Optional[ProductPage]: Извлеченные данные (отдельные поля могут быть None)
+            или None, если HTML пустой или не разбирается
+    """
+    if not html or len(html) < 100:
+        logger.warning("HTML пустой или слишком короткий для извлечения данных товара")
+        return None
+
+    body = html if isinstance(html, bytes) else html.encode("utf-8", errors="replace")
+    root = _parse(body)
+    if root is None:
+        return None
+
+    title_h1 = first_h1 = og_title = None
+    final_price = price_block = price_meta = price_any = None
+    rating_icon = reviews_block = rating_meta = rating_any = None
+    json_ld: List[Dict[str, Any]] = []
+
+    # Один проход по дереву: запоминаем первые подходящие элементы каждого вида
+    for element in root.iter(*SCANNED_TAGS):
+        tag = element.tag
+        classes = element.get("class") or ""
+        if tag == "meta":
+            prop = element.get("property")
+            if prop == "og:title" and og_title is None:
+                og_title = element.get("content")
+            elif prop == "product:price:amount" and price_meta is None:
+                price_meta = element.get("content")
+            elif element.get("itemprop") == "ratingValue" and rating_meta is None:
+                rating_meta = element.get("content")
+        elif tag == "script":
+            if element.get("type") == "application/ld+json" and element.text:
+                try:
+                    data = json.loads(element.text)
+                except ValueError:
+                    continue
+                if isinstance(data, dict):
+                    json_ld.append(data)
+        elif tag == "h1":
+            if first_h1 is None:
+                first_h1 = element
+            if title_h1 is None and "product-page__title" in classes.split():
+                title_h1 = element
+        elif classes:
+            class_list = classes.split()
+            lowered = classes.lower()
+            if tag == "ins" and final_price is None and "price-block__final-price" in class_list:
+                final_price = element
+            elif tag == "div" and price_block is None and "price-block" in class_list:
+                price_block = element
+            elif tag == "p" and rating_icon is None and "product-page__reviews-icon" in class_list:
+                rating_icon = element
+            elif tag == "div" and reviews_block is None and "product-page__reviews-blocks" in class_list:
+                reviews_block = element
+            if price_any is None and tag != "p" and "price" in lowered:
+                price_any = element
+            if rating_any is None and tag in ("span", "div") and "rating" in lowered:
+                rating_any = element
+
+    # Исходный текст нужен только для поиска шаблонами, декодируем его один раз при необходимости
+    source: Optional[str] = html if isinstance(html, str) else None
+
+    def text() -> str:
+        nonlocal source
+        if source is None:
+            source = body.decode("utf-8", errors="replace")
+        return source
+
+    # Название: h1 товара, любой h1, og:title, JSON-LD, шаблоны по HTML
+    name = None
+    candidates = [
+        title_h1.text_content() if title_h1 is not None else None,
+        first_h1.text_content() if first_h1 is not None else None,
+        og_title,
+    ] + [data.get("name") for data in json_ld]
+    for candidate in candidates:
+        if isinstance(candidate, str) and _valid_name(candidate.strip()):
+            name = candidate.strip()
+            break
+    if name is None:
+        name = _search(NAME_PATTERNS, text(), lambda match: match.strip() if _valid_name(match.strip()) else None)
+
+    # Цена: блок итоговой цены, блок цен, JSON-LD, мета-тег, любой элемент с "price" в классе
+    price = None
+    if final_price is not None:
+        price = _to_price(final_price.text_content())
+    if price is None and price_block is not None:
+        for amount in RUBLE_AMOUNT_RE.findall(price_block.text_content()):
+            price = _to_price(amount)
+            if price is not None:
+                break
+    if price is None:
+        for data in json_ld:
+            offers = data.get("offers")
+            value = offers.get("price") if isinstance(offers, dict) else data.get("price")
+            if value is not None:
+                price = _to_price(str(value))
+                if price is not None:
+                    break
+    if price is None and price_meta:
+        price = _to_price(price_meta)
+    if price is None and price_any is not None:
+        price = _to_price(price_any.text_content())
+    if price is None:
+        price = _search(PRICE_PATTERNS, text(), _to_price)
+
+    # Рейтинг: иконка отзывов, блок отзывов, JSON-LD, мета-тег, любой элемент с "rating" в классе
+    rating = None
+    if rating_icon is not None:
+        rating = _first_number(rating_icon.text_content(), _to_rating)
+    if rating is None and reviews_block is not None:
+        rating = _first_number(reviews_block.text_content(), _to_rating)
+    if rating is None:
+        for data in json_ld:
+            aggregate = data.get("aggregateRating")
+            value = aggregate.get("ratingValue") if isinstance(aggregate, dict) else data.get("rating")
+            if value is not None:
+                rating = _to_rating(value)
+                if rating is not None:
+                    break
+    if rating is None and rating_meta:
+        rating = _to_rating(rating_meta)
+    if rating is None and rating_any is not None:
+        rating = _first_number(rating_any.text_content(), _to_rating)
+    if rating is None:
+        rating = _search(RATING_PATTERNS, text(), _to_rating)
+
+    return ProductPage(name=name, price=price, rating=rating, json_ld=json_ld)
+
+
+def extract_product(html: Union[str, bytes], article: str) -> Optional[Product]:
+    """
+    Получает товар из HTML-страницы Wildberries
+
+    Проверка страницы ошибки и разбор выполняются одним вызовом, чтобы вся работа
+    со страницей шла в пуле процессов (см. cpu_pool), а не в event loop.
+
+    Args:
+        html: HTML-код страницы (str или bytes в UTF-8)
+        article: Артикул товара
+
+    Returns:
+        Optional[Product]: Товар (без названия на странице - "Товар <артикул>") или None,
+            если страница пустая, не разбирается или содержит сообщение об ошибке
+    """
+    text = html.decode("utf-8", errors="replace") if isinstance(html, bytes) else html
+    if is_error_page(text):
+        logger.warning(f"Страница артикула {article} содержит сообщение об ошибке")
+        return None
+
+    page = extract_product_page(html)
+    if page is None:
+        return None
+    if not page.name:
+        logger.warning(f"Не удалось найти валидное название товара для артикула {article}")
+    if page.price is None and page.rating is None:
+        logger.warning(f"Не удалось извлечь цену и рейтинг для артикула {article}")
+    return Product(article, page.name or f"Товар {article}", price=page.price, rating=page.rating)
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Метрики бота в текстовом формате Prometheus.
+
+Счетчики и гистограммы горячих путей (обработчики обновлений, запросы к
+Wildberries) обновляются в момент события. Состояние компонентов, у которых
+уже есть stats() (кеши, ограничители, пул прокси, обработчик обновлений),
+читается при каждом сборе метрик функциями-сборщиками, поэтому эти компоненты
+не зависят от модуля метрик.
+
+Метрики отдаются по HTTP на METRICS_LISTEN:METRICS_PORT/metrics
+(по умолчанию только локально; METRICS_PORT=0 отключает сервер).
+"""
+
+import os
+import re
+import time
+import bisect
+import logging
+import functools
+import threading
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 - не запускать сервер метрик
+
+# Границы корзин гистограмм задержек в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+NUMBER_RE = re.compile(r"\d{3,}")  # Артикулы, номера vol/part; версии API (v2, v4) сохраняются
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class MetricFamily(NamedTuple):
+    """Метрика, собранная сборщиком: значения по наборам меток"""
+    name: str
+    type: str  # counter или gauge
+    documentation: str
+    labelnames: Tuple[str, ...]
+    samples: List[Tuple[Tuple[Any, ...], float]]
+
+
+class _Metric:
+    """Базовый класс метрики с метками"""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получено {labels}")
+        return tuple(str(label) for label in labels)
+
+    def render(self) -> List[str]:
+        """Возвращает строки метрики в текстовом формате"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels_text(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+
+    type = "counter"
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        """Увеличивает счетчик для набора меток"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: Any) -> float:
+        """Возвращает текущее значение счетчика"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """Значение, которое может расти и убывать"""
+
+    type = "gauge"
+
+    def set(self, value: float, *labels: Any) -> None:
+        """Устанавливает значение для набора меток"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        """Увеличивает значение для набора меток"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels: Any, amount: float = 1.0) -> None:
+        """Уменьшает значение для набора меток"""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам с суммой и количеством"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: Any) -> None:
+        """Учитывает значение для набора меток"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [количество в каждой корзине (без накопления) + корзина +Inf, сумма]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, *labels: Any) -> int:
+        """Возвращает количество учтенных значений"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state[0]) if state is not None else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted((labels, (list(state[0]), state[1])) for labels, state in self._values.items())
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels_text(names, labels + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Набор метрик и сборщиков процесса.
+
+    Сборщик - функция без аргументов, возвращающая список MetricFamily; она
+    вызывается при каждом запросе метрик. Сборщики регистрируются по имени,
+    повторная регистрация заменяет прежний сборщик.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[MetricFamily]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Создает и регистрирует счетчик"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Создает и регистрирует метрику-значение"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Создает и регистрирует гистограмму"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """
+        Регистрирует сборщик метрик
+
+        Args:
+            name: Имя сборщика (повторная регистрация заменяет прежний)
+            collector: Функция, возвращающая список MetricFamily
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def unregister_collector(self, name: str) -> None:
+        """Удаляет сборщик метрик"""
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus
+
+        Ошибка одного сборщика не мешает отдать остальные метрики.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"Ошибка сборщика метрик {name}: {e}")
+                continue
+            for family in families:
+                lines.append(f"# HELP {family.name} {family.documentation}")
+                lines.append(f"# TYPE {family.name} {family.type}")
+                for labels, value in family.samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{family.name}{_labels_text(family.labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Реестр, общий для всего процесса
+registry = Registry()
+
+HANDLER_DURATION = registry.histogram(
+    "bot_handler_duration_seconds", "Время обработки обновления обработчиком", ["handler"])
+HANDLER_IN_PROGRESS = registry.gauge(
+    "bot_handler_in_progress", "Обновления, обрабатываемые сейчас", ["handler"])
+HANDLER_ERRORS = registry.counter(
+    "bot_handler_errors_total", "Исключения, вышедшие из обработчика", ["handler"])
+UPSTREAM_DURATION = registry.histogram(
+    "bot_upstream_request_duration_seconds", "Время запроса к Wildberries (без ожидания ограничителя)",
+    ["endpoint"])
+UPSTREAM_REQUESTS = registry.counter(
+    "bot_upstream_requests_total", "Запросы к Wildberries по эндпоинтам и статусам ответа", ["endpoint", "status"])
+
+
+def endpoint_label(url: str) -> str:
+    """
+    Возвращает метку эндпоинта для URL с ограниченным числом значений
+
+    Как hedging.endpoint_key, но числа от трех цифр заменяются на {nm}, а хосты
+    basket-NN объединяются в один, чтобы число меток не росло с числом товаров.
+
+    Args:
+        url: URL запроса
+
+    Returns:
+        str: Метка вида card.wb.ru/cards/v2/detail или www.wildberries.ru/catalog/{nm}/detail.aspx
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("basket-"):
+        return "basket"
+    return host + NUMBER_RE.sub("{nm}", parts.path)
+
+
+def observe_upstream(url: str, status: Any, duration: float) -> None:
+    """
+    Учитывает запрос к внешнему сервису
+
+    Args:
+        url: URL запроса
+        status: HTTP статус ответа или "error", если ответа нет
+        duration: Длительность запроса в секундах
+    """
+    endpoint = endpoint_label(url)
+    UPSTREAM_DURATION.observe(duration, endpoint)
+    UPSTREAM_REQUESTS.inc(endpoint, status)
+
+
+def observe_handler(name: str) -> Callable:
+    """
+    Декоратор асинхронного обработчика: учитывает время обработки, число
+    выполняемых сейчас обновлений и исключения
+
+    Args:
+        name: Имя обработчика в метке handler
+    """
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            HANDLER_IN_PROGRESS.inc(name)
+            try:
+                return await handler(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(name)
+                raise
+            finally:
+                HANDLER_IN_PROGRESS.dec(name)
+                HANDLER_DURATION.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+
+class MetricsServer:
+    """HTTP-сервер, отдающий метрики по пути /metrics"""
+
+    def __init__(self, metrics_registry: Registry = registry):
+        self.registry = metrics_registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = METRICS_LISTEN, port: int = METRICS_PORT) -> int:
+        """
+        Запускает сервер
+
+        Args:
+            host: Адрес для прослушивания
+            port: Порт (0 - любой свободный)
+
+        Returns:
+            int: Порт, на котором запущен сервер
+        """
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        # Адрес из публичного API AppRunner (порт 0 заменяется выбранным системой)
+        port = self._runner.addresses[0][1]
+        logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+        return port
+
+    async def stop(self) -> None:
+        """Останавливает сервер"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+_server: Optional[MetricsServer] = None
+
+
+async def start_metrics_server(host: str = METRICS_LISTEN, port: int = METRICS_PORT) -> None:
+    """Запускает общий сервер метрик, если он включен (METRICS_PORT не 0)"""
+    global _server
+    if not port or _server is not None:
+        return
+    server = MetricsServer()
+    try:
+        await server.start(host, port)
+    except OSError as e:
+        logger.error(f"Не удалось запустить сервер метрик на {host}:{port}: {e}")
+        await server.stop()
+        return
+    _server = server
+
+
+async def stop_metrics_server() -> None:
+    """Останавливает общий сервер метрик"""
+    global _server
+    if _server is not None:
+        await _server.stop()
+        _server = None
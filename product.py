@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Модель товара Wildberries.
+
+Все источники (card.wb.ru, поиск, кеш) приводятся к одному классу Product.
+Карточки из API нормализуются одной функцией Product.from_card по структуре,
+описанной в Parsing.ini: цена в копейках в sizes[].price.product, рейтинг
+в reviewRating/nmReviewRating/rating, остатки в sizes[].stocks[].qty.
+"""
+
+from typing import Any, Dict, Optional
+
+PRODUCT_URL = "https://www.wildberries.ru/catalog/{article}/detail.aspx"
+MIN_PRICE = 10  # Цены не больше этого значения (в рублях) считаются ошибкой данных
+
+
+def _valid_name(name: Any) -> bool:
+    return isinstance(name, str) and bool(name) and '{{:~t(' not in name and 'unsuccessfulLoad' not in name
+
+
+def card_price(card: Dict[str, Any]) -> Optional[float]:
+    """
+    Возвращает цену товара из карточки API в рублях
+
+    Основной источник - sizes[].price.product (в копейках, первый размер с ценой),
+    затем salePriceU/priceU (старые версии API, тоже в копейках).
+
+    Args:
+        card: Объект товара из data.products
+
+    Returns:
+        Optional[float]: Цена в рублях или None, если цены нет
+    """
+    for size in card.get('sizes') or ():
+        price = size.get('price') if isinstance(size, dict) else None
+        if isinstance(price, dict) and price.get('product'):
+            return int(price['product']) / 100
+    for key in ('salePriceU', 'priceU'):
+        if card.get(key):
+            return int(card[key]) / 100
+    return None
+
+
+def card_stock(card: Dict[str, Any]) -> Optional[int]:
+    """Возвращает общий остаток товара на складах или None, если данных нет"""
+    if card.get('totalQuantity') is not None:
+        return int(card['totalQuantity'])
+    quantities = [stock.get('qty') or 0
+                  for size in card.get('sizes') or () if isinstance(size, dict)
+                  for stock in size.get('stocks') or () if isinstance(stock, dict)]
+    return sum(quantities) if quantities else None
+
+
+class Product:
+    """Товар Wildberries"""
+
+    __slots__ = ("article", "name", "brand", "seller", "price", "rating", "feedbacks",
+                 "subject_id", "stock", "relevance")
+
+    def __init__(self, article: str, name: str, brand: str = "", seller: str = "",
+                 price: Optional[float] = None, rating: Optional[float] = None,
+                 feedbacks: Optional[int] = None, subject_id: Optional[int] = None,
+                 stock: Optional[int] = None, relevance: int = 0):
+        self.article = str(article)
+        self.name = name
+        self.brand = brand
+        self.seller = seller
+        self.price = price
+        self.rating = rating
+        self.feedbacks = feedbacks
+        self.subject_id = subject_id
+        self.stock = stock
+        self.relevance = relevance  # Релевантность исходному товару (для результатов поиска похожих)
+
+    @property
+    def url(self) -> str:
+        return PRODUCT_URL.format(article=self.article)
+
+    def __repr__(self) -> str:
+        return f"Product({self.article}, {self.name!r}, price={self.price}, rating={self.rating})"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Product):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    @classmethod
+    def from_card(cls, card: Dict[str, Any], article: Optional[str] = None) -> "Product":
+        """
+        Создает товар из карточки API (cards/detail, cards/v2/detail, поиск)
+
+        Args:
+            card: Объект товара из data.products
+            article: Артикул, если в карточке нет поля id
+
+        Returns:
+            Product: Нормализованный товар
+        """
+        article = str(card.get('id') or article)
+        name = card.get('name')
+        price = card_price(card)
+
+        rating = None
+        for key in ('reviewRating', 'nmReviewRating', 'rating'):
+            if card.get(key) is not None:
+                rating = float(card[key])
+                break
+
+        feedbacks = card.get('feedbacks')
+        if feedbacks is None:
+            feedbacks = card.get('nmFeedbacks')
+
+        return cls(
+            article=article,
+            name=name if _valid_name(name) else f"Товар {article}",
+            brand=card.get('brand') or "",
+            seller=card.get('supplier') or "",
+            price=price if price and price > MIN_PRICE else None,
+            rating=rating,
+            feedbacks=int(feedbacks) if feedbacks is not None else None,
+            subject_id=card.get('subjectId'),
+            stock=card_stock(card),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает товар в виде словаря (для JSON и хранилища)"""
+        data = {slot: getattr(self, slot) for slot in self.__slots__}
+        data['url'] = self.url
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Product":
+        """Создает товар из словаря, сохраненного to_dict()"""
+        return cls(**{slot: data[slot] for slot in cls.__slots__ if slot in data})
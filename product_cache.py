@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Кеш данных о товарах с вытеснением по LRU и ограничением времени жизни записей.
+
+Все пути получения товара (get_wb_product_data, get_product_data)
+кладут в кеш product.Product и используют одни и те же часы,
+поэтому запись, сохраненная одним путем, действительна и для другого.
+
+К кешу можно подключить постоянное хранилище (product_store.ProductStore):
+промахи в памяти проверяются в нем, а новые записи сохраняются в него.
+Из event loop кеш читается через aget(): чтение SQLite выполняется в потоке.
+"""
+
+import sys
+import json
+import asyncio
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from product_store import json_default
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 5000  # Максимальное количество записей
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024  # Ограничение примерного объема данных (32 МБ)
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Оценивает объем, занимаемый значением в памяти
+
+    Args:
+        value: Кешируемое значение
+
+    Returns:
+        int: Примерный размер в байтах
+    """
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=json_default).encode("utf-8"))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class ProductCache:
+    """
+    Потокобезопасный LRU-кеш с TTL.
+
+    Ограничен одновременно количеством записей и суммарным примерным размером
+    значений. Устаревшие записи удаляются при обращении к ним и при вытеснении,
+    отдельная периодическая очистка не нужна.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            ttl: Время жизни записи в секундах
+            max_entries: Максимальное количество записей
+            max_bytes: Максимальный суммарный размер значений в байтах
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # {ключ: (значение, время_истечения, размер)}
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.store_hits = 0
+        self.store = None
+
+    def attach_store(self, store) -> None:
+        """
+        Подключает постоянное хранилище второго уровня
+
+        Args:
+            store: Экземпляр ProductStore или None, чтобы отключить хранилище
+        """
+        self.store = store
+
+    @staticmethod
+    def _now() -> float:
+        # Единые монотонные часы для всех записей
+        return time.monotonic()
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, use_store: bool = True) -> Optional[Any]:
+        """
+        Возвращает значение из кеша
+
+        Чтение хранилища синхронное; в корутинах используйте aget().
+
+        Args:
+            key: Ключ (обычно артикул товара)
+            use_store: Искать отсутствующие в памяти записи в хранилище
+
+        Returns:
+            Optional[Any]: Значение или None, если записи нет или она устарела
+        """
+        value = self._get_memory(key)
+        if value is not None or not use_store:
+            return value
+        return self._get_from_store(key)
+
+    async def aget(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение из кеша, не блокируя event loop
+
+        Память проверяется сразу, хранилище читается в отдельном потоке.
+
+        Args:
+            key: Ключ (обычно артикул товара)
+
+        Returns:
+            Optional[Any]: Значение или None, если записи нет или она устарела
+        """
+        value = self._get_memory(key)
+        if value is not None or self.store is None:
+            return value
+        return await asyncio.to_thread(self._get_from_store, key)
+
+    def _get_memory(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at > self._now():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+        return None
+
+    def _get_from_store(self, key: Hashable) -> Optional[Any]:
+        """Ищет запись в хранилище и переносит ее в память с оставшимся временем жизни"""
+        store = self.store
+        if store is None:
+            return None
+        try:
+            found = store.get(key)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения хранилища товаров для ключа {key}: {e}")
+            return None
+        if found is None:
+            return None
+        value, fetched_at = found
+        remaining = self.ttl - (time.time() - fetched_at)
+        if remaining <= 0:
+            return None
+        with self._lock:
+            self.store_hits += 1
+        self._set_memory(key, value, remaining)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            source: Optional[str] = None) -> None:
+        """
+        Сохраняет значение в кеш и в подключенное хранилище
+
+        Args:
+            key: Ключ (обычно артикул товара)
+            value: Значение
+            ttl: Время жизни записи в секундах (по умолчанию self.ttl)
+            source: Источник данных, сохраняется в хранилище
+        """
+        self._set_memory(key, value, ttl)
+        store = self.store
+        if store is not None:
+            try:
+                store.put(key, value, source=source)
+            except Exception as e:
+                logger.warning(f"Ошибка записи в хранилище товаров для ключа {key}: {e}")
+
+    def _set_memory(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logger.warning(f"Значение для ключа {key} слишком большое для кеша ({size} байт)")
+            return
+        expires_at = self._now() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key, (_, oldest_expires, _) = next(iter(self._data.items()))
+                self._remove(oldest_key)
+                if oldest_expires <= self._now():
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Удаляет запись и возвращает ее значение (или None)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._remove(key)
+            return entry[0]
+
+    def clear(self) -> None:
+        """Полностью очищает кеш"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] > self._now()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику работы кеша
+
+        Returns:
+            Dict[str, Any]: Количество записей, объем и счетчики попаданий/промахов/вытеснений
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "store_hits": self.store_hits,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
@@ -1,5 +1,4 @@
 import logging
-import json
 import re
 import asyncio
 from typing import Dict, Any, Optional, Tuple
@@ -96,7 +95,7 @@ async def handle_article_request(update: Update, context: ContextTypes.DEFAULT_T
         
         # Получаем данные о товаре - функция get_product_data должна быть импортирована из wb_bot.py
         from wb_bot import get_product_data
-        product_data = await get_product_data(article)
+        product = await get_product_data(article)
         
         # Удаляем сообщение о загрузке
         try:
@@ -104,17 +103,9 @@ async def handle_article_request(update: Update, context: ContextTypes.DEFAULT_T
         except Exception as e:
             logger.warning(f"Не удалось удалить сообщение о загрузке: {e}")
         
-        # Проверяем, является ли product_data словарем с ошибкой
-        if isinstance(product_data, dict) and 'error' in product_data:
-            error_message = f"⚠️ {product_data['error']}"
-            await update.message.reply_text(error_message)
-            return
-        
-        # Если product_data - кортеж (name, price, details_json)
-        if product_data and isinstance(product_data, tuple) and len(product_data) == 3:
+        if product is not None:
             try:
-                # Распаковываем данные о товаре
-                name, price, details_json = product_data
+                name, price = product.name, product.price
                 
                 # Создаем сообщение с информацией о товаре
                 message = f"📦 *Товар:* {name}\n"
@@ -144,42 +135,34 @@ async def handle_article_request(update: Update, context: ContextTypes.DEFAULT_T
                         message += f"💰 *Цена:* {price_str} ₽\n"
                 
                 # Добавляем детали, если они есть
-                if details_json:
-                    try:
-                        details = json.loads(details_json)
-                        
-                        if 'rating' in details and details['rating']:
-                            rating = details['rating']
-                            rating_str = f"{rating:.1f}"
-                            
-                            # Корректное отображение рейтинга в виде золотых звёзд
-                            full_stars = min(5, int(rating))
-                            half_star = rating - int(rating) >= 0.5
-                            empty_stars = 5 - full_stars - (1 if half_star else 0)
-                            
-                            # Используем символы звезд для лучшего визуального отображения
-                            # ★ - золотая звезда (полная)
-                            # ✭ - полузвезда (можно заменить на другой символ)
-                            # ☆ - пустая звезда
-                            star_rating = '★' * full_stars
-                            if half_star:
-                                star_rating += '✭'
-                            star_rating += '☆' * empty_stars
-                            
-                            message += f"⭐ *Рейтинг:* {rating_str} {star_rating}\n"
-                            
-                        if 'brand' in details and details['brand']:
-                            message += f"🏭 *Бренд:* {details['brand']}\n"
-                            
-                        if 'seller' in details and details['seller']:
-                            message += f"🏪 *Продавец:* {details['seller']}\n"
-                            
-                        if 'feedbacks' in details or 'reviews_count' in details:
-                            reviews_count = details.get('feedbacks', details.get('reviews_count', 0))
-                            message += f"💬 *Отзывы:* {reviews_count}\n"
-                        
-                    except json.JSONDecodeError:
-                        logger.warning(f"Не удалось декодировать JSON с деталями: {details_json}")
+                if product.rating:
+                    rating = product.rating
+                    rating_str = f"{rating:.1f}"
+                    
+                    # Корректное отображение рейтинга в виде золотых звёзд
+                    full_stars = min(5, int(rating))
+                    half_star = rating - int(rating) >= 0.5
+                    empty_stars = 5 - full_stars - (1 if half_star else 0)
+                    
+                    # Используем символы звезд для лучшего визуального отображения
+                    # ★ - золотая звезда (полная)
+                    # ✭ - полузвезда (можно заменить на другой символ)
+                    # ☆ - пустая звезда
+                    star_rating = '★' * full_stars
+                    if half_star:
+                        star_rating += '✭'
+                    star_rating += '☆' * empty_stars
+                    
+                    message += f"⭐ *Рейтинг:* {rating_str} {star_rating}\n"
+                    
+                if product.brand:
+                    message += f"🏭 *Бренд:* {product.brand}\n"
+                    
+                if product.seller:
+                    message += f"🏪 *Продавец:* {product.seller}\n"
+                    
+                if product.feedbacks is not None:
+                    message += f"💬 *Отзывы:* {product.feedbacks}\n"
                 
                 # Добавляем партнерскую ссылку
                 partner_link = f"https://www.wildberries.ru/catalog/{article}/detail.aspx?target=partner&partner={PARTNER_ID}"
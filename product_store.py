@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Постоянное хранилище данных о товарах на SQLite (второй уровень кеша).
+
+Хранилище переживает перезапуск бота: после деплоя популярные товары отдаются
+с диска без запросов к Wildberries. База работает в режиме WAL, запись
+выполняется пачками в отдельном потоке: put() только добавляет запись в буфер
+и не ждет диска, поэтому его можно вызывать из event loop.
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50  # Количество записей, после которого буфер сбрасывается на диск
+DEFAULT_FLUSH_INTERVAL = 5.0  # Максимальное время хранения записей в буфере в секундах
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    article TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    source TEXT
+)
+"""
+
+
+def json_default(value: Any) -> Any:
+    """Сериализует объекты с методом to_dict() (например, Product), остальные - строкой"""
+    to_dict = getattr(value, "to_dict", None)
+    return to_dict() if callable(to_dict) else str(value)
+
+
+class ProductStore:
+    """
+    Хранилище товаров: артикул, данные в JSON, время получения и источник.
+
+    Время получения хранится по настенным часам (time.time()), так как должно
+    оставаться корректным между перезапусками процесса.
+    """
+
+    def __init__(self, path: str, ttl: float, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 decode: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        """
+        Args:
+            path: Путь к файлу базы данных
+            ttl: Время жизни записи в секундах
+            batch_size: Размер пачки для записи
+            flush_interval: Максимальная задержка записи в секундах
+            decode: Преобразование прочитанного словаря (например, Product.from_dict)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.decode = decode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # {артикул: (данные_json, время_получения, источник)}
+        self._pending: Dict[str, Tuple[str, float, Optional[str]]] = {}
+        self._last_flush = time.time()
+        self._flush_scheduled = False
+        # Единственный поток записи: сброс буфера не выполняется в потоке вызывающего
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="product-store")
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        logger.info(f"Хранилище товаров открыто: {path}")
+
+    def get(self, article: str) -> Optional[Tuple[Any, float]]:
+        """
+        Возвращает данные о товаре, если они не устарели
+
+        Args:
+            article: Артикул товара
+
+        Returns:
+            Optional[Tuple[Any, float]]: (данные после decode, время_получения) или None
+        """
+        with self._lock:
+            row = self._pending.get(article)
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT data, fetched_at, source FROM products WHERE article = ?", (article,)
+                ).fetchone()
+        if row is None:
+            return None
+        data, fetched_at, _ = row
+        if time.time() - fetched_at >= self.ttl:
+            return None
+        try:
+            value = json.loads(data)
+            return (self.decode(value) if self.decode else value), fetched_at
+        except (json.JSONDecodeError, TypeError, KeyError) as e:
+            logger.warning(f"Поврежденная запись товара {article} в хранилище: {e}")
+            return None
+
+    def put(self, article: str, data: Any, source: Optional[str] = None,
+            fetched_at: Optional[float] = None) -> None:
+        """
+        Добавляет запись в буфер; буфер сбрасывается на диск пачкой в потоке записи
+
+        Args:
+            article: Артикул товара
+            data: Данные о товаре (словарь или объект с методом to_dict())
+            source: Источник данных (эндпоинт или страница)
+            fetched_at: Время получения данных (по умолчанию текущее)
+        """
+        try:
+            payload = json.dumps(data, ensure_ascii=False, default=json_default)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Не удалось сериализовать данные товара {article}: {e}")
+            return
+        with self._lock:
+            self._pending[article] = (payload, fetched_at or time.time(), source)
+            should_flush = not self._flush_scheduled and (
+                len(self._pending) >= self.batch_size
+                or time.time() - self._last_flush >= self.flush_interval
+            )
+            if should_flush:
+                self._flush_scheduled = True
+        if should_flush:
+            self._writer.submit(self.flush)
+
+    def flush(self) -> int:
+        """
+        Записывает буфер на диск одной транзакцией
+
+        Returns:
+            int: Количество записанных записей
+        """
+        with self._lock:
+            self._last_flush = time.time()
+            self._flush_scheduled = False
+            if not self._pending:
+                return 0
+            rows: List[Tuple[str, str, float, Optional[str]]] = [
+                (article, data, fetched_at, source)
+                for article, (data, fetched_at, source) in self._pending.items()
+            ]
+            self._pending.clear()
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO products (article, data, fetched_at, source) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._conn.execute("ROLLBACK")
+                logger.error(f"Ошибка при записи товаров в хранилище: {e}")
+                return 0
+        logger.debug(f"В хранилище записано товаров: {len(rows)}")
+        return len(rows)
+
+    def vacuum(self) -> int:
+        """
+        Удаляет устаревшие записи и возвращает освободившееся место WAL-журнала
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        self.flush()
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    "DELETE FROM products WHERE fetched_at < ?", (time.time() - self.ttl,)
+                )
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при очистке хранилища товаров: {e}")
+                return 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self) -> None:
+        """Дожидается потока записи, сбрасывает буфер и закрывает базу"""
+        self._writer.shutdown(wait=True)
+        self.flush()
+        with self._lock:
+            self._conn.close()
+        logger.info("Хранилище товаров закрыто")
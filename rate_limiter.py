@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Адаптивное ограничение частоты исходящих запросов к Wildberries.
+
+Для каждого хоста используется token bucket. Скорость подбирается по схеме AIMD:
+при ответах 429/403 она уменьшается вдвое, при успешных ответах постепенно
+растет. Так бот работает на максимальной скорости, которую терпит Wildberries,
+вместо случайных пауз между запросами.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 10.0  # Начальная скорость запросов к хосту в секунду
+MIN_RATE = 0.5  # Минимальная скорость в секунду
+MAX_RATE = 50.0  # Максимальная скорость в секунду
+BURST = 10  # Максимальное количество запросов подряд без ожидания
+INCREASE_STEP = 0.5  # Прирост скорости за интервал без ограничений (запросов в секунду)
+INCREASE_INTERVAL = 5.0  # Как часто можно увеличивать скорость в секундах
+DECREASE_FACTOR = 0.5  # Во сколько раз снижать скорость при 429/403
+DECREASE_COOLDOWN = 1.0  # Минимальный интервал между снижениями в секундах
+MAX_WAIT = 30.0  # Максимальное ожидание токена в секундах; запросы сверх этого отклоняются сразу
+
+# Статусы, означающие, что Wildberries ограничивает частоту запросов
+THROTTLE_STATUSES = (403, 429)
+
+
+class RateLimitExceeded(ConnectionError):
+    """Запрос не отправлялся: очередь к хосту длиннее MAX_WAIT"""
+
+
+class TokenBucket:
+    """Token bucket с изменяемой скоростью (потокобезопасный)"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.last_increase = self.updated_at
+        self.last_decrease = 0.0
+        self.throttled = 0  # Сколько раз скорость снижалась
+        self.rejected = 0  # Сколько запросов отклонено из-за слишком долгого ожидания
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, max_wait: float = MAX_WAIT) -> float:
+        """
+        Забирает токен и возвращает, сколько нужно подождать до его появления
+
+        Токены можно брать в долг, но не дольше, чем на max_wait секунд вперед:
+        иначе при снижении скорости очередь к хосту росла бы без ограничений.
+
+        Args:
+            max_wait: Максимальное допустимое ожидание в секундах
+
+        Returns:
+            float: Время ожидания в секундах (0, если токен есть)
+
+        Raises:
+            RateLimitExceeded: Если токена пришлось бы ждать дольше max_wait (токен не забирается)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                self.rejected += 1
+                raise RateLimitExceeded(f"Ожидание токена {wait:.1f} с превышает {max_wait:.1f} с")
+            self.tokens -= 1
+            return wait
+
+    def refund(self) -> None:
+        """Возвращает токен, забранный reserve(), если запрос так и не был отправлен"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def on_success(self) -> None:
+        """Аддитивно увеличивает скорость не чаще раза в INCREASE_INTERVAL"""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate < MAX_RATE and now - self.last_increase >= INCREASE_INTERVAL:
+                self._refill(now)
+                self.rate = min(MAX_RATE, self.rate + INCREASE_STEP)
+                self.last_increase = now
+
+    def on_throttle(self) -> bool:
+        """
+        Мультипликативно уменьшает скорость
+
+        Ответы на запросы, отправленные до снижения, приходят пачкой, поэтому
+        повторное снижение возможно не раньше, чем через DECREASE_COOLDOWN.
+
+        Returns:
+            bool: True, если скорость была снижена
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self.last_decrease < DECREASE_COOLDOWN:
+                return False
+            self._refill(now)
+            self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+            self.tokens = min(self.tokens, 0.0)
+            self.last_decrease = now
+            self.last_increase = now
+            self.throttled += 1
+            return True
+
+
+class RateLimiter:
+    """Набор token bucket по хостам"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def acquire(self, host: str) -> None:
+        """
+        Ждет разрешения на запрос к хосту (асинхронно)
+
+        Если ожидание отменено, токен возвращается: запрос не отправлен
+        и не должен задерживать следующие.
+
+        Raises:
+            RateLimitExceeded: Если ждать пришлось бы дольше MAX_WAIT
+        """
+        bucket = self._bucket(host)
+        delay = bucket.reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                bucket.refund()
+                raise
+
+    def acquire_sync(self, host: str) -> None:
+        """
+        Ждет разрешения на запрос к хосту (для кода в потоках)
+
+        Raises:
+            RateLimitExceeded: Если ждать пришлось бы дольше MAX_WAIT
+        """
+        delay = self._bucket(host).reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def feedback(self, host: str, status: int) -> None:
+        """
+        Корректирует скорость по статусу ответа
+
+        Args:
+            host: Хост запроса
+            status: HTTP статус ответа
+        """
+        bucket = self._bucket(host)
+        if status in THROTTLE_STATUSES:
+            if bucket.on_throttle():
+                logger.warning(f"HTTP {status} от {host}: скорость снижена до {bucket.rate:.2f} запр/с")
+        elif status < 500:
+            bucket.on_success()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает текущую скорость, запас токенов, число снижений и отклоненных запросов по хостам"""
+        return {
+            host: {
+                "rate": round(bucket.rate, 2),
+                "tokens": round(bucket.tokens, 2),
+                "throttled": bucket.throttled,
+                "rejected": bucket.rejected,
+            }
+            for host, bucket in list(self._buckets.items())
+        }
+
+
+# Ограничитель, общий для всех HTTP-клиентов процесса
+rate_limiter = RateLimiter()
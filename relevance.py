@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Пакетная оценка релевантности товаров-кандидатов исходному товару.
+
+Признаки исходного товара (бренд, категория, ключевые слова, числовая
+характеристика) вычисляются один раз. Кандидаты со страницы поиска
+оцениваются вместе: проверки вхождения выполняются по массивам названий
+и брендов NumPy, штраф за различие характеристик - одной векторной
+операцией. Лучшие top_k товаров выбираются кучей, без сортировки всех.
+"""
+
+import re
+import heapq
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from product import Product, MIN_PRICE, card_price
+
+# Характеристики в названии (мощность, размеры) для сравнения товаров
+SPECS_PATTERN = re.compile(r'(\d+(?:\.\d+)?\s*(?:вт|w|ватт)|\d+x\d+)', flags=re.IGNORECASE)
+SPEC_VALUE_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+# Поля карточки из поиска, которые нужны для оценки релевантности и Product.from_card
+SCORED_FIELDS = ('id', 'name', 'brand', 'supplier', 'subjectId', 'salePriceU', 'priceU',
+                 'reviewRating', 'nmReviewRating', 'rating', 'feedbacks', 'nmFeedbacks', 'totalQuantity')
+
+BRAND_WEIGHT = 3  # Бренд исходного товара входит в бренд кандидата
+CATEGORY_WEIGHT = 2  # Категория входит в название кандидата
+KEYWORD_WEIGHT = 1  # За каждое ключевое слово в названии кандидата
+SPEC_PENALTY = 2  # Штраф за сильное несоответствие характеристики
+SPEC_TOLERANCE = 0.5  # Допустимое относительное отличие характеристики
+
+
+class SourceFeatures(NamedTuple):
+    """Признаки исходного товара для оценки кандидатов (в нижнем регистре)"""
+    brand: str
+    category: str
+    keywords: tuple
+    spec_value: Optional[float]
+
+
+def spec_value(name: str) -> Optional[float]:
+    """Возвращает значение первой характеристики в названии (например, 20 для "20 Вт") или None"""
+    match = SPECS_PATTERN.search(name)
+    if match is None:
+        return None
+    return float(SPEC_VALUE_PATTERN.search(match.group()).group())
+
+
+def source_features(brand: str, name: str, category: Optional[str], keywords: Sequence[str]) -> SourceFeatures:
+    """
+    Вычисляет признаки исходного товара
+
+    Args:
+        brand: Бренд исходного товара
+        name: Название исходного товара
+        category: Категория исходного товара
+        keywords: Ключевые слова из названия
+
+    Returns:
+        SourceFeatures: Признаки для score_products
+    """
+    return SourceFeatures(
+        brand=(brand or "").lower(),
+        category=(category or "").lower(),
+        keywords=tuple(keyword.lower() for keyword in keywords),
+        spec_value=spec_value(name.lower()),
+    )
+
+
+def _compact_sizes(sizes: Any) -> List[Dict[str, Any]]:
+    """Оставляет в sizes только цену и остатки, которые читают card_price и card_stock"""
+    return [
+        {
+            'price': {'product': (size.get('price') or {}).get('product')},
+            'stocks': [{'qty': stock.get('qty')} for stock in size.get('stocks') or () if isinstance(stock, dict)],
+        }
+        for size in sizes or () if isinstance(size, dict)
+    ]
+
+
+def compact_products(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Оставляет в карточках только поля, нужные score_products (меньше данных для передачи в пул процессов)"""
+    compacted = []
+    for product in products:
+        item = {key: product[key] for key in SCORED_FIELDS if key in product}
+        if 'sizes' in product:
+            item['sizes'] = _compact_sizes(product['sizes'])
+        compacted.append(item)
+    return compacted
+
+
+def score_products(products: List[Dict[str, Any]], features: SourceFeatures, min_relevance: int,
+                   top_k: Optional[int] = None) -> List[Product]:
+    """
+    Оценивает релевантность найденных товаров исходному
+
+    Релевантность: +3 за бренд, +2 за категорию в названии, +1 за каждое
+    ключевое слово в названии, -2 если характеристика отличается больше чем на 50%.
+    Функция уровня модуля без внешнего состояния: выполняется в пуле процессов (см. cpu_pool).
+
+    Args:
+        products: Карточки товаров из поиска (см. compact_products)
+        features: Признаки исходного товара (см. source_features)
+        min_relevance: Минимальная релевантность для попадания в результат
+        top_k: Сколько лучших товаров вернуть (по умолчанию все подходящие)
+
+    Returns:
+        List[Product]: Товары с релевантностью не ниже min_relevance и ценой выше
+            MIN_PRICE, по убыванию релевантности (при равенстве - в исходном порядке)
+    """
+    if not products or top_k == 0:
+        return []
+
+    names_list = [(product.get('name') or '').lower() for product in products]
+    names = np.array(names_list, dtype=str)
+    prices = np.array([card_price(product) or 0.0 for product in products])
+    scores = np.zeros(len(products), dtype=np.int64)
+
+    if features.brand:
+        brands = np.array([(product.get('brand') or '').lower() for product in products], dtype=str)
+        scores += BRAND_WEIGHT * (np.char.find(brands, features.brand) >= 0)
+
+    if features.category:
+        scores += CATEGORY_WEIGHT * (np.char.find(names, features.category) >= 0)
+
+    for keyword in features.keywords:
+        scores += KEYWORD_WEIGHT * (np.char.find(names, keyword) >= 0)
+
+    if features.spec_value:
+        values = np.array([spec_value(name) for name in names_list], dtype=float)  # None -> nan
+        mismatch = np.abs(values - features.spec_value) / features.spec_value > SPEC_TOLERANCE
+        scores -= SPEC_PENALTY * mismatch
+
+    eligible = np.flatnonzero((prices > MIN_PRICE) & (scores >= min_relevance)).tolist()
+    score_list = scores.tolist()
+    best = heapq.nlargest(len(eligible) if top_k is None else top_k, eligible, key=score_list.__getitem__)
+
+    results = []
+    for index in best:
+        item = Product.from_card(products[index])
+        item.relevance = score_list[index]
+        results.append(item)
+    return results
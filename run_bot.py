@@ -9,6 +9,8 @@ from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from user_limiter import MessageCounter
+
 # Устанавливаем кодировку для вывода
 if sys.stdout.encoding != 'utf-8':
     try:
@@ -43,8 +45,8 @@ root_logger.addHandler(console_handler)
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     level=logging.INFO, encoding='utf-8')
 
-# Словарь для хранения счетчика сообщений пользователей
-user_message_counter = {}
+# Счетчик сообщений пользователей (хранит ограниченное число записей)
+user_message_counter = MessageCounter()
 # Отправлять сообщение о поддержке после каждого N сообщения
 DONATION_MESSAGE_FREQUENCY = 3
 
@@ -118,8 +120,11 @@ if __name__ == "__main__":
         from wb_bot import main, start, help_command, similar_command
         from wb_bot import handle_chatgpt_command, handle_gpt_message, error_handler
         from wb_bot import clean_cache, search_command
+        from wb_bot import on_startup, on_shutdown
         # Импортируем обработчик кнопок из wb_bot вместо отдельного файла
         from wb_bot import button_callback_handler
+        import webhook_server
+        from update_processor import ChatOrderedUpdateProcessor
         
         logging.info("Модуль wb_bot успешно импортирован")
         
@@ -133,8 +138,16 @@ if __name__ == "__main__":
                 logging.critical("Токен не настроен в .env файле!")
                 raise ValueError("Токен бота не настроен. Проверьте файл .env")
             
-            # Создаем приложение
-            application = ApplicationBuilder().token(token).build()
+            # Создаем приложение (общие HTTP-клиенты создаются при запуске и закрываются при остановке).
+            # Обновления разных чатов обрабатываются параллельно, одного чата - по порядку
+            application = (
+                ApplicationBuilder()
+                .token(token)
+                .concurrent_updates(ChatOrderedUpdateProcessor())
+                .post_init(on_startup)
+                .post_shutdown(on_shutdown)
+                .build()
+            )
             
             # Регистрация обработчиков
             application.add_handler(CommandHandler("start", start))
@@ -171,10 +184,10 @@ if __name__ == "__main__":
                 user_id = update.effective_user.id
                 
                 # Увеличиваем счетчик сообщений для пользователя
-                user_message_counter[user_id] = user_message_counter.get(user_id, 0) + 1
+                message_count = user_message_counter.increment(user_id)
                 
                 # Проверяем, нужно ли отправить сообщение о поддержке
-                if user_message_counter[user_id] % DONATION_MESSAGE_FREQUENCY == 0:
+                if message_count % DONATION_MESSAGE_FREQUENCY == 0:
                     # Отправляем сообщение о поддержке
                     await send_donation_message(update, context)
             
@@ -215,7 +228,11 @@ if __name__ == "__main__":
             except Exception as e:
                 logging.error(f"Ошибка при установке команд бота: {e}")
             
-            application.run_polling()
+            if webhook_server.WEBHOOK_URL:
+                logging.info(f"Режим webhook: {webhook_server.WEBHOOK_URL}{webhook_server.WEBHOOK_PATH}")
+                asyncio.run(webhook_server.run_webhook(application))
+            else:
+                application.run_polling()
         
         # Запускаем бота
         run_bot()
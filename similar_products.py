@@ -11,6 +11,9 @@ import re
 from typing import List, Dict, Any, Optional
 import asyncio
 
+from http_client import request_sync
+from product import card_price
+
 # Настраиваем логирование
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("find_similar")
@@ -38,7 +41,7 @@ def get_product_details(article: str) -> Optional[Dict[str, Any]]:
     
     try:
         logger.info(f"Получаем данные о товаре {article}")
-        response = requests.get(url, headers=headers, timeout=10)
+        response = request_sync("GET", url, headers=headers, timeout=10)
         response.raise_for_status()
         data = response.json()
         
@@ -220,7 +223,7 @@ def get_similar_products(article: str, limit: int = 30) -> List[Dict[str, Any]]:
                 params["subject"] = str(subject_id)
             
             try:
-                response = requests.get(search_url, params=params, headers=headers, timeout=10)
+                response = request_sync("GET", search_url, params=params, headers=headers, timeout=10)
                 response.raise_for_status()
                 data = response.json()
                 
@@ -239,12 +242,8 @@ def get_similar_products(article: str, limit: int = 30) -> List[Dict[str, Any]]:
                         if product_id in result_ids:
                             continue
                         
-                        # Проверяем наличие цены
-                        price = 0
-                        if 'salePriceU' in product and product['salePriceU']:
-                            price = float(product['salePriceU']) / 100
-                        elif 'priceU' in product and product['priceU']:
-                            price = float(product['priceU']) / 100
+                        # Проверяем наличие цены (sizes[].price.product, затем salePriceU/priceU)
+                        price = card_price(product) or 0
                         
                         # Пропускаем товары с нулевой или нереалистичной ценой
                         if price <= 10:
@@ -397,11 +396,7 @@ def find_similar_cheaper_products(article: str, max_price_percent: int = 100, mi
     
     try:
         # Проверяем цену товара
-        price = 0
-        if 'salePriceU' in product_data and product_data['salePriceU']:
-            price = float(product_data['salePriceU']) / 100
-        elif 'priceU' in product_data and product_data['priceU']:
-            price = float(product_data['priceU']) / 100
+        price = card_price(product_data) or 0
             
         if price <= 0:
             logger.warning(f"Некорректная цена товара {article}: {price}")
@@ -540,11 +535,7 @@ def main():
         return 1
     
     # Выводим информацию о товаре
-    price = 0
-    if 'salePriceU' in product and product['salePriceU']:
-        price = float(product['salePriceU']) / 100
-    elif 'priceU' in product and product['priceU']:
-        price = float(product['priceU']) / 100
+    price = card_price(product) or 0
         
     print("\nИнформация о товаре:")
     print(f"  Название: {product.get('name', 'Н/Д')}")
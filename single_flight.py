@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Объединение одновременных одинаковых запросов (single-flight).
+
+Пока запрос по ключу выполняется, остальные вызовы с тем же ключом не идут
+к Wildberries, а ждут завершения первого и получают его результат.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Single-flight для корутин одного event loop.
+
+    Запрос выполняется в отдельной задаче, поэтому отмена одного из ожидающих
+    вызовов не отменяет запрос для остальных. Когда отменены все ожидающие,
+    запрос отменяется: его результат больше никому не нужен.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}  # Сколько вызовов ждут задачу
+        self.shared = 0  # Сколько вызовов получили результат чужого запроса
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет func() или присоединяется к уже выполняющемуся запросу с тем же ключом
+
+        Args:
+            key: Ключ запроса (например, артикул)
+            func: Функция без аргументов, возвращающая корутину
+
+        Returns:
+            Any: Результат func() (исключение пробрасывается всем ожидающим)
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.shared += 1
+            logger.debug(f"[{self.name}] Запрос {key} уже выполняется, ожидаю его результат")
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._leave(key, task)
+
+    def _leave(self, key: Hashable, task: asyncio.Task) -> None:
+        """Учитывает уход ожидающего; ушел последний, а запрос не завершен - отменяет его"""
+        waiters = self._waiters[task] - 1
+        if waiters:
+            self._waiters[task] = waiters
+            return
+        del self._waiters[task]
+        if not task.done():
+            logger.debug(f"[{self.name}] Все ожидающие запроса {key} отменены, отменяю запрос")
+            # Новые вызовы с этим ключом не должны присоединяться к отменяемой задаче
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Помечаем исключение как полученное, даже если все ожидающие были отменены
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+class ThreadSingleFlight:
+    """Single-flight для синхронных функций, вызываемых из разных потоков"""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.shared = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Выполняет func() или ждет результат уже выполняющегося вызова с тем же ключом
+
+        Args:
+            key: Ключ запроса
+            func: Функция без аргументов
+
+        Returns:
+            Any: Результат func() (исключение пробрасывается всем ожидающим)
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.shared += 1
+
+        if not leader:
+            logger.debug(f"[{self.name}] Запрос {key} уже выполняется, ожидаю его результат")
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Тесты пакетной загрузки карточек (card_batcher.py)"""
+
+import asyncio
+
+import pytest
+
+import card_batcher
+from card_batcher import CardApiError, CardBatcher
+from circuit_breaker import BreakerRegistry
+
+
+class FakeResponse:
+    def __init__(self, status, data=None):
+        self.status = status
+        self._data = data or {}
+
+    def json(self):
+        return self._data
+
+
+class FakeClient:
+    def __init__(self, response):
+        self.response = response
+        self.urls = []
+
+    async def get(self, url, **kwargs):
+        self.urls.append(url)
+        return self.response
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(response):
+        fake = FakeClient(response)
+        monkeypatch.setattr(card_batcher, "get_http_client", lambda: fake)
+        monkeypatch.setattr(card_batcher, "breakers", BreakerRegistry())
+        return fake
+    return install
+
+
+def test_articles_of_one_window_share_a_request(client):
+    fake = client(FakeResponse(200, {"data": {"products": [{"id": 1, "name": "Первый"},
+                                                            {"id": 2, "name": "Второй"}]}}))
+
+    async def main():
+        batcher = CardBatcher(window=0.01)
+        return await asyncio.gather(batcher.get("1"), batcher.get("2"), batcher.get("3"))
+
+    first, second, missing = asyncio.run(main())
+    assert len(fake.urls) == 1
+    assert fake.urls[0].endswith("nm=1;2;3")
+    assert first["name"] == "Первый" and second["name"] == "Второй"
+    assert missing is None
+
+
+def test_error_status_raises_instead_of_not_found(client):
+    client(FakeResponse(503))
+
+    async def main():
+        return await CardBatcher(window=0.01).get("1")
+
+    with pytest.raises(CardApiError):
+        asyncio.run(main())
+
+
+def test_batch_task_is_held_until_done(client):
+    client(FakeResponse(200, {"data": {"products": [{"id": 1, "name": "Первый"}]}}))
+
+    async def main():
+        batcher = CardBatcher(window=10)
+        request = asyncio.ensure_future(batcher.get("1"))
+        await asyncio.sleep(0)
+        batcher._flush()
+        # Пачка отправлена: задача запроса удерживается батчером, пока не завершится
+        held = len(batcher._tasks)
+        card = await request
+        await asyncio.sleep(0)
+        return held, card, len(batcher._tasks)
+
+    held, card, left = asyncio.run(main())
+    assert card["name"] == "Первый"
+    assert held == 1
+    assert left == 0
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Тесты предохранителей эндпоинтов (circuit_breaker.py)"""
+
+from circuit_breaker import (CLOSED, HALF_OPEN, MAX_OPEN_TIMEOUT, MIN_CALLS, OPEN, OPEN_TIMEOUT,
+                             PROBE_TIMEOUT, BreakerRegistry, CircuitBreaker, is_failure_status)
+
+CARD_URL = "https://card.wb.ru/cards/v2/detail?nm=123456"
+V1_URL = "https://card.wb.ru/cards/detail?nm=123456"
+
+
+def open_breaker(breaker, now=0.0):
+    for _ in range(MIN_CALLS):
+        breaker.record(False, None, now)
+
+
+def test_failure_statuses():
+    assert all(is_failure_status(status) for status in (403, 429, 500, 503))
+    assert not any(is_failure_status(status) for status in (200, 404))
+
+
+def test_opens_after_failure_rate_threshold():
+    breaker = CircuitBreaker("card")
+    for _ in range(MIN_CALLS - 1):
+        breaker.record(False, None, 0.0)
+    assert breaker.state == CLOSED
+    breaker.record(False, None, 0.0)
+    assert breaker.state == OPEN
+    assert not breaker.allow(OPEN_TIMEOUT - 1)
+
+
+def test_successes_keep_breaker_closed():
+    breaker = CircuitBreaker("card")
+    for index in range(MIN_CALLS * 2):
+        breaker.record(index % 3 == 0 or index % 3 == 1, 0.1, 0.0)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe_then_closes():
+    breaker = CircuitBreaker("card")
+    open_breaker(breaker)
+    assert breaker.allow(OPEN_TIMEOUT)
+    assert breaker.state == HALF_OPEN
+    # Пока пробный запрос не ответил, остальные не допускаются
+    assert not breaker.allow(OPEN_TIMEOUT + 1)
+
+    breaker.record(True, 0.2, OPEN_TIMEOUT + 2)
+    assert breaker.state == CLOSED
+    assert breaker.allow(OPEN_TIMEOUT + 3)
+    assert breaker.open_timeout == OPEN_TIMEOUT
+
+
+def test_failed_probe_reopens_with_longer_timeout():
+    breaker = CircuitBreaker("card")
+    open_breaker(breaker)
+    now = OPEN_TIMEOUT
+    assert breaker.allow(now)
+    breaker.record(False, None, now)
+    assert breaker.state == OPEN
+    assert breaker.open_timeout == OPEN_TIMEOUT * 2
+    assert not breaker.allow(now + OPEN_TIMEOUT)
+
+    for _ in range(10):
+        now += breaker.open_timeout
+        assert breaker.allow(now)
+        breaker.record(False, None, now)
+    assert breaker.open_timeout == MAX_OPEN_TIMEOUT
+
+
+def test_lost_probe_is_replaced_after_timeout():
+    breaker = CircuitBreaker("card")
+    open_breaker(breaker)
+    assert breaker.allow(OPEN_TIMEOUT)
+    assert not breaker.allow(OPEN_TIMEOUT + PROBE_TIMEOUT - 1)
+    assert breaker.allow(OPEN_TIMEOUT + PROBE_TIMEOUT)
+
+
+def test_registry_shares_breaker_between_articles_and_ranks():
+    registry = BreakerRegistry()
+    for article in range(100000, 100000 + MIN_CALLS):
+        registry.record(f"https://card.wb.ru/cards/v2/detail?nm={article}", False)
+    assert not registry.allow(CARD_URL)
+    assert registry.stats()["card.wb.ru/cards/v2/detail"]["state"] == OPEN
+    assert registry.rank([CARD_URL, V1_URL]) == [V1_URL]
+
+
+def test_rank_prefers_healthier_endpoint():
+    registry = BreakerRegistry()
+    registry.record(CARD_URL, True, 0.1)
+    registry.record(CARD_URL, False)
+    registry.record(V1_URL, True, 0.3)
+    assert registry.rank([CARD_URL, V1_URL]) == [V1_URL, CARD_URL]
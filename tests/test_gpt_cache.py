@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Тесты кеша ответов ChatGPT (gpt_cache.py)"""
+
+import pytest
+
+from gpt_cache import GptCache, normalize_question
+
+QUESTION = "Какую зимнюю куртку выбрать для ребенка?"
+ANSWER = "Смотрите на утеплитель и длину."
+
+
+@pytest.fixture
+def cache():
+    cache = GptCache(ttl=3600, max_entries=100)
+    cache.set(QUESTION, ANSWER)
+    return cache
+
+
+def test_normalization_ignores_case_punctuation_and_fillers():
+    assert normalize_question("Подскажите, пожалуйста: КАКУЮ  зимнюю куртку выбрать?!") == \
+        "какую зимнюю куртку выбрать"
+    assert normalize_question("Ёлка") == "елка"
+
+
+def test_exact_match_after_normalization(cache):
+    assert cache.get("какую зимнюю куртку выбрать для ребенка") == ANSWER
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("question", [
+    "Какую зимнюю куртку выбрать для ребёнка",   # ё вместо е
+    "Какую зимнюю кутрку выбрать для ребенка?",  # перестановка букв
+    "Какую зимнюю куртки выбрать для ребенка?",  # другая форма слова
+    "Какую зимнюю куртку выбрать для ребенкаа?",  # лишняя буква
+])
+def test_near_duplicates_hit(cache, question):
+    assert cache.get(question) == ANSWER
+
+
+@pytest.mark.parametrize("question", [
+    "Какие зимние сапоги выбрать для ребенка?",
+    "Какую летнюю шляпу выбрать для взрослого?",
+    "Какой чайник выбрать?",
+])
+def test_different_questions_miss(cache, question):
+    assert cache.get(question) is None
+
+
+def test_different_numbers_are_not_merged():
+    cache = GptCache(ttl=3600)
+    cache.set("Какой iphone 13 купить в 2023 году", "Ответ про 2023")
+    assert cache.get("Какой iphone 13 купить в 2024 году") is None
+    assert cache.get("Какой iphone 14 купить в 2023 году") is None
+    assert cache.get("какой iphone 13 купить в 2023 году") == "Ответ про 2023"
+
+
+def test_scopes_are_isolated(cache):
+    assert cache.get(QUESTION, scope="gpt-4o") is None
+    cache.set(QUESTION, "Другой ответ", scope="gpt-4o")
+    assert cache.get(QUESTION, scope="gpt-4o") == "Другой ответ"
+    assert cache.get(QUESTION) == ANSWER
+
+
+def test_expired_answer_is_not_returned(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(GptCache, "_now", staticmethod(lambda: now[0]))
+    cache = GptCache(ttl=10)
+    cache.set(QUESTION, ANSWER)
+    now[0] += 11
+    assert cache.get(QUESTION) is None
+    assert cache.get("Какую зимнюю кутрку выбрать для ребенка?") is None
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Тесты хеджированных запросов (hedging.py)"""
+
+import asyncio
+
+import hedging
+from hedging import LatencyTracker, endpoint_key, hedged_first
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def returning(value, delay=0.0):
+    async def attempt():
+        await asyncio.sleep(delay)
+        return value
+    return attempt
+
+
+def failing(delay=0.0):
+    async def attempt():
+        await asyncio.sleep(delay)
+        raise ConnectionError("нет ответа")
+    return attempt
+
+
+def test_endpoint_key_hides_article():
+    assert endpoint_key("https://card.wb.ru/cards/v2/detail?nm=123456") == "card.wb.ru/cards/v2/detail"
+    assert (endpoint_key("https://www.wildberries.ru/catalog/123456/detail.aspx")
+            == "www.wildberries.ru/catalog/{nm}/detail.aspx")
+
+
+def test_primary_result_is_returned_without_fallback():
+    calls = []
+
+    async def fallback():
+        calls.append("fallback")
+        return "fallback"
+
+    result = run(hedged_first([("primary", returning("primary")), ("fallback", fallback)],
+                              tracker=LatencyTracker()))
+    assert result == ("primary", "primary")
+    assert calls == []
+
+
+def test_invalid_result_launches_next_attempt_immediately():
+    tracker = LatencyTracker()
+    result = run(hedged_first([("primary", returning(None)), ("error", failing()),
+                               ("fallback", returning("fallback"))], tracker=tracker))
+    assert result == ("fallback", "fallback")
+
+
+def test_slow_primary_is_hedged_and_cancelled(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_DEFAULT_DELAY", 0.05)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        result = await hedged_first([("slow", slow), ("fast", returning("fast"))], tracker=LatencyTracker())
+        await asyncio.sleep(0)  # Даем отмененной задаче завершиться
+        return result
+
+    assert run(main()) == ("fast", "fast")
+    assert cancelled == [True]
+
+
+def test_all_attempts_failed_returns_none():
+    assert run(hedged_first([("a", returning(None)), ("b", failing())], tracker=LatencyTracker())) == (None, None)
+
+
+def test_tracker_reacts_to_slow_failing_endpoint():
+    """Медленные ошибки учитываются, и задержка хеджирования растет"""
+    tracker = LatencyTracker()
+    for _ in range(20):
+        tracker.record("card", 0.06)
+    assert tracker.hedge_delay("card") < 0.1
+
+    for _ in range(hedging.MIN_SAMPLES * 2):
+        run(hedged_first([("card", failing(0.15))], tracker=tracker))
+    assert tracker.hedge_delay("card") >= 0.15
+
+
+def test_cancelled_losers_are_recorded(monkeypatch):
+    """Проигравшая попытка учитывается не меньше, чем она успела проработать"""
+    monkeypatch.setattr(hedging, "HEDGE_DEFAULT_DELAY", 0.05)
+    tracker = LatencyTracker()
+
+    async def main():
+        for _ in range(hedging.MIN_SAMPLES):
+            await hedged_first([("hanging", returning("late", delay=5)), ("fast", returning("fast"))],
+                               tracker=tracker)
+        await asyncio.sleep(0)
+
+    run(main())
+    assert tracker.percentile("hanging", 0.5) >= 0.05
+    assert tracker.hedge_delay("hanging") >= 0.05
+
+
+def test_falsy_result_is_valid_and_stops_fallbacks():
+    """Ответ "товара нет" (False) - валидный результат: резервные попытки не запускаются"""
+    calls = []
+
+    async def fallback():
+        calls.append("fallback")
+        return "fallback"
+
+    result = run(hedged_first([("card", returning(False)), ("v1", fallback)], tracker=LatencyTracker()))
+    assert result == ("card", False)
+    assert calls == []
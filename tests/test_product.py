@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Тесты модели товара (product.py)"""
+
+from product import Product, card_price, card_stock
+
+CARD_V2 = {
+    "id": 123456,
+    "name": "Кроссовки беговые",
+    "brand": "Бренд",
+    "supplier": "Продавец",
+    "subjectId": 105,
+    "reviewRating": 4.8,
+    "rating": 5,
+    "feedbacks": 120,
+    "sizes": [
+        {"name": "40", "stocks": []},
+        {"name": "41", "price": {"basic": 250000, "product": 129900}, "stocks": [{"qty": 3}, {"qty": 2}]},
+        {"name": "42", "price": {"basic": 250000, "product": 139900}, "stocks": [{"qty": 1}]},
+    ],
+}
+
+
+def test_from_card_v2():
+    product = Product.from_card(CARD_V2)
+    assert product.article == "123456"
+    assert product.name == "Кроссовки беговые"
+    assert product.brand == "Бренд" and product.seller == "Продавец"
+    assert product.price == 1299.0  # Первый размер с ценой, копейки в рубли
+    assert product.rating == 4.8  # reviewRating важнее rating
+    assert product.feedbacks == 120
+    assert product.subject_id == 105
+    assert product.stock == 6
+    assert product.url == "https://www.wildberries.ru/catalog/123456/detail.aspx"
+
+
+def test_from_card_legacy_fields():
+    card = {"id": 42, "name": "Чайник", "salePriceU": 199000, "priceU": 250000,
+            "nmReviewRating": 4.1, "nmFeedbacks": 7, "totalQuantity": 11}
+    product = Product.from_card(card)
+    assert product.price == 1990.0
+    assert product.rating == 4.1
+    assert product.feedbacks == 7
+    assert product.stock == 11
+
+
+def test_from_card_missing_and_invalid_values():
+    product = Product.from_card({"name": "{{:~t('unsuccessfulLoad')}}", "salePriceU": 500}, article="777")
+    assert product.article == "777"
+    assert product.name == "Товар 777"
+    assert product.price is None  # 5 рублей - ошибка данных
+    assert product.rating is None
+    assert product.stock is None
+    assert product.brand == "" and product.seller == ""
+
+
+def test_card_helpers():
+    assert card_price({"sizes": [{"price": {"product": 0}}], "priceU": 10000}) == 100.0
+    assert card_price({}) is None
+    assert card_stock({"sizes": [{"stocks": []}]}) is None
+    assert card_stock({"totalQuantity": 0, "sizes": [{"stocks": [{"qty": 5}]}]}) == 0
+
+
+def test_dict_round_trip():
+    product = Product.from_card(CARD_V2)
+    data = product.to_dict()
+    assert data["url"] == product.url
+    assert Product.from_dict(data) == product
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Тесты кеша товаров и постоянного хранилища (product_cache.py, product_store.py)"""
+
+import asyncio
+import threading
+
+from product import Product
+from product_cache import ProductCache
+from product_store import ProductStore
+
+
+def make_store(tmp_path, **kwargs):
+    return ProductStore(str(tmp_path / "products.db"), ttl=3600, decode=Product.from_dict, **kwargs)
+
+
+def test_put_flushes_on_writer_thread(tmp_path, monkeypatch):
+    store = make_store(tmp_path, batch_size=2)
+    flush_threads = []
+    original_flush = store.flush
+
+    def recording_flush():
+        flush_threads.append(threading.current_thread().name)
+        return original_flush()
+
+    monkeypatch.setattr(store, "flush", recording_flush)
+    store.put("1", Product("1", "Первый"))
+    store.put("2", Product("2", "Второй"))
+    store.close()
+
+    assert flush_threads and flush_threads[0].startswith("product-store")
+    reopened = make_store(tmp_path)
+    assert reopened.get("2")[0] == Product("2", "Второй")
+    reopened.close()
+
+
+def test_aget_reads_store_off_the_loop(tmp_path):
+    store = make_store(tmp_path)
+    store.put("123456", Product("123456", "Кроссовки", price=1299.0))
+    store.flush()
+
+    cache = ProductCache(ttl=3600)
+    cache.attach_store(store)
+    loop_thread = threading.get_ident()
+    read_threads = []
+    original_get = store.get
+
+    def recording_get(article):
+        read_threads.append(threading.get_ident())
+        return original_get(article)
+
+    store.get = recording_get
+    product = asyncio.run(cache.aget("123456"))
+
+    assert product == Product("123456", "Кроссовки", price=1299.0)
+    assert read_threads and loop_thread not in read_threads
+    # Запись перенесена в память: повторное чтение не обращается к хранилищу
+    assert asyncio.run(cache.aget("123456")) == product
+    assert len(read_threads) == 1
+    store.close()
+
+
+def test_get_without_store_skips_disk(tmp_path):
+    store = make_store(tmp_path)
+    store.put("1", Product("1", "Первый"))
+    store.flush()
+    cache = ProductCache(ttl=3600)
+    cache.attach_store(store)
+
+    assert cache.get("1", use_store=False) is None
+    assert cache.get("1") == Product("1", "Первый")
+    store.close()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Тесты адаптивного ограничения частоты запросов (rate_limiter.py)"""
+
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import (DECREASE_COOLDOWN, DECREASE_FACTOR, INCREASE_INTERVAL, INCREASE_STEP,
+                          MIN_RATE, RateLimitExceeded, RateLimiter, TokenBucket)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_bucket(monkeypatch, rate=10.0, burst=10):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return TokenBucket(rate, burst), clock
+
+
+def test_on_throttle_halves_rate_and_drains_tokens(monkeypatch):
+    bucket, _ = make_bucket(monkeypatch)
+    assert bucket.on_throttle() is True
+    assert bucket.rate == 10.0 * DECREASE_FACTOR
+    assert bucket.throttled == 1
+    # Накопленный запас сброшен: следующий запрос ждет токен
+    assert bucket.reserve() > 0
+
+
+def test_on_throttle_respects_cooldown(monkeypatch):
+    bucket, clock = make_bucket(monkeypatch)
+    assert bucket.on_throttle() is True
+    clock.now += DECREASE_COOLDOWN / 2
+    assert bucket.on_throttle() is False
+    assert bucket.rate == 10.0 * DECREASE_FACTOR
+
+    clock.now += DECREASE_COOLDOWN
+    assert bucket.on_throttle() is True
+    assert bucket.rate == 10.0 * DECREASE_FACTOR ** 2
+    assert bucket.throttled == 2
+
+
+def test_on_throttle_does_not_go_below_min_rate(monkeypatch):
+    bucket, clock = make_bucket(monkeypatch, rate=MIN_RATE * 1.5)
+    for _ in range(5):
+        bucket.on_throttle()
+        clock.now += DECREASE_COOLDOWN
+    assert bucket.rate == MIN_RATE
+
+
+def test_throttle_postpones_increase(monkeypatch):
+    bucket, clock = make_bucket(monkeypatch)
+    clock.now += INCREASE_INTERVAL
+    bucket.on_throttle()
+    bucket.on_success()
+    assert bucket.rate == 10.0 * DECREASE_FACTOR
+
+    clock.now += INCREASE_INTERVAL
+    bucket.on_success()
+    assert bucket.rate == 10.0 * DECREASE_FACTOR + INCREASE_STEP
+
+
+def test_feedback_throttles_only_on_throttle_statuses(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    limiter = RateLimiter(rate=10.0)
+    limiter.feedback("search.wb.ru", 503)
+    assert limiter._bucket("search.wb.ru").rate == 10.0
+    limiter.feedback("search.wb.ru", 429)
+    assert limiter._bucket("search.wb.ru").rate == 10.0 * DECREASE_FACTOR
+    clock.now += DECREASE_COOLDOWN
+    limiter.feedback("search.wb.ru", 403)
+    assert limiter._bucket("search.wb.ru").rate == 10.0 * DECREASE_FACTOR ** 2
+    assert limiter._bucket("card.wb.ru").rate == 10.0
+
+
+def test_reserve_rejects_wait_longer_than_max(monkeypatch):
+    bucket, _ = make_bucket(monkeypatch, rate=1.0, burst=1)
+    assert bucket.reserve(max_wait=2) == 0
+    assert bucket.reserve(max_wait=2) == 1.0
+    assert bucket.reserve(max_wait=2) == 2.0
+    with pytest.raises(RateLimitExceeded):
+        bucket.reserve(max_wait=2)
+    # Отклоненный запрос не увеличивает долг
+    assert bucket.tokens == -2
+    assert bucket.rejected == 1
+
+
+def test_cancelled_acquire_refunds_token(monkeypatch):
+    limiter = RateLimiter(rate=1.0, burst=1)
+    bucket = limiter._bucket("host")
+    bucket.reserve()
+
+    async def main():
+        task = asyncio.ensure_future(limiter.acquire("host"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    # Долг отмененного ожидания возвращен: следующий запрос ждет не дольше, чем без него
+    assert bucket.reserve() <= 1.0
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Тесты объединения одинаковых запросов (single_flight.py)"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight, ThreadSingleFlight
+
+
+def test_concurrent_calls_share_one_request():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "товар"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("123456", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["товар"] * 5
+    assert calls == [1]
+    assert flight.shared == 4
+    assert len(flight) == 0
+
+
+def test_different_keys_and_later_calls_are_separate():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    async def main():
+        first = await asyncio.gather(flight.do("1", lambda: fetch("1")), flight.do("2", lambda: fetch("2")))
+        second = await flight.do("1", lambda: fetch("1"))
+        return first, second
+
+    assert asyncio.run(main()) == (["1", "2"], "1")
+    assert calls == ["1", "2", "1"]
+
+
+def test_exception_reaches_all_waiters():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("нет ответа")
+
+    async def main():
+        return await asyncio.gather(flight.do("1", fetch), flight.do("1", fetch), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_request():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "товар"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("1", fetch))
+        second = asyncio.ensure_future(flight.do("1", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "товар"
+
+
+def test_thread_single_flight_shares_result():
+    flight = ThreadSingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "товар"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flight.do, "1", fetch)
+        started.wait(5)
+        followers = [executor.submit(flight.do, "1", fetch) for _ in range(3)]
+        while flight.shared < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        results = [leader.result()] + [future.result() for future in followers]
+
+    assert results == ["товар"] * 4
+    assert calls == [1]
+    assert len(flight) == 0
+
+
+def test_thread_single_flight_propagates_exception():
+    flight = ThreadSingleFlight("test")
+
+    def fetch():
+        raise ValueError("ошибка")
+
+    with pytest.raises(ValueError):
+        flight.do("1", fetch)
+    assert len(flight) == 0
+
+
+def test_request_is_cancelled_when_all_waiters_leave():
+    flight = SingleFlight("test")
+    cancelled = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "товар"
+
+    async def fresh():
+        return "новый"
+
+    async def main():
+        waiters = [asyncio.ensure_future(flight.do("1", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        # Следующий вызов не присоединяется к отмененному запросу
+        result = await flight.do("1", fresh)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == "новый"
+    assert cancelled == [True]
+    assert len(flight) == 0
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Тесты обработки обновлений по чатам (update_processor.py)"""
+
+import asyncio
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update
+
+from update_processor import ChatOrderedUpdateProcessor, chat_key
+
+
+def make_update(update_id, chat_id):
+    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+    message = Message(message_id=update_id, date=datetime.now(timezone.utc), chat=chat, text=str(update_id))
+    return Update(update_id=update_id, message=message)
+
+
+def test_chat_key():
+    assert chat_key(make_update(1, 42)) == 42
+    assert chat_key(object()) is None
+
+
+def test_updates_of_one_chat_run_in_order_others_in_parallel():
+    events = []
+
+    async def handle(name, delay):
+        events.append(("start", name))
+        await asyncio.sleep(delay)
+        events.append(("end", name))
+
+    async def main():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=8)
+        # Первое сообщение чата 1 самое долгое: второе и третье ждут его, чат 2 - нет
+        await asyncio.gather(
+            processor.process_update(make_update(1, 1), handle("1a", 0.05)),
+            processor.process_update(make_update(2, 1), handle("1b", 0.0)),
+            processor.process_update(make_update(3, 2), handle("2a", 0.01)),
+            processor.process_update(make_update(4, 1), handle("1c", 0.0)),
+        )
+        return processor
+
+    processor = asyncio.run(main())
+    chat_one = [event for event in events if event[1].startswith("1")]
+    assert chat_one == [("start", "1a"), ("end", "1a"), ("start", "1b"), ("end", "1b"),
+                        ("start", "1c"), ("end", "1c")]
+    # Чат 2 обработан, пока чат 1 ждал первое сообщение
+    assert events.index(("end", "2a")) < events.index(("end", "1a"))
+    stats = processor.stats()
+    assert stats["processed"] == 4
+    assert stats["chats"] == 0
+    assert stats["max_chat_depth_seen"] == 3
+
+
+def test_failed_update_does_not_block_chat():
+    handled = []
+
+    async def failing():
+        raise RuntimeError("ошибка обработчика")
+
+    async def handle(name):
+        handled.append(name)
+
+    async def main():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=2)
+        results = await asyncio.gather(
+            processor.process_update(make_update(1, 1), failing()),
+            processor.process_update(make_update(2, 1), handle("next")),
+            return_exceptions=True,
+        )
+        return results
+
+    results = asyncio.run(main())
+    assert isinstance(results[0], RuntimeError)
+    assert handled == ["next"]
+
+
+def test_concurrency_limit_across_chats():
+    running = []
+    peak = []
+
+    async def handle():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    async def main():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=2)
+        await asyncio.gather(*(processor.process_update(make_update(index, index), handle())
+                               for index in range(1, 7)))
+
+    asyncio.run(main())
+    assert max(peak) == 2
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Тесты ограничения частоты запросов пользователей (user_limiter.py)"""
+
+import user_limiter
+from user_limiter import UserRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(monkeypatch, limit=10, window=60):
+    clock = FakeClock()
+    monkeypatch.setattr(user_limiter.time, "time", clock)
+    return UserRateLimiter(limit, window), clock
+
+
+def test_burst_is_capped_at_limit(monkeypatch):
+    limiter, _ = make_limiter(monkeypatch)
+    assert sum(limiter.allow("user") for _ in range(30)) == 10
+    assert limiter.stats()["rejected"] == 20
+
+
+def test_no_window_exceeds_limit(monkeypatch):
+    """Запросы каждые 3 с в течение 5 минут: в любом окне 60 с не больше 10 разрешенных"""
+    limiter, clock = make_limiter(monkeypatch)
+    allowed = []
+    for _ in range(100):
+        if limiter.allow("user"):
+            allowed.append(clock.now)
+        clock.now += 3
+    for start in allowed:
+        assert sum(start <= hit < start + 60 for hit in allowed) <= 10
+
+
+def test_slot_frees_when_oldest_request_leaves_window(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, limit=2, window=10)
+    assert limiter.allow("user")
+    clock.now += 5
+    assert limiter.allow("user")
+    assert not limiter.allow("user")
+    clock.now += 5
+    assert limiter.allow("user")
+    assert not limiter.allow("user")
+
+
+def test_users_are_limited_separately(monkeypatch):
+    limiter, _ = make_limiter(monkeypatch, limit=1)
+    assert limiter.allow("a")
+    assert limiter.allow("b")
+    assert not limiter.allow("a")
+
+
+def test_idle_users_are_evicted(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, limit=2, window=10)
+    limiter.allow("a")
+    limiter.allow("b")
+    clock.now += 11
+    assert limiter.evict_idle() == 2
+    assert len(limiter) == 0
+
+
+def test_dump_and_restore_keep_the_window(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, limit=2, window=10)
+    limiter.allow("user")
+    limiter.allow("user")
+    restored = UserRateLimiter(2, 10)
+    restored.restore(limiter.dump())
+    assert not restored.allow("user")
+    clock.now += 10
+    assert restored.allow("user")
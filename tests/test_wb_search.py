@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Тесты поиска товаров (wb_search.py)"""
+
+import asyncio
+
+import wb_search
+
+
+class FakeResponse:
+    def __init__(self, status, data=None):
+        self.status = status
+        self._data = data or {}
+
+    def json(self):
+        return self._data
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def get(self, url, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+CARD = {"id": 123456, "name": "Кроссовки", "brand": "Бренд",
+        "sizes": [{"price": {"product": 129900}, "stocks": [{"qty": 3}]}]}
+
+
+def search_with(monkeypatch, responses):
+    client = FakeClient(responses)
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(wb_search, "get_http_client", lambda: client)
+    monkeypatch.setattr(wb_search.asyncio, "sleep", fake_sleep)
+    results = asyncio.run(wb_search._search_products_async("кроссовки", use_proxy=False))
+    return results, client, sleeps
+
+
+def test_retry_after_429_waits_with_growing_backoff(monkeypatch):
+    results, client, sleeps = search_with(monkeypatch, [
+        FakeResponse(429), FakeResponse(429), FakeResponse(200, {"data": {"products": [CARD]}}),
+    ])
+    assert [product.article for product in results] == ["123456"]
+    assert results[0].price == 1299.0
+    assert client.calls == 3
+    assert len(sleeps) == 2
+    assert wb_search.THROTTLE_BACKOFF_MIN <= sleeps[0] <= wb_search.THROTTLE_BACKOFF_MAX
+    assert 2 * wb_search.THROTTLE_BACKOFF_MIN <= sleeps[1] <= 2 * wb_search.THROTTLE_BACKOFF_MAX
+
+
+def test_no_pause_after_last_429(monkeypatch):
+    results, client, sleeps = search_with(monkeypatch, [FakeResponse(429)] * wb_search.MAX_RETRIES)
+    assert results == []
+    assert client.calls == wb_search.MAX_RETRIES
+    assert len(sleeps) == wb_search.MAX_RETRIES - 1
+
+
+def test_sync_search_goes_through_request_sync(monkeypatch):
+    """Синхронный поиск использует общий пул прокси (request_sync), а не случайный прокси из списка"""
+    calls = []
+
+    def fake_request_sync(method, url, **kwargs):
+        calls.append((method, url, kwargs))
+        response = wb_search.requests.Response()
+        response.status_code = 200
+        response._content = b'{"data": {"products": []}}'
+        return response
+
+    monkeypatch.setattr(wb_search, "request_sync", fake_request_sync)
+    assert wb_search._search_products("кроссовки", use_proxy=True, proxy_list=["http://proxy:1"]) == []
+    assert len(calls) == 1
+    method, url, kwargs = calls[0]
+    assert (method, url, kwargs["use_proxy"]) == ("GET", wb_search.SEARCH_URL, True)
+    assert "proxies" not in kwargs
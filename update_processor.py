@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Параллельная обработка обновлений Telegram с сохранением порядка внутри чата.
+
+Обновления разных чатов обрабатываются одновременно (не больше
+UPDATE_CONCURRENCY), поэтому долгий поиск одного пользователя не задерживает
+остальных. Обновления одного чата выстраиваются в очередь и обрабатываются
+строго по порядку поступления. Обновление сначала ждет своей очереди в чате и
+только потом занимает слот обработки: сообщения, ожидающие в очереди своего
+чата, не занимают слоты других чатов.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))  # Обновлений, обрабатываемых одновременно
+UPDATE_QUEUE_LIMIT = int(os.getenv("UPDATE_QUEUE_LIMIT", "1000"))  # Обновлений в обработке и в очередях
+
+
+def chat_key(update: object) -> Optional[Hashable]:
+    """Возвращает ключ очереди обновления (чат, иначе пользователь) или None, если порядок не важен"""
+    if isinstance(update, Update):
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return update.effective_user.id
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обработчик обновлений с очередью на каждый чат.
+
+    Семафор базового класса ограничивает общее число принятых обновлений
+    (max_pending), отдельный семафор - число одновременно выполняемых.
+    Очередь чата - цепочка future: каждое обновление ждет завершения
+    предыдущего обновления того же чата.
+    """
+
+    def __init__(self, max_concurrent_updates: int = UPDATE_CONCURRENCY, max_pending: int = UPDATE_QUEUE_LIMIT):
+        super().__init__(max(max_pending, max_concurrent_updates))
+        self.limit = max_concurrent_updates
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._tails: Dict[Hashable, asyncio.Future] = {}  # Последнее обновление в очереди чата
+        self._depth: Dict[Hashable, int] = {}  # Обновлений в очереди чата (включая выполняемое)
+        self.running = 0  # Обновлений выполняется сейчас
+        self.processed = 0  # Обновлений обработано
+        self.max_depth_seen = 0  # Наибольшая длина очереди одного чата
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """
+        Обрабатывает обновление после предыдущих обновлений того же чата
+
+        Args:
+            update: Обновление
+            coroutine: Корутина обработки обновления
+        """
+        key = chat_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        previous = self._tails.get(key)
+        done = asyncio.get_running_loop().create_future()
+        self._tails[key] = done
+        depth = self._depth.get(key, 0) + 1
+        self._depth[key] = depth
+        if depth > self.max_depth_seen:
+            self.max_depth_seen = depth
+        try:
+            if previous is not None:
+                try:
+                    await asyncio.shield(previous)
+                except asyncio.CancelledError:
+                    # Обработка отменена до начала (остановка бота)
+                    if asyncio.iscoroutine(coroutine):
+                        coroutine.close()
+                    raise
+            await self._run(coroutine)
+        finally:
+            done.set_result(None)
+            if self._tails.get(key) is done:
+                del self._tails[key]
+            self._depth[key] -= 1
+            if not self._depth[key]:
+                del self._depth[key]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        async with self._slots:
+            self.running += 1
+            try:
+                await coroutine
+            finally:
+                self.running -= 1
+                self.processed += 1
+
+    async def initialize(self) -> None:
+        """Ничего не делает"""
+
+    async def shutdown(self) -> None:
+        """Ничего не делает: незавершенные обновления останавливает Application"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает глубину очередей и число выполняемых обновлений"""
+        pending = self.current_concurrent_updates
+        return {
+            "running": self.running,
+            "waiting": pending - self.running,  # Ждут очереди своего чата или свободного слота
+            "chats": len(self._depth),  # Чатов с обновлениями в обработке
+            "max_chat_depth": max(self._depth.values(), default=0),
+            "max_chat_depth_seen": self.max_depth_seen,
+            "processed": self.processed,
+        }
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Ограничения частоты запросов пользователей.
+
+Состояние пользователя ограничено по размеру (не больше limit времен запросов
+или один счетчик), проверка выполняется за O(1). Записи неактивных пользователей
+удаляются по ходу работы, поэтому память зависит от числа активных пользователей,
+а не от всех, кто когда-либо писал боту.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import date
+from itertools import islice
+from typing import Any, Deque, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+EVICT_PER_CALL = 2  # Сколько устаревших записей проверять при каждом обращении
+
+
+class UserRateLimiter:
+    """
+    Ограничение "limit запросов за window секунд" в скользящем окне.
+
+    Для пользователя хранится кольцевой буфер (deque с maxlen=limit) времен
+    последних limit разрешенных запросов. Запрос разрешается, если буфер не заполнен
+    или самый старый запрос в нем вышел за окно, поэтому в любом окне длиной window
+    разрешается не больше limit запросов. Словарь упорядочен по времени последнего
+    разрешенного запроса: записи в начале, у которых последний запрос вышел
+    за окно, эквивалентны отсутствию записи и удаляются.
+    """
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._hits: Dict[Hashable, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0  # Количество отклоненных запросов
+
+    def __len__(self) -> int:
+        return len(self._hits)
+
+    def _evict(self, now: float, budget: Optional[int] = None) -> int:
+        """Удаляет записи из начала словаря, у которых все запросы вышли за окно (не больше budget)"""
+        removed = 0
+        for key in list(islice(self._hits, budget)):
+            if self._hits[key][-1] > now - self.window:
+                break
+            del self._hits[key]
+            removed += 1
+        return removed
+
+    def allow(self, key: Hashable) -> bool:
+        """
+        Проверяет лимит и, если он не превышен, учитывает запрос
+
+        Args:
+            key: Идентификатор пользователя
+
+        Returns:
+            bool: True, если запрос разрешен
+        """
+        now = time.time()
+        with self._lock:
+            self._evict(now, EVICT_PER_CALL)
+            hits = self._hits.get(key)
+            if hits is not None and len(hits) == self.limit and hits[0] > now - self.window:
+                self.rejected += 1
+                return False
+            if hits is None:
+                hits = deque(maxlen=self.limit)
+            else:
+                # Запись переносится в конец словаря, чтобы порядок оставался по времени обновления
+                del self._hits[key]
+            # В заполненном буфере новый запрос вытесняет самый старый
+            hits.append(now)
+            self._hits[key] = hits
+            return True
+
+    def evict_idle(self) -> int:
+        """
+        Удаляет все записи пользователей, не упирающихся в лимит
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        with self._lock:
+            return self._evict(time.time())
+
+    def dump(self) -> Dict[str, Any]:
+        """Возвращает состояние для сохранения (только запросы, попадающие в окно)"""
+        now = time.time()
+        with self._lock:
+            return {"hits": [[key, [hit for hit in hits if hit > now - self.window]]
+                             for key, hits in self._hits.items() if hits[-1] > now - self.window]}
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        """Восстанавливает состояние, сохраненное dump()"""
+        now = time.time()
+        with self._lock:
+            for key, hits in sorted(data.get("hits", []), key=lambda item: item[1][-1]):
+                hits = [hit for hit in hits if now - self.window < hit <= now]
+                if hits:
+                    self._hits.pop(key, None)
+                    self._hits[key] = deque(hits, maxlen=self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает количество отслеживаемых пользователей и отклоненных запросов"""
+        return {"users": len(self._hits), "rejected": self.rejected}
+
+
+class DailyQuota:
+    """
+    Дневная квота запросов на пользователя (сбрасывается в полночь).
+
+    Проверка и учет разделены: запрос учитывается только после успешного выполнения.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.day = date.today()
+        self._counts: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _roll(self) -> None:
+        today = date.today()
+        if today != self.day:
+            self.day = today
+            self._counts.clear()
+
+    def remaining(self, key: Hashable) -> int:
+        """
+        Возвращает количество оставшихся на сегодня запросов
+
+        Args:
+            key: Идентификатор пользователя
+
+        Returns:
+            int: Остаток квоты
+        """
+        with self._lock:
+            self._roll()
+            return max(0, self.limit - self._counts.get(key, 0))
+
+    def consume(self, key: Hashable) -> int:
+        """
+        Учитывает выполненный запрос
+
+        Args:
+            key: Идентификатор пользователя
+
+        Returns:
+            int: Остаток квоты после учета
+        """
+        with self._lock:
+            self._roll()
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+            return max(0, self.limit - count)
+
+    def dump(self) -> Dict[str, Any]:
+        """Возвращает состояние для сохранения"""
+        with self._lock:
+            self._roll()
+            return {"day": self.day.isoformat(), "counts": list(self._counts.items())}
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        """Восстанавливает состояние, сохраненное dump() (только за сегодня)"""
+        with self._lock:
+            self._roll()
+            if data.get("day") != self.day.isoformat():
+                return
+            for key, count in data.get("counts", []):
+                self._counts[key] = max(self._counts.get(key, 0), count)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает количество пользователей с запросами за сегодня"""
+        return {"users": len(self._counts), "day": self.day.isoformat()}
+
+
+class MessageCounter:
+    """
+    Счетчик сообщений пользователей с ограниченным числом записей.
+
+    При превышении max_users удаляется запись пользователя, писавшего раньше всех.
+    """
+
+    def __init__(self, max_users: int = 100000):
+        self.max_users = max_users
+        self._counts: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def increment(self, key: Hashable) -> int:
+        """
+        Увеличивает счетчик пользователя
+
+        Args:
+            key: Идентификатор пользователя
+
+        Returns:
+            int: Новое значение счетчика
+        """
+        with self._lock:
+            count = self._counts.pop(key, 0) + 1
+            self._counts[key] = count
+            if len(self._counts) > self.max_users:
+                del self._counts[next(iter(self._counts))]
+            return count
+
+
+def save_limits(path: str, limiters: Dict[str, Any]) -> None:
+    """
+    Сохраняет состояние ограничителей в JSON-файл
+
+    Args:
+        path: Путь к файлу
+        limiters: {имя: объект с методом dump()}
+    """
+    data = {name: limiter.dump() for name, limiter in limiters.items()}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def load_limits(path: str, limiters: Dict[str, Any]) -> None:
+    """
+    Загружает состояние ограничителей из JSON-файла, если он есть
+
+    Args:
+        path: Путь к файлу
+        limiters: {имя: объект с методом restore()}
+    """
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Не удалось прочитать состояние лимитов {path}: {e}")
+        return
+    for name, limiter in limiters.items():
+        if name in data:
+            limiter.restore(data[name])
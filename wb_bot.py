@@ -12,7 +12,6 @@ import requests
 from requests.exceptions import ConnectionError, Timeout, HTTPError, RequestException
 import re
 import uuid
-import socket
 import aiohttp
 from urllib.parse import quote
 from datetime import datetime
@@ -23,21 +22,50 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters, CallbackQueryHandler
 from telegram.error import BadRequest
-from collections import defaultdict
 import cloudscraper
 from cloudscraper.exceptions import CloudflareChallengeError
 
 # Импортируем функции из find_similar.py вместо similar_products
-from find_similar import get_similar_products, find_similar_cheaper_products, get_product_details
+from find_similar import get_similar_products, find_similar_cheaper_products, fetch_product_details, DETAILS_URL
 # Импортируем функции из wb_search.py
-from wb_search import extract_search_query, search_products, format_search_results
+from wb_search import extract_search_query, search_products, search_products_async, format_search_results
+# Общие HTTP-клиенты с пулами соединений
+from http_client import get_http_client, get_sync_session, get_scraper, start_http_client, close_http_client, request_sync, get_proxy_pool
+# Импортируем загрузку списка прокси
+from proxy_pool import load_proxy_list
+# Импортируем фоновый мониторинг доступности
+from health_monitor import HealthMonitor
+# Импортируем кеш данных о товарах
+from product_cache import ProductCache
+from product_store import ProductStore
+# Импортируем объединение одинаковых одновременных запросов
+from single_flight import SingleFlight
+# Импортируем пакетную загрузку карточек товаров
+from card_batcher import CardBatcher, CARD_DETAIL_URL
+# Импортируем хеджирование запросов к нескольким эндпоинтам
+from hedging import hedged_first, endpoint_key
+# Импортируем предохранители эндпоинтов
+from circuit_breaker import CLOSED, breakers, is_failure_status
+# Импортируем ограничитель частоты запросов к Wildberries
+from rate_limiter import rate_limiter
+# Импортируем ограничения запросов пользователей
+from user_limiter import UserRateLimiter, DailyQuota, save_limits, load_limits
+# Импортируем разбор HTML-страниц товаров
+from html_extractor import extract_product
+# Импортируем пул процессов для CPU-ёмкой работы
+from cpu_pool import cpu_pool
+# Импортируем модель товара
+from product import Product, PRODUCT_URL
 
-# Проверяем наличие модуля OpenAI
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+# Импортируем общий клиент OpenAI (модуль openai необязателен, см. OPENAI_AVAILABLE)
+from gpt_client import (OPENAI_AVAILABLE, EMPTY_REPLY, start_gpt_client, close_gpt_client,
+                        stream_chat, stream_to_message)
+# Импортируем кеш ответов ChatGPT
+from gpt_cache import gpt_cache, GPT_CACHE_PATH
+# Импортируем сводку о последних просмотренных товарах для ChatGPT
+from gpt_context import RecentProducts, build_product_context, context_scope
+# Импортируем метрики
+from metrics import MetricFamily, registry as metrics_registry, observe_handler, start_metrics_server, stop_metrics_server
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -55,7 +83,6 @@ YANDEX_MONEY = os.getenv("YANDEX_MONEY", "41001XXXXX")  # ЮMoney для дон
 MAX_CONCURRENT_REQUESTS = 5  # Максимальное количество одновременных запросов
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
 MAX_RETRIES = 3  # Максимальное количество повторных попыток при ошибках
-CACHE_LIFETIME = 12  # Время жизни кеша в часах
 MAX_REQUESTS_PER_MINUTE = 20  # Максимальное количество запросов в минуту
 RETRY_DELAY = 1  # Задержка между повторными попытками в секундах
 DONATE_TEXT = f"Поддержать проект: {YANDEX_MONEY}"  # Текст с просьбой поддержать проект
@@ -68,20 +95,12 @@ MAX_GPT_REQUESTS_PER_DAY = 5  # Максимальное количество з
 MAX_GPT_RESPONSE_LENGTH = 500 # Максимальная длина ответа ChatGPT в символах
 
 # --- НАСТРОЙКИ ПРОКСИ ---
-# Настройки HTTPS-прокси с авторизацией
-PROXY_ENABLED = True  # Флаг для включения/отключения использования прокси
+# Прокси задаются в .env: PROXY_LIST (через запятую), PROXY_FILE (файл со списком)
+# или PROXY_USER, PROXY_PASSWORD, PROXY_IP, PROXY_PORT (один прокси)
+PROXY_LIST = load_proxy_list()
+PROXY_ENABLED = os.getenv("PROXY_ENABLED", "1") != "0" and bool(PROXY_LIST)  # Флаг для включения/отключения использования прокси
 
-
-# Формируем строки для прокси
-PROXY_AUTH = f"{PROXY_USER}:{PROXY_PASSWORD}@{PROXY_IP}:{PROXY_PORT}"
-PROXY_URL_HTTP = f"http://{PROXY_AUTH}"
-PROXY_URL_HTTPS = f"http://{PROXY_AUTH}"  # HTTPS-прокси использует http:// в URL
-
-# Словарь с настройками прокси для requests
-PROXIES = {
-    "http": PROXY_URL_HTTP,
-    "https": PROXY_URL_HTTPS
-} if PROXY_ENABLED else None
+# Прокси для каждого запроса выбираются из пула (см. proxy_pool.py и http_client.request_sync)
 
 # Функция для выполнения HTTP запроса с прокси и fallback
 def make_request_with_fallback(url, method="GET", headers=None, params=None, data=None, timeout=30):
@@ -107,39 +126,21 @@ def make_request_with_fallback(url, method="GET", headers=None, params=None, dat
             "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
         }
     
-    # Пробуем сначала с прокси
-    if PROXY_ENABLED:
-        try:
-            logger.info(f"Выполняю запрос к {url} через прокси {PROXY_IP}:{PROXY_PORT}")
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=headers,
-                params=params,
-                data=data,
-                proxies=PROXIES,
-                timeout=timeout
-            )
-            logger.info(f"Запрос через прокси выполнен успешно, статус: {response.status_code}")
-            return response
-        except (requests.exceptions.RequestException, ConnectionError, TimeoutError) as e:
-            logger.warning(f"Ошибка при запросе через прокси: {str(e)}. Пробую без прокси.")
-    
-    # Fallback без прокси
+    # Прокси выбирается из пула, при ошибках - другой прокси, затем запрос напрямую
     try:
-        logger.info(f"Выполняю запрос к {url} без прокси")
-        response = requests.request(
-            method=method,
-            url=url,
+        logger.info(f"Выполняю запрос к {url}")
+        response = request_sync(
+            method,
+            url,
             headers=headers,
             params=params,
             data=data,
             timeout=timeout
         )
-        logger.info(f"Запрос без прокси выполнен успешно, статус: {response.status_code}")
+        logger.info(f"Запрос выполнен успешно, статус: {response.status_code}")
         return response
     except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка при запросе без прокси: {str(e)}")
+        logger.error(f"Ошибка при запросе к {url}: {str(e)}")
         return None
 # --- КОНЕЦ НАСТРОЕК ПРОКСИ ---
 
@@ -156,8 +157,11 @@ CHATGPT_SYSTEM_PROMPT = """Ты - помощник в Telegram-боте для 
 5. Если пользователь спрашивает о чем-то, что не связано с онлайн-покупками или Wildberries, вежливо переводи разговор в контекст покупок
 """
 
-# Словари для отслеживания использования AI
-gpt_user_requests = {}  # Формат: {user_id: [timestamp1, timestamp2, ...]}
+# Дневная квота запросов к ChatGPT (учитываются только успешные ответы)
+gpt_quota = DailyQuota(MAX_GPT_REQUESTS_PER_DAY)
+
+# Последние товары, просмотренные пользователями по артикулу (контекст для ChatGPT)
+recent_products = RecentProducts()
 
 # Логирование
 logging.basicConfig(
@@ -176,19 +180,45 @@ request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 # Добавляем константы для лимита запросов
 MAX_REQUESTS_PER_MINUTE = 10
 REQUESTS_FILE = "requests_log.csv"
+USER_LIMITS_PATH = os.getenv("USER_LIMITS_PATH", "user_limits.json")  # Файл состояния лимитов (пусто - не сохранять)
 
 # Кеш для хранения данных о товарах
-# Формат: {артикул: (данные, время_последнего_обновления)}
-product_cache = {}
+# Формат: {артикул: словарь с полями name, price, rating, brand, seller, feedbacks, article, url}
 CACHE_LIFETIME = 6  # Время жизни кеша в часах
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))  # Максимум товаров в кеше
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "32"))  # Ограничение объема кеша в мегабайтах
+PRODUCT_DB_PATH = os.getenv("PRODUCT_DB_PATH", "product_cache.db")  # Файл постоянного кеша товаров (пусто - отключен)
+
+# Одновременные запросы одного артикула ждут один общий запрос к Wildberries
+product_flight = SingleFlight("product")
+product_wb_flight = SingleFlight("wb_product")
+
+# Карточки товаров, запрошенные в одном окне, загружаются одним запросом
+CARD_BATCH_SIZE = int(os.getenv("CARD_BATCH_SIZE", "20"))  # Максимум артикулов в одном запросе
+CARD_BATCH_WINDOW = float(os.getenv("CARD_BATCH_WINDOW", "0.03"))  # Окно сбора пачки в секундах
+card_batcher = CardBatcher(window=CARD_BATCH_WINDOW, max_batch_size=CARD_BATCH_SIZE)
+MAX_ARTICLES_PER_MESSAGE = 5  # Максимум ссылок на товары, обрабатываемых из одного сообщения
+product_cache = ProductCache(
+    ttl=CACHE_LIFETIME * 3600,
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_MB * 1024 * 1024
+)
+
+# Артикулы, которых нет в ответе card.wb.ru, недолго не запрашиваются повторно
+NOT_FOUND_CACHE_TTL = float(os.getenv("NOT_FOUND_CACHE_TTL", "300"))  # В секундах
+missing_articles = ProductCache(ttl=NOT_FOUND_CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
 
-# Словарь для отслеживания запросов пользователей
-user_requests = defaultdict(list)
+# Лимиты запросов пользователей: {(max_requests, time_window): UserRateLimiter}
+user_limiters: Dict[Tuple[int, int], UserRateLimiter] = {}
+request_limiter = user_limiters[(MAX_REQUESTS_PER_MINUTE, 60)] = UserRateLimiter(MAX_REQUESTS_PER_MINUTE, 60)
 
 def check_request_limit(user_id=None, max_requests=MAX_REQUESTS_PER_MINUTE, time_window=60):
     """
     Проверяет, не превышен ли лимит запросов для пользователя.
     
+    В любом окне длиной time_window секунд пользователю разрешается не больше
+    max_requests запросов (скользящее окно, см. user_limiter.UserRateLimiter).
+    
     Args:
         user_id: ID пользователя (если None, то проверяется общий лимит)
         max_requests: Максимальное количество запросов в течение time_window
@@ -200,92 +230,46 @@ def check_request_limit(user_id=None, max_requests=MAX_REQUESTS_PER_MINUTE, time
     # Если не передан user_id, просто разрешаем запрос
     if user_id is None:
         return True
-        
-    current_time = time.time()
     
-    # Очищаем старые записи (старше time_window секунд)
-    user_requests[user_id] = [t for t in user_requests[user_id] if current_time - t < time_window]
+    limiter = user_limiters.get((max_requests, time_window))
+    if limiter is None:
+        limiter = user_limiters[(max_requests, time_window)] = UserRateLimiter(max_requests, time_window)
     
-    # Проверяем количество запросов
-    if len(user_requests[user_id]) >= max_requests:
+    if not limiter.allow(user_id):
         logger.warning(f"Пользователь {user_id} превысил лимит запросов ({max_requests} за {time_window} сек)")
         return False
-    
-    # Добавляем новый запрос
-    user_requests[user_id].append(current_time)
     return True
 
-# Проверка интернет-соединения
-def check_internet_connection():
-    """Проверяет доступность интернет-соединения"""
-    try:
-        # Пробуем подключиться к Google DNS
-        socket.create_connection(("8.8.8.8", 53), timeout=3)
-        logger.info("Интернет-соединение доступно")
-        return True
-    except OSError as e:
-        logger.error(f"Ошибка интернет-соединения: {e}")
-        return False
+# Основные хосты Wildberries, доступность которых проверяется
+WILDBERRIES_HOSTS = [
+    "wildberries.ru",
+    "wbxcatalog-ru.wildberries.ru",
+    "wbx-content-v2.wbstatic.net",
+    "card.wb.ru"
+]
 
-# Проверка доступности хостов Wildberries
-def check_wildberries_hosts():
-    """Проверяет доступность основных хостов Wildberries"""
-    hosts = [
-        "wildberries.ru",
-        "wbxcatalog-ru.wildberries.ru",
-        "wbx-content-v2.wbstatic.net",
-        "card.wb.ru"
-    ]
-    
-    results = {}
-    for host in hosts:
-        try:
-            socket.getaddrinfo(host, 80)
-            results[host] = True
-            logger.info(f"Хост {host} доступен")
-        except socket.gaierror as e:
-            results[host] = False
-            logger.warning(f"Ошибка разрешения имени хоста {host}: {e}")
-    
-    return results
+# Фоновый мониторинг: обработчики читают его состояние без сетевых запросов
+health_monitor = HealthMonitor(WILDBERRIES_HOSTS)
 
 # Функция для получения случайного прокси
 def get_random_proxy():
     """Возвращает случайный прокси из списка прокси"""
-    if not PROXY_LIST:
+    if not PROXY_ENABLED:
         return None
     return random.choice(PROXY_LIST)
 
-# Создание scraper с прокси (если включено)
+# Общая сессия для синхронных запросов
 def create_scraper_instance():
     """
-    Создает экземпляр scraper для запросов к Wildberries
+    Возвращает общую сессию для запросов к Wildberries
+    
+    Сессия создается один раз и переиспользует соединения. Прокси в ней не задан:
+    запросы с прокси выполняются через request_sync(..., session=...).
     
     Returns:
-        requests.Session: Экземпляр сессии с настроенными заголовками
+        requests.Session: Общая сессия с настроенными заголовками
     """
-    # Создаем сессию
-    session = requests.Session()
-    
-    # Устанавливаем заголовки для запросов
-    session.headers.update({
-        "User-Agent": USER_AGENT,
-        "Accept": "application/json, text/plain, */*",
-        "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
-        "Connection": "keep-alive",
-        "Origin": "https://www.wildberries.ru",
-        "Referer": "https://www.wildberries.ru/",
-    })
-    
-    # Добавляем прокси с авторизацией, если включено
-    if PROXY_ENABLED:
-        try:
-            logger.info(f"Настройка сессии с прокси {PROXY_IP}:{PROXY_PORT}")
-            session.proxies = PROXIES
-        except Exception as e:
-            logger.error(f"Ошибка при настройке прокси: {str(e)}")
-    
-    return session
+    return get_sync_session()
 
 async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Проверяет, подписан ли пользователь на канал"""
@@ -345,7 +329,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         logger.error(f"Ошибка при отправке сообщения /start: {e}")
         print(f"Ошибка при отправке сообщения: {e}")
 
-async def get_product_html_cloudscraper(article: str) -> Optional[str]:
+async def get_product_html_cloudscraper(article: str) -> Optional[bytes]:
     """
     Получение HTML-страницы товара с помощью cloudscraper
     
@@ -353,22 +337,19 @@ async def get_product_html_cloudscraper(article: str) -> Optional[str]:
         article: Артикул товара
     
     Returns:
-        HTML страницы или None, если не удалось получить
+        Тело HTML-страницы (bytes в UTF-8) или None, если не удалось получить
     """
     # Используем семафор для ограничения количества одновременных запросов
     async with request_semaphore:
         try:
-            # Создаем scraper для обхода защиты
-            scraper = cloudscraper.create_scraper(
-                browser={
-                    'browser': 'chrome',
-                    'platform': 'windows',
-                    'desktop': True
-                }
-            )
+            # Общий scraper: cookies Cloudflare и соединения переиспользуются между запросами
+            scraper = get_scraper()
             
             # Формируем URL и заголовки
             url = f"https://www.wildberries.ru/catalog/{article}/detail.aspx"
+            if not breakers.allow(url):
+                logger.info(f"Страница товара отключена предохранителем, пропускаю: {url}")
+                return None
             headers = {
                 "User-Agent": USER_AGENT,
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
@@ -380,52 +361,29 @@ async def get_product_html_cloudscraper(article: str) -> Optional[str]:
             # Устанавливаем таймаут для запроса
             timeout = 30  # 30 секунд
             
-            # Добавляем прокси, если включено
-            if PROXY_ENABLED:
-                try:
-                    logger.info(f"Настройка прокси {PROXY_IP}:{PROXY_PORT} для запроса HTML")
-                    scraper.proxies = PROXIES
-                except Exception as e:
-                    logger.error(f"Ошибка при настройке прокси: {str(e)}")
+            # cloudscraper синхронный, поэтому выполняем запросы в пуле потоков
+            loop = asyncio.get_event_loop()
             
-            # Попытка с прокси (если настроен)
+            # Прокси выбирается из пула, при ошибках - другой прокси, затем запрос напрямую
             try:
-                logger.info(f"Выполняю запрос HTML для артикула {article}" + 
-                           (f" через прокси {PROXY_IP}:{PROXY_PORT}" if PROXY_ENABLED and scraper.proxies else ""))
-                response = scraper.get(url, headers=headers, timeout=timeout)
+                logger.info(f"Выполняю запрос HTML для артикула {article}")
+                response = await loop.run_in_executor(
+                    None,
+                    lambda: request_sync("GET", url, session=scraper, headers=headers, timeout=timeout)
+                )
+                breakers.record(url, not is_failure_status(response.status_code), response.elapsed.total_seconds())
                 
                 # Проверяем статус ответа
                 if response.status_code == 200:
                     logger.info(f"HTML получен успешно для артикула {article}")
-                    return response.text
-                else:
-                    logger.warning(f"Не удалось получить HTML для артикула {article}. Статус: {response.status_code}")
-                    
-                    # Если прокси используется и запрос не удался, пробуем без прокси
-                    if PROXY_ENABLED and scraper.proxies:
-                        logger.info(f"Пробую получить HTML без прокси для артикула {article}")
-                        scraper.proxies = None
-                        response = scraper.get(url, headers=headers, timeout=timeout)
-                        if response.status_code == 200:
-                            logger.info(f"HTML успешно получен без прокси для артикула {article}")
-                            return response.text
-                    return None
+                    # Тело не декодируется здесь: разбор в пуле процессов принимает bytes в UTF-8
+                    return response.content
+                logger.warning(f"Не удалось получить HTML для артикула {article}. Статус: {response.status_code}")
+                return None
                     
             except requests.exceptions.RequestException as e:
-                logger.warning(f"Ошибка запроса с прокси: {str(e)}")
-                
-                # Если прокси используется и запрос не удался, пробуем без прокси
-                if PROXY_ENABLED and scraper.proxies:
-                    try:
-                        logger.info(f"Пробую получить HTML без прокси для артикула {article}")
-                        scraper.proxies = None
-                        response = scraper.get(url, headers=headers, timeout=timeout)
-                        if response.status_code == 200:
-                            logger.info(f"HTML успешно получен без прокси для артикула {article}")
-                            return response.text
-                    except Exception as fallback_error:
-                        logger.error(f"Ошибка при запросе без прокси: {str(fallback_error)}")
-                
+                breakers.record(url, False)
+                logger.warning(f"Ошибка запроса HTML для артикула {article}: {str(e)}")
                 return None
                 
         except cloudscraper.exceptions.CloudflareChallengeError:
@@ -441,281 +399,6 @@ async def get_product_html_cloudscraper(article: str) -> Optional[str]:
             logger.error(f"Ошибка при получении HTML для артикула {article}: {str(e)}")
             return None
 
-async def get_product_from_api(article: str) -> Optional[Dict[str, Any]]:
-    """
-    Получение данных о товаре напрямую через Wildberries API
-    
-    Args:
-        article: Артикул товара
-    
-    Returns:
-        Dict с данными товара или None, если товар не найден
-    """
-    try:
-        logger.info(f"Попытка получения данных о товаре {article} через API")
-        
-        # Создаем scraper для обхода защиты
-        scraper = cloudscraper.create_scraper(
-            browser={
-                'browser': 'chrome',
-                'platform': 'windows',
-                'desktop': True
-            }
-        )
-        
-        # Добавляем прокси, если включено
-        if PROXY_ENABLED:
-            try:
-                logger.info(f"Настройка прокси {PROXY_IP}:{PROXY_PORT} для запроса к API")
-                scraper.proxies = PROXIES
-            except Exception as e:
-                logger.error(f"Ошибка при настройке прокси для API: {str(e)}")
-        
-        # Современные API-эндпоинты Wildberries, наиболее стабильный первый
-        api_urls = [
-            f"https://card.wb.ru/cards/v2/detail?appType=1&curr=rub&dest=-6972066&spp=30&nm={article}",  # Основной API v2
-            f"https://card.wb.ru/cards/detail?nm={article}",  # Основной API v1
-            f"https://wbxcatalog-ru.wildberries.ru/nm-2-card/catalog?nm={article}",  # Каталог API
-        ]
-        
-        headers = {
-            "User-Agent": USER_AGENT,
-            "Accept": "application/json, text/html",
-            "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7"
-        }
-        
-        # Пробуем каждый API поочередно
-        for api_url in api_urls:
-            logger.info(f"Запрос к API: {api_url}")
-            try:
-                # Выполняем запрос с прокси
-                logger.info(f"Выполняю запрос к API для артикула {article}" + 
-                           (f" через прокси {PROXY_IP}:{PROXY_PORT}" if PROXY_ENABLED and scraper.proxies else ""))
-                
-                try:
-                    response = scraper.get(api_url, headers=headers, timeout=15)
-                except requests.exceptions.RequestException as e:
-                    logger.warning(f"Ошибка при запросе к API с прокси: {str(e)}")
-                    
-                    # Если используется прокси и произошла ошибка, пробуем без прокси
-                    if PROXY_ENABLED and scraper.proxies:
-                        logger.info(f"Пробую запрос к API без прокси для {api_url}")
-                        try:
-                            scraper.proxies = None
-                            response = scraper.get(api_url, headers=headers, timeout=15)
-                        except requests.exceptions.RequestException as fallback_error:
-                            logger.error(f"Также не удалось получить данные без прокси: {str(fallback_error)}")
-                            continue
-                
-                # Явно устанавливаем кодировку UTF-8
-                response.encoding = 'utf-8'
-                
-                if response.status_code == 200:
-                    # Обработка успешного ответа
-                    try:
-                        # Проверяем, это JSON или HTML
-                        content_type = response.headers.get('Content-Type', '').lower()
-                        
-                        if 'json' in content_type or api_url.endswith('.json'):
-                            # Это JSON-ответ
-                            try:
-                                data = response.json()
-                                logger.info(f"Получены данные через API: {response.status_code}")
-                                
-                                # Парсим результат в зависимости от формата ответа
-                                if 'data' in data and 'products' in data['data'] and len(data['data']['products']) > 0:
-                                    product = data['data']['products'][0]
-                                    
-                                    # Извлекаем имя товара
-                                    name = product.get('name')
-                                    if not name or '{{:~t(' in name or 'unsuccessfulLoad' in name:
-                                        logger.warning("В API-ответе отсутствует название товара или оно некорректное")
-                                        continue
-                                    
-                                    # Получаем актуальную цену товара
-                                    price = None
-                                    
-                                    # Проверяем разные варианты полей с ценой
-                                    if 'salePriceU' in product:
-                                        price = int(product['salePriceU']) / 100
-                                    elif 'priceU' in product:
-                                        price = int(product['priceU']) / 100
-                                    elif 'price' in product:
-                                        price_val = float(product['price'])
-                                        # Если цена выглядит как копейки, делим на 100
-                                        if price_val > 1000:
-                                            price = price_val / 100
-                                        else:
-                                            price = price_val
-                                    
-                                    # Проверяем наличие рейтинга
-                                    rating = None
-                                    if 'reviewRating' in product:
-                                        rating = float(product['reviewRating'])
-                                    elif 'rating' in product:
-                                        rating = float(product['rating'])
-                                    
-                                    # Проверка на валидность данных
-                                    if not price or price <= 10:
-                                        logger.warning("В API-ответе отсутствует цена товара или она некорректная")
-                                        
-                                    # Формируем результат с доступными данными
-                                    result = {
-                                        'name': name,
-                                        'article': article
-                                    }
-                                    
-                                    if price and price > 10:
-                                        result['price'] = price
-                                        
-                                    if rating is not None:
-                                        result['rating'] = rating
-                                    
-                                    logger.info(f"Найден товар через API: {name}, цена: {price}, рейтинг: {rating}")
-                                    return result
-                                    
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Ошибка декодирования JSON: {e}")
-                            except Exception as e:
-                                logger.error(f"Ошибка при обработке JSON данных: {e}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при обработке ответа API: {e}")
-                elif response.status_code == 404:
-                    logger.warning(f"Товар не найден в API (HTTP 404): {api_url}")
-                elif response.status_code == 403:
-                    logger.warning(f"Доступ к API запрещен (HTTP 403): {api_url}")
-                else:
-                    logger.warning(f"Ошибка запроса к API: HTTP {response.status_code}")
-            except ConnectionError as e:
-                logger.error(f"Ошибка соединения при запросе к API {api_url}: {e}")
-            except Timeout as e:
-                logger.error(f"Таймаут при запросе к API {api_url}: {e}")
-            except RequestException as e:
-                logger.error(f"Ошибка запроса к API {api_url}: {e}")
-        
-        # Если ни один API не вернул данные, возвращаем None
-        logger.warning(f"Не удалось получить данные о товаре {article} через API")
-        return None
-            
-    except Exception as e:
-        logger.error(f"Критическая ошибка при запросе API: {e}")
-        return None
-
-
-async def get_product_data_from_html(html: str, article: str) -> Optional[Dict[str, Any]]:
-    """
-    Извлекает данные о товаре из HTML-страницы
-    
-    Args:
-        html: HTML-страница товара
-        article: Артикул товара
-    
-    Returns:
-        Dict с данными товара или None, если товар не найден
-    """
-    if not html or len(html) < 100:
-        logger.warning(f"Получен пустой или слишком короткий HTML для артикула {article}")
-        return None
-        
-    try:
-        # Исправляем проблемы с кодировкой
-        if "ÐÐ½ÑÐµÑÐ½Ð" in html or "Ð¼Ð°Ð³Ð°Ð·Ð¸Ð½" in html:
-            logger.warning("Обнаружена проблема с кодировкой HTML")
-            try:
-                # Пробуем декодировать с разными кодировками
-                for encoding in ['windows-1251', 'cp1251', 'latin-1']:
-                    try:
-                        if isinstance(html, str):
-                            html_bytes = html.encode('utf-8', errors='replace')
-                            fixed_html = html_bytes.decode(encoding, errors='replace')
-                            # Проверяем успешность декодирования
-                            if "Интернет" in fixed_html and "магазин" in fixed_html:
-                                logger.info(f"Кодировка исправлена с помощью {encoding}")
-                                html = fixed_html
-                                break
-                    except Exception as e:
-                        logger.debug(f"Ошибка при пробе кодировки {encoding}: {e}")
-            except Exception as e:
-                logger.warning(f"Ошибка при исправлении кодировки: {e}")
-        
-        # Проверяем, содержит ли страница сообщение об ошибке
-        if any(error_text in html.lower() for error_text in 
-              ["извините, такой страницы не существует", 
-               "страница не найдена", 
-               "товар не найден"]):
-            logger.warning(f"Страница артикула {article} содержит сообщение об ошибке")
-            return None
-        
-        # Создаем объект BeautifulSoup для парсинга
-        soup = BeautifulSoup(html, 'lxml')
-        
-        # Извлекаем название товара
-        product_name = None
-        
-        # 1. Ищем в теге h1
-        h1_tag = soup.find('h1')
-        if h1_tag:
-            product_name = h1_tag.get_text().strip()
-            logger.info(f"Название из h1: {product_name}")
-        
-        # 2. Ищем в мета-тегах
-        if not product_name or len(product_name) < 3:
-            og_title = soup.find('meta', property='og:title')
-            if og_title and og_title.get('content'):
-                product_name = og_title.get('content').strip()
-                logger.info(f"Название из og:title: {product_name}")
-        
-        # 3. Ищем в JSON-LD
-        if not product_name or len(product_name) < 3:
-            script_tags = soup.find_all('script', type='application/ld+json')
-            for script in script_tags:
-                try:
-                    json_data = json.loads(script.string)
-                    if isinstance(json_data, dict) and 'name' in json_data:
-                        product_name = json_data['name']
-                        if product_name and len(product_name) > 3:
-                            logger.info(f"Название из JSON-LD: {product_name}")
-                            break
-                except (json.JSONDecodeError, AttributeError):
-                    continue
-        
-        # Проверяем валидность названия
-        if not product_name or len(product_name) < 3 or '{{:~t(' in product_name:
-            logger.warning(f"Не удалось найти валидное название товара для артикула {article}")
-            # Устанавливаем название по умолчанию
-            product_name = f"Товар {article}"
-        
-        # Извлекаем цену и рейтинг из HTML
-        price_value = extract_price(html)
-        rating_value = extract_rating(html)
-        
-        # Формируем результат
-        result = {
-            'name': product_name,
-            'article': article
-        }
-        
-        # Добавляем цену, если она найдена и валидна
-        if price_value and price_value > 10:
-            result['price'] = price_value
-        
-        # Добавляем рейтинг, если он найден и валиден
-        if rating_value is not None and 0 <= rating_value <= 5:
-            result['rating'] = rating_value
-        
-        # Логируем результат
-        if 'price' in result or 'rating' in result:
-            logger.info(f"Успешно извлечены данные из HTML: {result}")
-            return result
-        else:
-            logger.warning(f"Не удалось извлечь цену и рейтинг для артикула {article}")
-            # Всё равно возвращаем результат с именем
-            return result
-            
-    except Exception as e:
-        logger.error(f"Ошибка при парсинге HTML-страницы: {e}")
-        return None
-
 async def handle_cheaper_search(update: Update, context: ContextTypes.DEFAULT_TYPE, args: list) -> None:
     """
     Обрабатывает запрос на поиск более дешевых аналогов товара
@@ -769,19 +452,14 @@ async def handle_cheaper_search(update: Update, context: ContextTypes.DEFAULT_TY
         )
         
         # Получаем данные об исходном товаре
-        product_data = await get_product_data(article)
-        
-        # Проверяем, удалось ли получить данные
-        if isinstance(product_data, dict) and 'error' in product_data:
-            await loading_message.edit_text(f"❌ {product_data['error']}")
-            return
+        source_product = await get_product_data(article)
         
-        if not product_data or not product_data[0]:
+        if source_product is None:
             await loading_message.edit_text("❌ Не удалось получить информацию об исходном товаре.")
             return
+        recent_products.remember(user_id, article)
         
-        # Распаковываем данные о товаре
-        name, price, details_json = product_data
+        name, price, rating = source_product.name, source_product.price, source_product.rating
         
         # Если цена не указана явно, используем цену товара
         if not max_price and price:
@@ -791,15 +469,6 @@ async def handle_cheaper_search(update: Update, context: ContextTypes.DEFAULT_TY
         if not max_price:
             max_price = 10000  # Значение по умолчанию
         
-        # Пробуем получить рейтинг из details_json
-        rating = None
-        if details_json:
-            try:
-                details = json.loads(details_json)
-                rating = details.get('rating')
-            except json.JSONDecodeError:
-                pass
-        
         # Создаем сообщение с информацией об исходном товаре
         message = f"📦 *Исходный товар:* {name}\n"
         if price is not None:
@@ -837,11 +506,10 @@ async def handle_cheaper_search(update: Update, context: ContextTypes.DEFAULT_TY
         loading_message = await update.message.reply_text("🔍 Выполняется поиск похожих товаров...")
         
         # Ищем похожие товары
-        similar_products = await get_similar_products(
-            article, 
-            max_price=max_price, 
-            min_rating=min_rating
-        )
+        similar_products = [
+            product for product in await get_similar_products(article, source=source_product)
+            if product.price <= max_price and (product.rating or 0) >= min_rating
+        ]
         
         # Удаляем сообщение о загрузке
         try:
@@ -859,11 +527,10 @@ async def handle_cheaper_search(update: Update, context: ContextTypes.DEFAULT_TY
             
             # Добавляем информацию о каждом товаре
             for i, product in enumerate(similar_products, 1):
-                product_article = product.get('article')
-                product_name = product.get('name')
-                product_price = product.get('price')
-                product_rating = product.get('rating')
-                product_url = product.get('url')
+                product_name = product.name
+                product_price = product.price
+                product_rating = product.rating
+                product_url = product.url
                 
                 result_message += f"*{i}. {product_name[:50]}...*\n"
                 result_message += f"💰 Цена: {product_price:,.2f} ₽ "
@@ -910,385 +577,6 @@ async def handle_cheaper_search(update: Update, context: ContextTypes.DEFAULT_TY
             "❌ Произошла ошибка при поиске дешевых аналогов. Пожалуйста, попробуйте позже."
         )
 
-def get_wb_product_data(article: str, use_proxy=False, max_retries=3, delay=1):
-    """
-    Получение данных о товаре с Wildberries (оптимизированная версия).
-    
-    Args:
-        article: Артикул товара
-        use_proxy: Использовать прокси или нет
-        max_retries: Максимальное количество повторных попыток
-        delay: Задержка между попытками в секундах
-        
-    Returns:
-        dict: Данные о товаре или информация об ошибке
-    """
-    logger.info(f"Получение данных о товаре с артикулом {article}")
-    
-    # Проверка на пустой артикул
-    if not article or not article.strip():
-        logger.warning("Получен пустой артикул товара")
-        return {"error": "Артикул товара не может быть пустым"}
-    
-    try:
-        # Проверяем кеш
-        if article in product_cache:
-            data, timestamp = product_cache[article]
-            # Проверяем, не устарели ли данные
-            if datetime.now() - timestamp < timedelta(hours=CACHE_LIFETIME):
-                logger.info(f"Данные для артикула {article} получены из кеша")
-                return data
-            else:
-                logger.info(f"Данные для артикула {article} в кеше устарели")
-        
-        # Проверяем подключение к интернету
-        if not check_internet_connection():
-            return {"error": "Ошибка: Интернет недоступен"}
-        
-        # Функция для получения прокси
-        def get_random_proxy():
-            if not PROXY_LIST or not use_proxy:
-                return None
-            return random.choice(PROXY_LIST)
-        
-        # Создаем экземпляр scraper с возможностью обхода защиты
-        def create_scraper_instance():
-            scraper = cloudscraper.create_scraper(
-                browser={
-                    'browser': 'chrome',
-                    'platform': 'windows',
-                    'desktop': True
-                }
-            )
-            
-            # Устанавливаем заголовки
-            headers = {
-                "User-Agent": USER_AGENT,
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-                "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7"
-            }
-            scraper.headers.update(headers)
-            
-            # Добавляем прокси из глобальных настроек
-            if PROXY_ENABLED:
-                try:
-                    logger.info(f"Настройка прокси {PROXY_IP}:{PROXY_PORT} для запроса товара {article}")
-                    scraper.proxies = PROXIES
-                except Exception as e:
-                    logger.error(f"Ошибка при настройке прокси: {str(e)}")
-            
-            return scraper
-        
-        # Функция для получения API эндпоинтов
-        def get_api_endpoints(article):
-            endpoints = [
-                # Основной API v2 (самый надежный)
-                f"https://card.wb.ru/cards/v2/detail?appType=1&curr=rub&dest=-6972066&nm={article}",
-                # Основной API v1
-                f"https://card.wb.ru/cards/detail?nm={article}",
-                # Альтернативные API
-                f"https://wbxcatalog-ru.wildberries.ru/nm-2-card/catalog?nm={article}"
-            ]
-            logger.info(f"Подготовлены API эндпоинты для товара {article}: {len(endpoints)} шт.")
-            return endpoints
-        
-        # Функция для извлечения данных из HTML
-        def extract_from_html(html):
-            if not html:
-                return None
-                
-            # Исправляем кодировку если нужно
-            html = fix_encoding(html)
-            
-            # Проверяем наличие сообщений об ошибках на странице
-            error_texts = ["извините, такой страницы не существует", 
-                          "страница не найдена", 
-                          "товар не найден"]
-            
-            if any(error_text in html.lower() for error_text in error_texts):
-                logger.warning(f"Страница товара {article} содержит сообщение об ошибке")
-                return {"error": "Товар не найден"}
-            
-            try:
-                soup = BeautifulSoup(html, 'lxml')
-                
-                # Извлекаем название товара
-                name = None
-                
-                # Ищем в h1
-                h1 = soup.find('h1')
-                if h1:
-                    name = h1.get_text().strip()
-                
-                # Ищем в meta тегах
-                if not name or len(name) < 3:
-                    meta_title = soup.find('meta', property='og:title')
-                    if meta_title and meta_title.get('content'):
-                        name = meta_title.get('content').strip()
-                
-                # Ищем в JSON данных
-                if not name or len(name) < 3:
-                    scripts = soup.find_all('script', type='application/ld+json')
-                    for script in scripts:
-                        try:
-                            data = json.loads(script.string)
-                            if isinstance(data, dict) and 'name' in data:
-                                name = data['name']
-                                break
-                        except (json.JSONDecodeError, AttributeError):
-                            continue
-                
-                # Проверяем валидность имени
-                if not name or len(name) < 3 or '{{:~t(' in name:
-                    name = f"Товар {article}"
-                
-                # Извлекаем цену
-                price = None
-                
-                # Ищем цену в разных местах
-                price_element = soup.find(['span', 'ins', 'div'], class_=lambda c: c and 'price' in c.lower())
-                if price_element:
-                    price_text = price_element.get_text().strip()
-                    price_text = re.sub(r'[^\d.,]', '', price_text).replace(',', '.')
-                    try:
-                        price = float(price_text)
-                    except ValueError:
-                        pass
-                
-                # Если не нашли цену, ищем с помощью регулярных выражений
-                if not price:
-                    price_patterns = [
-                        r'(\d[\d\s]*[.,]?\d*)\s*(?:₽|руб)',
-                        r'"finalPrice":(\d+)',
-                        r'"price":(\d+)',
-                        r'<meta property="product:price:amount" content="(\d+\.?\d*)'
-                    ]
-                    
-                    for pattern in price_patterns:
-                        matches = re.findall(pattern, html)
-                        for match in matches:
-                            try:
-                                price_text = re.sub(r'[^\d.,]', '', match).replace(',', '.')
-                                price = float(price_text)
-                                if price > 10:  # Проверка на адекватность цены
-                                    break
-                            except ValueError:
-                                continue
-                        if price and price > 10:
-                            break
-                
-                # Извлекаем рейтинг
-                rating = None
-                
-                # Ищем рейтинг в разных местах
-                rating_element = soup.find(['span', 'div'], class_=lambda c: c and 'rating' in c.lower())
-                if rating_element:
-                    rating_text = rating_element.get_text().strip()
-                    rating_match = re.search(r'([\d.,]+)', rating_text)
-                    if rating_match:
-                        try:
-                            rating = float(rating_match.group(1).replace(',', '.'))
-                            if rating > 5:  # Если рейтинг больше 5, вероятно это не рейтинг
-                                rating = None
-                        except ValueError:
-                            pass
-                
-                # Если не нашли рейтинг, ищем с помощью регулярных выражений
-                if not rating:
-                    rating_patterns = [
-                        r'"rating":\s*"?([\d.,]+)"?',
-                        r'"reviewRating":\s*"?([\d.,]+)"?',
-                        r'ratingValue":\s*"?([\d.,]+)"?'
-                    ]
-                    
-                    for pattern in rating_patterns:
-                        matches = re.findall(pattern, html)
-                        for match in matches:
-                            try:
-                                rating_value = float(match.replace(',', '.'))
-                                if 0 <= rating_value <= 5:  # Проверка на адекватность рейтинга
-                                    rating = rating_value
-                                    break
-                            except ValueError:
-                                continue
-                        if rating is not None:
-                            break
-                
-                # Формируем результат
-                result = {
-                    'name': name,
-                    'article': article
-                }
-                
-                if price and price > 10:
-                    result['price'] = price
-                    
-                if rating is not None and 0 <= rating <= 5:
-                    result['rating'] = rating
-                
-                return result
-                
-            except Exception as e:
-                logger.error(f"Ошибка при извлечении данных из HTML: {e}")
-                return None
-        
-        # Функция для обработки ответа API
-        def process_api_response(response):
-            if not response or response.status_code != 200:
-                return None
-                
-            # Устанавливаем кодировку
-            response.encoding = 'utf-8'
-            
-            try:
-                data = response.json()
-                
-                # Обрабатываем ответ API v2
-                if 'data' in data and 'products' in data['data'] and data['data']['products']:
-                    product = data['data']['products'][0]
-                    
-                    # Извлекаем имя
-                    name = product.get('name')
-                    if not name or '{{:~t(' in name or 'unsuccessfulLoad' in name:
-                        return None
-                    
-                    # Находим цену
-                    price = None
-                    
-                    # Проверяем разные варианты полей с ценой
-                    if 'salePriceU' in product:
-                        price = int(product['salePriceU']) / 100
-                    elif 'priceU' in product:
-                        price = int(product['priceU']) / 100
-                    elif 'price' in product:
-                        price_val = float(product['price'])
-                        if price_val > 1000:  # Если цена в копейках
-                            price = price_val / 100
-                        else:
-                            price = price_val
-                    
-                    # Проверяем еще поля с ценой в разных местах структуры
-                    if not price or price <= 10:
-                        # Ищем в sizes и stocks
-                        if 'sizes' in product and product['sizes']:
-                            for size in product['sizes']:
-                                if 'stocks' in size and size['stocks']:
-                                    for stock in size['stocks']:
-                                        if 'priceU' in stock:
-                                            price = float(stock['priceU']) / 100
-                                            break
-                                if price and price > 10:
-                                    break
-                    
-                    # Ищем рейтинг
-                    rating = None
-                    if 'reviewRating' in product:
-                        rating = float(product['reviewRating'])
-                    elif 'rating' in product:
-                        rating = float(product['rating'])
-                    
-                    # Формируем результат
-                    result = {
-                        'name': name,
-                        'article': article
-                    }
-                    
-                    if price and price > 10:
-                        result['price'] = price
-                        
-                    if rating is not None and 0 <= rating <= 5:
-                        result['rating'] = rating
-                        
-                    # Добавляем ссылку на товар
-                    result['url'] = f"https://www.wildberries.ru/catalog/{article}/detail.aspx"
-                    
-                    return result
-                
-                return None
-                
-            except json.JSONDecodeError:
-                return None
-            except Exception as e:
-                logger.error(f"Ошибка при обработке ответа API: {e}")
-                return None
-        
-        # Основной код функции
-        scraper = create_scraper_instance()
-        
-        # 1. Пробуем получить данные через API
-        for attempt in range(max_retries):
-            try:
-                # Получаем список API эндпоинтов
-                api_endpoints = get_api_endpoints(article)
-                
-                for api_url in api_endpoints:
-                    try:
-                        logger.info(f"Запрос к API: {api_url}")
-                        response = scraper.get(api_url, timeout=10)
-                        
-                        if response.status_code == 200:
-                            # Обрабатываем успешный ответ
-                            result = process_api_response(response)
-                            if result:
-                                logger.info(f"Успешно получены данные через API: {api_url}")
-                                # Сохраняем результат в кеш
-                                product_cache[article] = (result, datetime.now())
-                                return result
-                        elif response.status_code == 404:
-                            logger.warning(f"Товар не найден в API: {api_url}")
-                        else:
-                            logger.warning(f"Ошибка запроса к API: HTTP {response.status_code}")
-                            
-                    except (RequestException, ConnectionError, Timeout) as e:
-                        logger.warning(f"Сетевая ошибка при запросе к API {api_url}: {e}")
-                
-                # Если API не сработали, пробуем получить HTML страницу
-                try:
-                    url = f"https://www.wildberries.ru/catalog/{article}/detail.aspx"
-                    logger.info(f"Запрос к странице товара: {url}")
-                    
-                    response = scraper.get(url, timeout=15)
-                    response.encoding = 'utf-8'  # Явно устанавливаем кодировку
-                    
-                    if response.status_code == 200:
-                        html_result = extract_from_html(response.text)
-                        if html_result:
-                            if 'error' in html_result:
-                                return html_result  # Возвращаем сообщение об ошибке
-                            else:
-                                # Добавляем URL к результату
-                                html_result['url'] = url
-                                logger.info(f"Успешно получены данные из HTML страницы")
-                                # Сохраняем результат в кеш
-                                product_cache[article] = (html_result, datetime.now())
-                                return html_result
-                    elif response.status_code == 404:
-                        logger.warning("Страница товара не найдена (HTTP 404)")
-                        return {"error": "Товар не найден"}
-                    else:
-                        logger.warning(f"Ошибка при запросе страницы товара: HTTP {response.status_code}")
-                        
-                except (RequestException, ConnectionError, Timeout) as e:
-                    logger.warning(f"Сетевая ошибка при запросе страницы товара: {e}")
-                
-                # Если это не последняя попытка, делаем паузу перед следующей
-                if attempt < max_retries - 1:
-                    time.sleep(delay)
-                    # Создаем новый scraper на случай блокировки
-                    scraper = create_scraper_instance()
-                    
-            except Exception as e:
-                logger.error(f"Общая ошибка при попытке {attempt+1}: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(delay)
-        
-        # Если все попытки неудачны
-        return {"error": "Не удалось получить данные о товаре"}
-        
-    except Exception as e:
-        logger.error(f"Критическая ошибка при получении данных о товаре {article}: {e}")
-        return {"error": f"Ошибка: {str(e)}"}
-
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик команды /help"""
     try:
@@ -1347,41 +635,139 @@ async def main() -> None:
     logger.info("Эта функция больше не используется для запуска бота. Используйте run_bot.py")
     # Эта функция сохранена для обратной совместимости, но больше не используется
 
-def fix_encoding(text: str) -> str:
+def collect_metrics() -> List[MetricFamily]:
     """
-    Исправляет проблемы с кодировкой текста
-    
+    Собирает метрики компонентов бота из их stats()
+
+    Returns:
+        List[MetricFamily]: Кеши, ограничители запросов, прокси, эндпоинты и пул процессов
+    """
+    caches = {"product": product_cache.stats(), "gpt": gpt_cache.stats()}
+    proxies = get_proxy_pool()
+    proxy_stats = proxies.stats() if proxies is not None else []
+    host_limits = rate_limiter.stats()
+    endpoints = breakers.stats()
+    pool = cpu_pool.stats()
+    cache_labels = ("cache",)
+    proxy_labels = ("proxy",)
+    return [
+        MetricFamily("bot_cache_hits_total", "counter", "Попадания в кеш (gpt: точные совпадения вопроса)",
+                     cache_labels, [((name,), stats["hits"]) for name, stats in caches.items()]),
+        MetricFamily("bot_cache_near_hits_total", "counter", "Попадания в кеш ChatGPT по почти одинаковому вопросу",
+                     cache_labels, [(("gpt",), caches["gpt"]["near_hits"])]),
+        MetricFamily("bot_cache_store_hits_total", "counter", "Промахи кеша товаров, найденные в хранилище на диске",
+                     cache_labels, [(("product",), caches["product"]["store_hits"])]),
+        MetricFamily("bot_cache_misses_total", "counter", "Промахи кеша",
+                     cache_labels, [((name,), stats["misses"]) for name, stats in caches.items()]),
+        MetricFamily("bot_cache_evictions_total", "counter", "Записи, вытесненные из кеша до истечения срока",
+                     cache_labels, [((name,), stats["evictions"]) for name, stats in caches.items()]),
+        MetricFamily("bot_cache_entries", "gauge", "Записей в кеше",
+                     cache_labels, [((name,), stats["entries"]) for name, stats in caches.items()]),
+        MetricFamily("bot_cache_hit_ratio", "gauge", "Доля попаданий в кеш с запуска",
+                     cache_labels, [((name,), stats["hit_rate"]) for name, stats in caches.items()]),
+        MetricFamily("bot_user_rate_limited_total", "counter", "Запросы пользователей, отклоненные лимитом частоты",
+                     ("limit",), [((f"{limit}/{window}s",), limiter.rejected)
+                                  for (limit, window), limiter in list(user_limiters.items())]),
+        MetricFamily("bot_gpt_quota_users", "gauge", "Пользователи, обращавшиеся к ChatGPT сегодня",
+                     (), [((), gpt_quota.stats()["users"])]),
+        MetricFamily("bot_upstream_rate_limit", "gauge", "Допустимая частота запросов к хосту (запр/с)",
+                     ("host",), [((host,), stats["rate"]) for host, stats in host_limits.items()]),
+        MetricFamily("bot_upstream_throttled_total", "counter", "Снижения частоты запросов к хосту после 403/429",
+                     ("host",), [((host,), stats["throttled"]) for host, stats in host_limits.items()]),
+        MetricFamily("bot_upstream_rejected_total", "counter", "Запросы к хосту, отклоненные из-за слишком долгого ожидания",
+                     ("host",), [((host,), stats["rejected"]) for host, stats in host_limits.items()]),
+        MetricFamily("bot_endpoint_success_ratio", "gauge", "Доля исправных ответов эндпоинта (circuit breaker)",
+                     ("endpoint",), [((key,), stats["success_rate"]) for key, stats in endpoints.items()]),
+        MetricFamily("bot_endpoint_open", "gauge", "Эндпоинт отключен circuit breaker (1 - открыт или пробный запрос)",
+                     ("endpoint",), [((key,), int(stats["state"] != CLOSED)) for key, stats in endpoints.items()]),
+        MetricFamily("bot_proxy_requests_total", "counter", "Запросы через прокси",
+                     proxy_labels, [((stats["proxy"],), stats["requests"]) for stats in proxy_stats]),
+        MetricFamily("bot_proxy_failures_total", "counter", "Неудачные запросы через прокси",
+                     proxy_labels, [((stats["proxy"],), stats["failures"]) for stats in proxy_stats]),
+        MetricFamily("bot_proxy_error_ratio", "gauge", "Доля ошибок прокси в последних запросах",
+                     proxy_labels, [((stats["proxy"],), stats["error_rate"]) for stats in proxy_stats]),
+        MetricFamily("bot_proxy_latency_seconds", "gauge", "Сглаженная задержка прокси",
+                     proxy_labels, [((stats["proxy"],), stats["latency"]) for stats in proxy_stats]),
+        MetricFamily("bot_proxy_available", "gauge", "Прокси доступен (1) или в карантине (0)",
+                     proxy_labels, [((stats["proxy"],), int(stats["available"])) for stats in proxy_stats]),
+        MetricFamily("bot_cpu_pool_tasks_total", "counter", "Задачи пула процессов (inline - выполнены в потоке бота)",
+                     ("mode",), [(("pool",), pool["completed"] - pool["inline"]), (("inline",), pool["inline"])]),
+    ]
+
+def collect_update_metrics(application) -> List[MetricFamily]:
+    """
+    Собирает метрики обработчика обновлений (см. update_processor)
+
     Args:
-        text: Текст, который может иметь проблемы с кодировкой
+        application: Экземпляр Application
+    """
+    processor = application.update_processor
+    if not hasattr(processor, "stats"):
+        return []
+    stats = processor.stats()
+    return [
+        MetricFamily("bot_updates_running", "gauge", "Обновления, обрабатываемые сейчас", (), [((), stats["running"])]),
+        MetricFamily("bot_updates_waiting", "gauge", "Обновления, ждущие очереди своего чата или свободного слота",
+                     (), [((), stats["waiting"])]),
+        MetricFamily("bot_update_chats", "gauge", "Чаты с обновлениями в обработке", (), [((), stats["chats"])]),
+        MetricFamily("bot_update_max_chat_depth", "gauge", "Наибольшая текущая очередь обновлений одного чата",
+                     (), [((), stats["max_chat_depth"])]),
+        MetricFamily("bot_updates_processed_total", "counter", "Обработанные обновления",
+                     (), [((), stats["processed"])]),
+    ]
+
+async def on_startup(application) -> None:
+    """
+    Инициализирует общие ресурсы бота при запуске приложения
     
-    Returns:
-        Исправленный текст
+    Args:
+        application: Экземпляр Application
+    """
+    await start_http_client(PROXY_LIST if PROXY_ENABLED else None)
+    start_gpt_client(OPENAI_API_KEY)
+    if GPT_CACHE_PATH:
+        gpt_cache.load(GPT_CACHE_PATH)
+    await cpu_pool.start()
+    if USER_LIMITS_PATH:
+        load_limits(USER_LIMITS_PATH, {"requests": request_limiter, "gpt": gpt_quota})
+    if PRODUCT_DB_PATH:
+        try:
+            product_cache.attach_store(ProductStore(PRODUCT_DB_PATH, ttl=CACHE_LIFETIME * 3600,
+                                                     decode=Product.from_dict))
+        except Exception as e:
+            logger.error(f"Не удалось открыть хранилище товаров {PRODUCT_DB_PATH}: {e}")
+    await health_monitor.start()
+    metrics_registry.register_collector("bot", collect_metrics)
+    metrics_registry.register_collector("updates", lambda: collect_update_metrics(application))
+    await start_metrics_server()
+
+async def on_shutdown(application) -> None:
     """
-    if not text:
-        return text
-        
-    # Проверяем наличие признаков неправильной кодировки
-    if "ÐÐ½ÑÐµÑÐ½Ð" in text or "Ð¼Ð°Ð³Ð°Ð·Ð¸Ð½" in text:
-        logger.debug("Обнаружена проблема с кодировкой, пытаюсь исправить")
-        
-        # Пробуем разные кодировки
-        for encoding in ['windows-1251', 'cp1251', 'latin-1', 'utf-8']:
-            try:
-                # Кодируем в байты и декодируем с другой кодировкой
-                text_bytes = text.encode('utf-8', errors='replace')
-                fixed_text = text_bytes.decode(encoding, errors='replace')
-                
-                # Проверяем, решена ли проблема
-                if ("Интернет" in fixed_text and "магазин" in fixed_text) or \
-                   ("цена" in fixed_text.lower()) or \
-                   ("товар" in fixed_text.lower()):
-                    logger.info(f"Кодировка исправлена с помощью {encoding}")
-                    return fixed_text
-            except Exception as e:
-                logger.debug(f"Ошибка при исправлении кодировки через {encoding}: {e}")
+    Освобождает общие ресурсы бота при остановке приложения
     
-    # Если текст не требует исправления или все попытки не удались, возвращаем исходный текст
-    return text
+    Args:
+        application: Экземпляр Application
+    """
+    await stop_metrics_server()
+    await health_monitor.stop()
+    await close_http_client()
+    await close_gpt_client()
+    await cpu_pool.stop()
+    if USER_LIMITS_PATH:
+        try:
+            save_limits(USER_LIMITS_PATH, {"requests": request_limiter, "gpt": gpt_quota})
+        except OSError as e:
+            logger.error(f"Не удалось сохранить состояние лимитов {USER_LIMITS_PATH}: {e}")
+    if GPT_CACHE_PATH:
+        try:
+            gpt_cache.save(GPT_CACHE_PATH)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить кеш ChatGPT {GPT_CACHE_PATH}: {e}")
+    store = product_cache.store
+    if store is not None:
+        # Сначала отключаем хранилище, чтобы новые записи не попали в закрываемую базу
+        product_cache.attach_store(None)
+        await asyncio.to_thread(store.close)
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик ошибок для бота"""
@@ -1418,8 +804,8 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if isinstance(error, (ConnectionError, Timeout, HTTPError, RequestException)):
             logger.warning(f"Сетевая ошибка: {error}. Проверяем соединение...")
             
-            # Проверяем соединение
-            if not check_internet_connection():
+            # Проверяем соединение по последнему результату фонового мониторинга
+            if not health_monitor.is_online():
                 logger.error("Соединение с интернетом потеряно. Ожидаем восстановления...")
                 
                 # Сообщаем пользователю, если возможно
@@ -1452,21 +838,21 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Логируем ошибку в обработчике ошибок
         logger.error(f"Ошибка в обработчике ошибок: {e}", exc_info=True)
         
+@observe_handler("handle_message")
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обрабатывает входящие сообщения
     """
     try:
-        # Проверка наличия Интернет-соединения
-        if not check_internet_connection():
+        # Проверка наличия Интернет-соединения (состояние обновляется в фоне)
+        if not health_monitor.is_online():
             await update.message.reply_text(
                 "❌ Нет подключения к Интернету. Пожалуйста, проверьте ваше соединение и попробуйте снова."
             )
             return
             
         # Проверка доступности хостов Wildberries
-        hosts = check_wildberries_hosts()
-        if not any(hosts.values()):
+        if not health_monitor.any_host_up():
             await update.message.reply_text(
                 "⚠️ Серверы Wildberries в данный момент недоступны. Пожалуйста, попробуйте позже."
             )
@@ -1501,8 +887,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 parse_mode=ParseMode.MARKDOWN
             )
             
-            # Выполняем поиск
-            results = search_products(search_query)
+            # Выполняем поиск асинхронно, не блокируя обработку сообщений других пользователей
+            results = await search_products_async(search_query)
             
             if results:
                 # Форматируем результаты
@@ -1557,10 +943,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         # Проверяем ссылку на Wildberries
         elif "wildberries.ru" in message_text.lower() or "wb.ru" in message_text.lower():
-            # Это ссылка на WB
-            article = None
+            # Это ссылка на WB (в сообщении может быть несколько ссылок)
+            articles = []
             
-            # Пробуем извлечь артикул из ссылки с помощью регулярного выражения
+            # Пробуем извлечь артикулы из ссылок с помощью регулярных выражений
             # Поддерживаем различные форматы URL
             patterns = [
                 r'wildberries\.ru/catalog/(\d+)/',  # Обычный URL товара
@@ -1570,13 +956,21 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             ]
             
             for pattern in patterns:
-                match = re.search(pattern, message_text)
-                if match:
-                    article = match.group(1)
-                    break
+                for match in re.finditer(pattern, message_text):
+                    if match.group(1) not in articles:
+                        articles.append(match.group(1))
             
-            if article:
-                await handle_article_request(update, context, article)
+            if len(articles) > MAX_ARTICLES_PER_MESSAGE:
+                logger.info(f"В сообщении {len(articles)} ссылок, обрабатываю первые {MAX_ARTICLES_PER_MESSAGE}")
+                articles = articles[:MAX_ARTICLES_PER_MESSAGE]
+            
+            if len(articles) == 1:
+                await handle_article_request(update, context, articles[0])
+            elif articles:
+                # Обрабатываем ссылки одновременно: их карточки попадут в один пакетный запрос
+                await asyncio.gather(
+                    *(handle_article_request(update, context, article) for article in articles)
+                )
             else:
                 await update.message.reply_text(
                     "❌ Не удалось извлечь артикул из ссылки. Проверьте ссылку и попробуйте снова."
@@ -1595,6 +989,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             "❌ Произошла ошибка при обработке вашего сообщения. Пожалуйста, попробуйте позже."
         )
 
+@observe_handler("handle_article_request")
 async def handle_article_request(update: Update, context: ContextTypes.DEFAULT_TYPE, article: str) -> None:
     """
     Обрабатывает запрос с артикулом товара
@@ -1613,7 +1008,7 @@ async def handle_article_request(update: Update, context: ContextTypes.DEFAULT_T
         )
         
         # Получаем данные о товаре
-        product_data = await get_product_data(article)
+        product = await get_product_data(article)
         
         # Удаляем сообщение о загрузке
         try:
@@ -1621,17 +1016,10 @@ async def handle_article_request(update: Update, context: ContextTypes.DEFAULT_T
         except Exception as e:
             logger.warning(f"Не удалось удалить сообщение о загрузке: {e}")
         
-        # Проверяем, является ли product_data словарем с ошибкой
-        if isinstance(product_data, dict) and 'error' in product_data:
-            error_message = f"⚠️ {product_data['error']}"
-            await update.message.reply_text(error_message)
-            return
-            
-        # Если product_data - кортеж (name, price, details_json)
-        if product_data and isinstance(product_data, tuple) and len(product_data) == 3:
+        if product is not None:
+            recent_products.remember(user_id, article)
             try:
-                # Распаковываем данные о товаре
-                name, price, details_json = product_data
+                name, price = product.name, product.price
                 
                 # Создаем сообщение с информацией о товаре
                 message = f"📦 *Товар:* {name}\n"
@@ -1663,49 +1051,37 @@ async def handle_article_request(update: Update, context: ContextTypes.DEFAULT_T
                                 price_str = str(price_int)
                         message += f"💰 Цена: {price_str} ₽\n"
                 
-                # Проверяем, есть ли детали товара
-                if details_json:
-                    try:
-                        # Парсим JSON с деталями товара
-                        details = json.loads(details_json)
-                        
-                        # Добавляем информацию о рейтинге, если есть
-                        if 'rating' in details and details['rating']:
-                            rating = float(details['rating'])
-                            
-                            # Корректное отображение рейтинга в виде золотых звёзд
-                            full_stars = min(5, int(rating))
-                            half_star = rating - int(rating) >= 0.5
-                            empty_stars = 5 - full_stars - (1 if half_star else 0)
-                            
-                            # Используем символы звезд для лучшего визуального отображения
-                            # ★ - золотая звезда (полная)
-                            # ✭ - полузвезда (можно заменить на другой символ)
-                            # ☆ - пустая звезда
-                            star_rating = '★' * full_stars
-                            if half_star:
-                                star_rating += '✭'
-                            star_rating += '☆' * empty_stars
-                            
-                            message += f"⭐️ *Рейтинг:* {rating:.1f} {star_rating}\n"
-                        
-                        # Добавляем информацию о бренде, если есть
-                        if 'brand' in details and details['brand']:
-                            brand = details['brand']
-                            message += f"🏭 *Бренд:* {brand}\n"
-                            
-                        # Добавляем информацию о продавце, если есть
-                        if 'seller' in details and details['seller']:
-                            seller = details['seller']
-                            message += f"🏪 *Продавец:* {seller}\n"
-                            
-                        # Добавляем информацию о количестве отзывов, если есть
-                        if 'feedbacks' in details and details['feedbacks']:
-                            feedbacks = int(details['feedbacks'])
-                            message += f"💬 *Отзывы:* {feedbacks}\n"
+                # Добавляем информацию о рейтинге, если есть
+                if product.rating:
+                    rating = float(product.rating)
+                    
+                    # Корректное отображение рейтинга в виде золотых звёзд
+                    full_stars = min(5, int(rating))
+                    half_star = rating - int(rating) >= 0.5
+                    empty_stars = 5 - full_stars - (1 if half_star else 0)
+                    
+                    # Используем символы звезд для лучшего визуального отображения
+                    # ★ - золотая звезда (полная)
+                    # ✭ - полузвезда (можно заменить на другой символ)
+                    # ☆ - пустая звезда
+                    star_rating = '★' * full_stars
+                    if half_star:
+                        star_rating += '✭'
+                    star_rating += '☆' * empty_stars
+                    
+                    message += f"⭐️ *Рейтинг:* {rating:.1f} {star_rating}\n"
+                
+                # Добавляем информацию о бренде, если есть
+                if product.brand:
+                    message += f"🏭 *Бренд:* {product.brand}\n"
                     
-                    except json.JSONDecodeError:
-                        logger.warning(f"Не удалось декодировать JSON с деталями: {details_json}")
+                # Добавляем информацию о продавце, если есть
+                if product.seller:
+                    message += f"🏪 *Продавец:* {product.seller}\n"
+                    
+                # Добавляем информацию о количестве отзывов, если есть
+                if product.feedbacks:
+                    message += f"💬 *Отзывы:* {product.feedbacks}\n"
                 
                 # Добавляем партнерскую ссылку
                 partner_link = f"https://www.wildberries.ru/catalog/{article}/detail.aspx?target=partner&partner={PARTNER_ID}"
@@ -1735,495 +1111,73 @@ async def handle_article_request(update: Update, context: ContextTypes.DEFAULT_T
             f"❌ Произошла ошибка при обработке артикула {article}. Пожалуйста, попробуйте позже."
         )
 
-async def generate_api_endpoints(article: str) -> list:
+async def fetch_card_product(article: str) -> Union[Product, bool]:
     """
-    Генерирует все возможные API-эндпоинты Wildberries для получения данных о товаре
+    Получает товар пакетным запросом к card.wb.ru/cards/v2/detail (см. card_batcher)
     
     Args:
         article: Артикул товара
-        
+    
     Returns:
-        list: Список URL API-эндпоинтов
+        Товар или False, если успешный ответ не содержит артикула (товара нет,
+        резервные источники не нужны); ошибки запроса передаются исключениями
     """
-    endpoints = [
-        f"https://card.wb.ru/cards/detail?nm={article}",
-        f"https://wbxcatalog-ru.wildberries.ru/nm-2-card/catalog?nm={article}",
-        f"https://wbx-content-v2.wbstatic.net/ru/{article}.json",
-        f"https://search.wb.ru/exactmatch/ru/common/v4/search?query={article}",
-        f"https://mobile.wb.ru/catalog/{article}/detail.json"
-    ]
-    
-    # Добавляем новые API-эндпоинты
-    try:
-        # URL для истории цен
-        last_digits = article[-2:] if len(article) >= 2 else article
-        first_digits = article[:3] if len(article) >= 3 else article
-        part_digits = article[:len(article)-3] if len(article) > 3 else article
-        
-        price_history_url = f"https://basket-{last_digits}.wbbasket.ru/vol{first_digits}/part{part_digits}/{article}/info/price-history.json"
-        endpoints.append(price_history_url)
-        
-        # URL для детальной информации о товаре v2
-        detail_v2_url = f"https://card.wb.ru/cards/v2/detail?appType=1&curr=rub&dest=-6972066&hide_dtype=13&spp=30&ab_testing=false&lang=ru&nm={article}"
-        endpoints.append(detail_v2_url)
-    except Exception as e:
-        logger.warning(f"Ошибка при генерации дополнительных API URL: {e}")
-    
-    return endpoints
+    card = await card_batcher.get(article)
+    if card is None:
+        missing_articles.set(article, True)
+        return False
+    return Product.from_card(card, article)
+
+async def fetch_page_product(article: str) -> Optional[Product]:
+    """Получает товар со страницы www.wildberries.ru/catalog/<артикул>/detail.aspx"""
+    html = await get_product_html_cloudscraper(article)
+    if not html:
+        return None
+    # Проверка страницы ошибки и разбор - один вызов в пуле процессов, event loop не блокируется
+    return await cpu_pool.run(extract_product, html, article)
 
-async def get_price_from_history(scraper, article: str) -> Optional[float]:
+async def fetch_product(article: str) -> Tuple[Optional[str], Optional[Product]]:
     """
-    Получает актуальную цену товара из API истории цен
+    Запрашивает товар у Wildberries
+    
+    Источники опрашиваются с хеджированием (см. hedging.hedged_first) в порядке
+    приоритета: пакетный запрос к card.wb.ru/cards/v2/detail, card.wb.ru/cards/detail (v1),
+    страница товара. Следующий источник запускается, если текущий не ответил за
+    обычное для него время или ответил без товара; побеждает первый найденный товар.
+    Источники, отключенные предохранителями, пропускаются, остальные упорядочиваются
+    по доле успешных ответов и задержке (см. circuit_breaker.BreakerRegistry.rank).
+    Если card.wb.ru ответил без артикула, остальные источники не опрашиваются,
+    а следующие NOT_FOUND_CACHE_TTL секунд артикул считается отсутствующим без запросов.
     
     Args:
-        scraper: Инстанс cloudscraper для выполнения запросов
         article: Артикул товара
-        
+    
     Returns:
-        float: Цена товара или None, если не удалось получить
+        Tuple[Optional[str], Optional[Product]]: (эндпоинт, вернувший товар, товар)
+        или (None, None), если ни один источник товар не вернул
+    """
+    if missing_articles.get(article):
+        logger.info(f"Артикул {article} недавно не найден в card.wb.ru, запрос не выполняется")
+        return None, None
+    sources = {
+        f"{CARD_DETAIL_URL}?nm={article}": lambda: fetch_card_product(article),
+        DETAILS_URL.format(article=article): lambda: fetch_product_details(article),
+        PRODUCT_URL.format(article=article): lambda: fetch_page_product(article),
+    }
+    source, product = await hedged_first([(endpoint_key(url), sources[url]) for url in breakers.rank(list(sources))])
+    # False - card.wb.ru подтвердил, что товара нет
+    if not product:
+        return None, None
+    return source, product
+
+async def get_product_data(article: str) -> Optional[Product]:
     """
-    try:
-        # Формируем URL для истории цен - исправляем ошибку в формировании URL
-        last_digits = article[-2:] if len(article) >= 2 else article
-        first_digits = article[:3] if len(article) >= 3 else article
-        # Используем правильный формат для part - это первые цифры артикула без последних 5 цифр
-        part_digits = article[:len(article)-5] if len(article) > 5 else article
-        
-        # Пробуем несколько вариантов URL, так как формат может отличаться
-        urls_to_try = [
-            f"https://basket-{last_digits}.wbbasket.ru/vol{first_digits}/part{part_digits}/{article}/info/price-history.json",
-            f"https://basket-0{last_digits[-1]}.wbbasket.ru/vol{first_digits}/part{part_digits}/{article}/info/price-history.json"
-        ]
-        
-        for url in urls_to_try:
-            logger.info(f"Запрос к API истории цен: {url}")
-            
-            try:
-                response = scraper.get(url, timeout=10, headers={
-                    "User-Agent": USER_AGENT,
-                    "Accept": "application/json"
-                })
-                
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        if isinstance(data, list) and len(data) > 0:
-                            # Берем последнюю (актуальную) цену и делим на 100
-                            price = float(data[0].get('price', 0)) / 100
-                            if price > 10:  # Проверка на адекватность цены
-                                logger.info(f"Цена получена из API истории цен: {price}")
-                                return price
-                    except (json.JSONDecodeError, IndexError, KeyError, ValueError) as e:
-                        logger.warning(f"Ошибка при обработке ответа API истории цен: {e}")
-            except Exception as e:
-                logger.warning(f"Ошибка при запросе к API истории цен {url}: {e}")
-        
-        logger.warning("Не удалось получить цену из всех вариантов API истории цен")
-    except Exception as e:
-        logger.warning(f"Ошибка при запросе к API истории цен: {e}")
-    
-    return None
-
-async def get_details_v2(scraper, article: str) -> Tuple[Optional[float], Optional[float]]:
-    """
-    Получает цену и рейтинг товара из v2 API
-    
-    Args:
-        scraper: Инстанс cloudscraper для выполнения запросов
-        article: Артикул товара
-        
-    Returns:
-        Tuple[Optional[float], Optional[float]]: Цена и рейтинг товара или None, если не удалось получить
-    """
-    try:
-        # API v2 имеет больше информации и более стабильный
-        url = f"https://card.wb.ru/cards/v2/detail?appType=1&curr=rub&dest=-6972066&hide_dtype=13&spp=30&ab_testing=false&lang=ru&nm={article}"
-        logger.info(f"Запрос к API v2: {url}")
-        
-        response = scraper.get(url, timeout=10, headers={
-            "User-Agent": USER_AGENT,
-            "Accept": "application/json"
-        })
-        
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                products = data.get('data', {}).get('products', [])
-                
-                if products and len(products) > 0:
-                    product = products[0]
-                    price = None
-                    rating = None
-                    
-                    # Поиск цены в sizes.stocks (наиболее надежный источник)
-                    if 'sizes' in product and product['sizes']:
-                        for size in product['sizes']:
-                            if 'stocks' in size and size['stocks']:
-                                for stock in size['stocks']:
-                                    if 'priceU' in stock:
-                                        price = float(stock['priceU']) / 100
-                                        logger.info(f"Цена получена из sizes.stocks: {price}")
-                                        break
-                            if price:
-                                break
-                    
-                    # Если цены в stocks нет, проверяем все возможные поля цены
-                    if not price:
-                        if product.get('extended', {}).get('basicPriceU'):
-                            price = float(product['extended']['basicPriceU']) / 100
-                        elif product.get('extended', {}).get('clientPriceU'): 
-                            price = float(product['extended']['clientPriceU']) / 100
-                        elif product.get('priceU'):
-                            price = float(product['priceU']) / 100
-                        elif product.get('salePriceU'):
-                            price = float(product['salePriceU']) / 100
-                    
-                    # Если нет прямых полей цены, ищем в других местах
-                    if not price:
-                        # Поиск в priceInfo
-                        if 'priceInfo' in product:
-                            try:
-                                price_info = product['priceInfo']
-                                if price_info.get('priceU'):
-                                    price = float(price_info['priceU']) / 100
-                                elif price_info.get('salePriceU'):
-                                    price = float(price_info['salePriceU']) / 100
-                                elif price_info.get('price'):
-                                    price_val = float(price_info['price'])
-                                    if price_val > 1000:
-                                        price = price_val / 100
-                                    else:
-                                        price = price_val
-                            except (ValueError, TypeError):
-                                pass
-                    
-                    # Поиск в других полях
-                    if not price:
-                        for price_field in ['price', 'salePrice', 'startPrice']:
-                            if price_field in product:
-                                try:
-                                    price_val = float(product[price_field])
-                                    # Если цена выглядит как копейки, делим на 100
-                                    if price_val > 1000:
-                                        price = price_val / 100
-                                    else:
-                                        price = price_val
-                                    break
-                                except (ValueError, TypeError):
-                                    continue
-                    
-                    # Поиск цены по всем ключам с 'price' в названии
-                    if not price:
-                        for key in product.keys():
-                            if 'price' in key.lower() and key not in ['priceU', 'salePriceU']:
-                                try:
-                                    price_val = float(product[key])
-                                    if price_val > 10:  # Минимальная адекватная цена
-                                        if price_val > 1000:  # Если цена в копейках
-                                            price = price_val / 100
-                                        else:
-                                            price = price_val
-                                        break
-                                except (ValueError, TypeError):
-                                    continue
-                    
-                    # Извлекаем рейтинг из разных возможных полей
-                    if 'reviewRating' in product:
-                        rating = float(product['reviewRating'])
-                    elif 'rating' in product:
-                        rating = float(product['rating'])
-                    elif 'supplierRating' in product:
-                        rating = float(product['supplierRating'])
-                    
-                    logger.info(f"Данные из API v2: цена={price}, рейтинг={rating}")
-                    return price, rating
-                else:
-                    logger.warning(f"Продукт не найден в ответе API v2 для артикула {article}")
-            except (json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
-                logger.warning(f"Ошибка при обработке ответа API v2: {e}")
-        else:
-            logger.warning(f"Ошибка запроса к API v2: HTTP {response.status_code}")
-    except Exception as e:
-        logger.warning(f"Исключение при запросе к API v2: {e}")
-    
-    return None, None
-
-async def test_wb_apis(article):
-    """Тестирование различных API для получения данных о товаре."""
-    print(f"\n{'='*50}\nТестирование API для артикула {article}\n{'='*50}\n")
-    
-    # Генерируем все API URL
-    api_urls = generate_api_endpoints(article)
-    
-    # Тестируем базовый API
-    print(f"\n[1] Тестирование базового API:")
-    base_api_url = f"https://card.wb.ru/cards/detail?nm={article}"
-    print(f"URL: {base_api_url}")
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(base_api_url) as response:
-                if response.status == 200:
-                    try:
-                        data = await response.json()
-                        
-                        # Сохраняем ответ API в файл
-                        with open(f"api_response_{article}.json", "w", encoding="utf-8") as f:
-                            json.dump(data, f, ensure_ascii=False, indent=4)
-                        
-                        print(f"Статус: OK (200)")
-                        if 'data' in data and 'products' in data['data'] and data['data']['products']:
-                            product = data['data']['products'][0]
-                            print(f"Название: {product.get('name', 'Не найдено')}")
-                            
-                            # Цена может быть в разных полях
-                            price = product.get('salePriceU', product.get('priceU', 0)) / 100
-                            print(f"Цена: {price} ₽")
-                            
-                            # Рейтинг
-                            rating = product.get('rating', 0)
-                            print(f"Рейтинг: {rating}")
-                            
-                            print(f"Файл с полным ответом API сохранен: api_response_{article}.json")
-                        else:
-                            print("Ошибка в структуре данных: товар не найден в ответе API")
-                    except json.JSONDecodeError:
-                        print("Ошибка: Ответ не является JSON")
-                else:
-                    print(f"Ошибка: Статус {response.status}")
-    except Exception as e:
-        print(f"Ошибка при запросе к API: {e}")
-    
-    # Тестируем API v1
-    print(f"\n[2] Тестирование API v1:")
-    api_v1_url = f"https://wbxcatalog-ru.wildberries.ru/nm-2-card/catalog/{article}/detail.json"
-    print(f"URL: {api_v1_url}")
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(api_v1_url) as response:
-                if response.status == 200:
-                    try:
-                        data = await response.json()
-                        print(f"Статус: OK (200)")
-                        if 'data' in data and 'products' in data['data'] and data['data']['products']:
-                            product = data['data']['products'][0]
-                            print(f"Название: {product.get('name', 'Не найдено')}")
-                            
-                            # Цена может быть в разных полях
-                            price = product.get('salePriceU', product.get('priceU', 0)) / 100
-                            print(f"Цена: {price} ₽")
-                            
-                            # Рейтинг
-                            rating = product.get('rating', 0)
-                            print(f"Рейтинг: {rating}")
-                        else:
-                            print("Ошибка в структуре данных: товар не найден в ответе API")
-                    except json.JSONDecodeError:
-                        print("Ошибка: Ответ не является JSON")
-                else:
-                    print(f"Ошибка: Статус {response.status}")
-    except Exception as e:
-        print(f"Ошибка при запросе к API: {e}")
-    
-    # Тестируем API price-history
-    print(f"\n[3] Тестирование API price-history:")
-    price_history_url = f"https://basket-{article[-2:] if len(article) >= 2 else '01'}.wb.ru/vol{article[0] if len(article) >= 1 else '0'}/part{article[:2] if len(article) >= 2 else '00'}/{article}/info/price-history.json"
-    print(f"URL: {price_history_url}")
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(price_history_url) as response:
-                if response.status == 200:
-                    try:
-                        data = await response.json()
-                        print(f"Статус: OK (200)")
-                        # Цена в истории цен
-                        if isinstance(data, list) and data:
-                            # Берем последнюю запись в истории (самую свежую)
-                            latest_price = data[-1].get('price', 0) / 100
-                            print(f"Последняя цена из истории: {latest_price} ₽")
-                        else:
-                            print("История цен пуста или имеет неожиданный формат")
-                    except json.JSONDecodeError:
-                        print("Ошибка: Ответ не является JSON")
-                else:
-                    print(f"Ошибка: Статус {response.status}")
-    except Exception as e:
-        print(f"Ошибка при запросе к API: {e}")
-    
-    # Тестируем API v2
-    print(f"\n[4] Тестирование API v2:")
-    api_v2_url = f"https://card.wb.ru/cards/v2/detail?nm={article}"
-    print(f"URL: {api_v2_url}")
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(api_v2_url) as response:
-                if response.status == 200:
-                    try:
-                        data = await response.json()
-                        print(f"Статус: OK (200)")
-                        if 'data' in data and 'products' in data['data'] and data['data']['products']:
-                            product = data['data']['products'][0]
-                            print(f"Название: {product.get('name', 'Не найдено')}")
-                            
-                            # Цена может быть в разных полях
-                            price = product.get('salePriceU', product.get('priceU', 0)) / 100
-                            print(f"Цена: {price} ₽")
-                            
-                            # Рейтинг
-                            rating = product.get('rating', 0)
-                            print(f"Рейтинг: {rating}")
-                        else:
-                            print("Ошибка в структуре данных: товар не найден в ответе API")
-                    except json.JSONDecodeError:
-                        print("Ошибка: Ответ не является JSON")
-                else:
-                    print(f"Ошибка: Статус {response.status}")
-    except Exception as e:
-        print(f"Ошибка при запросе к API: {e}")
-    
-    # Тестируем парсинг HTML
-    print(f"\n[5] Тестирование парсинга HTML:")
-    html_url = f"https://www.wildberries.ru/catalog/{article}/detail.aspx"
-    print(f"URL: {html_url}")
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(html_url, headers=HEADERS) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    print(f"Статус: OK (200)")
-                    
-                    # Извлекаем название товара из HTML
-                    product_name = extract_product_name(html)
-                    if product_name:
-                        print(f"Название (из HTML): {product_name}")
-                    else:
-                        print("Не удалось извлечь название товара из HTML")
-                    
-                    # Извлекаем цену товара из HTML
-                    price = extract_price(html)
-                    if price:
-                        print(f"Цена (из HTML): {price} ₽")
-                    else:
-                        print("Не удалось извлечь цену товара из HTML")
-                    
-                    # Извлекаем рейтинг товара из HTML
-                    rating = extract_rating(html)
-                    if rating:
-                        print(f"Рейтинг (из HTML): {rating}")
-                    else:
-                        print("Не удалось извлечь рейтинг товара из HTML")
-                else:
-                    print(f"Ошибка: Статус {response.status}")
-    except Exception as e:
-        print(f"Ошибка при запросе HTML: {e}")
-    
-    print(f"\n{'='*50}\nТестирование завершено\n{'='*50}\n")
-
-async def get_base_api_data(scraper, article: str) -> Tuple[Optional[float], Optional[float]]:
-    """
-    Получает цену и рейтинг товара из базового API
-    
-    Args:
-        scraper: Инстанс cloudscraper для выполнения запросов
-        article: Артикул товара
-        
-    Returns:
-        Tuple[Optional[float], Optional[float]]: Цена и рейтинг товара или None, если не удалось получить
+    Получает данные о товаре; одновременные запросы одного артикула
+    объединяются в один (см. _get_product_data)
     """
-    try:
-        url = f"https://wbxcatalog-ru.wildberries.ru/nm-2-card/catalog/{article}/detail.json"
-        logger.info(f"Запрос к базовому API: {url}")
-        
-        response = scraper.get(url, timeout=10, headers={
-            "User-Agent": USER_AGENT,
-            "Accept": "application/json"
-        })
-        
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                
-                price = None
-                rating = None
-                
-                if 'data' in data and 'products' in data['data'] and data['data']['products']:
-                    product = data['data']['products'][0]
-                    
-                    # Получаем цену
-                    if 'price' in product:
-                        price_data = product['price']
-                        
-                        if 'priceData' in price_data and 'price' in price_data['priceData']:
-                            price = float(price_data['priceData']['price'])
-                            logger.info(f"Цена получена из базового API: {price}")
-                    
-                    # Получаем рейтинг
-                    if 'rating' in product:
-                        rating = float(product['rating'])
-                        logger.info(f"Рейтинг получен из базового API: {rating}")
-                
-                return price, rating
-            except (json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
-                logger.warning(f"Ошибка при обработке ответа базового API: {e}")
-        else:
-            logger.warning(f"Ошибка запроса к базовому API: HTTP {response.status_code}")
-    except Exception as e:
-        logger.warning(f"Исключение при запросе к базовому API: {e}")
-    
-    return None, None
-
-async def get_v1_api_data(scraper, article: str) -> Tuple[Optional[float], Optional[float]]:
-    """
-    Получает цену и рейтинг товара из API v1
-    
-    Args:
-        scraper: Инстанс cloudscraper для выполнения запросов
-        article: Артикул товара
-        
-    Returns:
-        Tuple[Optional[float], Optional[float]]: Цена и рейтинг товара или None, если не удалось получить
-    """
-    try:
-        url = f"https://wbx-content-v2.wbstatic.net/ru/{article}.json"
-        logger.info(f"Запрос к API v1: {url}")
-        
-        response = scraper.get(url, timeout=10, headers={
-            "User-Agent": USER_AGENT,
-            "Accept": "application/json"
-        })
-        
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                
-                price = None
-                rating = None
-                
-                # Получаем цену
-                if 'price' in data:
-                    price = float(data['price'])
-                    logger.info(f"Цена получена из API v1: {price}")
-                
-                # Получаем рейтинг
-                if 'rating' in data:
-                    rating = float(data['rating'])
-                    logger.info(f"Рейтинг получен из API v1: {rating}")
-                
-                return price, rating
-            except (json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
-                logger.warning(f"Ошибка при обработке ответа API v1: {e}")
-        else:
-            logger.warning(f"Ошибка запроса к API v1: HTTP {response.status_code}")
-    except Exception as e:
-        logger.warning(f"Исключение при запросе к API v1: {e}")
-    
-    return None, None
+    return await product_flight.do(str(article), lambda: _get_product_data(article))
 
-async def get_product_data(article: str) -> tuple:
+async def _get_product_data(article: str) -> Optional[Product]:
     """
     Получает данные о товаре из API Wildberries
     
@@ -2231,375 +1185,41 @@ async def get_product_data(article: str) -> tuple:
         article: Артикул товара
     
     Returns:
-        tuple: (название, цена, дополнительные_данные в формате JSON)
+        Optional[Product]: Товар или None, если товар не найден
     """
     try:
+        # Проверяем кеш (записи общие с get_wb_product_data)
+        cached = await product_cache.aget(article)
+        if cached is not None and cached.name:
+            logger.info(f"Данные о товаре {article} получены из кеша")
+            return cached
+        
         logger.info(f"Получение данных о товаре {article} из API")
-        base_url = f"https://card.wb.ru/cards/v2/detail?appType=1&curr=rub&dest=-6972066&hide_dtype=13&spp=30&ab_testing=false&lang=ru&nm={article}"
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(base_url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if 'data' in data and 'products' in data['data'] and len(data['data']['products']) > 0:
-                        product = data['data']['products'][0]
-                        logger.info(f"Товар {article} найден в API")
-                        
-                        # Логируем рейтинг для отладки
-                        if 'reviewRating' in product:
-                            logger.info(f"Поле reviewRating: {product['reviewRating']}")
-                        if 'rating' in product:
-                            logger.info(f"Поле rating: {product['rating']}")
-                        if 'nmReviewRating' in product:
-                            logger.info(f"Поле nmReviewRating: {product['nmReviewRating']}")
-                        
-                        # Извлекаем имя
-                        name = product.get('name')
-                        if not name or '{{:~t(' in name or 'unsuccessfulLoad' in name:
-                            name = f"Товар {article}"
-                            
-                        # Находим цену согласно документации (Parsing.ini)
-                        price = None
-                            
-                        # ОСНОВНОЙ МЕТОД: цена находится в поле product["sizes"][0]["price"]["product"] / 100
-                        if 'sizes' in product and product['sizes'] and len(product['sizes']) > 0:
-                            first_size = product['sizes'][0]
-                            if 'price' in first_size and isinstance(first_size['price'], dict):
-                                price_obj = first_size['price']
-                                if 'product' in price_obj and price_obj['product']:
-                                    price = int(price_obj['product']) / 100
-                                    logger.info(f"Цена получена из sizes[0].price.product: {price} руб.")
-                        
-                        # Альтернативные способы получения цены, если основной не сработал
-                        if not price or price <= 0:
-                            # Проверяем поля salePriceU и priceU
-                            if 'salePriceU' in product and product['salePriceU']:
-                                price = int(product['salePriceU']) / 100
-                                logger.info(f"Цена получена из salePriceU: {price} руб.")
-                            elif 'priceU' in product and product['priceU']:
-                                price = int(product['priceU']) / 100
-                                logger.info(f"Цена получена из priceU: {price} руб.")
-                            
-                        # Если цена все еще не найдена, проверяем другие размеры
-                        if (not price or price <= 0) and 'sizes' in product:
-                            for size in product['sizes']:
-                                if 'price' in size and isinstance(size['price'], dict):
-                                    price_obj = size['price']
-                                    if 'product' in price_obj and price_obj['product']:
-                                        price = int(price_obj['product']) / 100
-                                        logger.info(f"Цена получена из альтернативного размера: {price} руб.")
-                                        break
-                            
-                        # Если цена не найдена, логируем предупреждение
-                        if not price or price <= 0:
-                            logger.warning(f"Не удалось найти цену для товара {article}")
-                        
-                        # Извлекаем рейтинг (prioritizing reviewRating и nmReviewRating перед rating)
-                        rating = None
-                        
-                        if 'reviewRating' in product and product['reviewRating'] is not None:
-                            rating = float(product['reviewRating'])
-                            logger.info(f"Рейтинг получен из reviewRating: {rating}")
-                        elif 'nmReviewRating' in product and product['nmReviewRating'] is not None:
-                            rating = float(product['nmReviewRating'])
-                            logger.info(f"Рейтинг получен из nmReviewRating: {rating}")
-                        elif 'rating' in product and product['rating'] is not None:
-                            rating = float(product['rating'])
-                            logger.info(f"Рейтинг получен из rating: {rating}")
-                        
-                        if rating is None:
-                            logger.warning(f"Не удалось найти рейтинг для товара {article}")
-                            rating = 0
-                        
-                        # Извлекаем дополнительные данные
-                        additional_data = {
-                            'rating': rating,
-                            'brand': product.get('brand', ''),
-                            'seller': product.get('supplier', '')
-                        }
-                        
-                        # Добавляем информацию о отзывах, если есть
-                        if 'feedbacks' in product:
-                            additional_data['reviews_count'] = product['feedbacks']
-                        
-                        logger.info(f"Данные о товаре получены успешно: {name}, {price} руб., рейтинг: {rating}")
-                        return name, price, json.dumps(additional_data)
-                    else:
-                        logger.warning(f"Товар с артикулом {article} не найден в ответе API")
-                        return None, None, None
-                else:
-                    logger.error(f"Ошибка API: статус {response.status} для артикула {article}")
-                    return None, None, None
-    except aiohttp.ClientError as e:
+        # Основной источник - пакетный загрузчик card.wb.ru (артикулы, запрошенные
+        # одновременно, получаются одним запросом), резервные запускаются с хеджированием
+        source, product = await fetch_product(article)
+        if product:
+            logger.info(f"Товар {article} найден в API ({source})")
+            
+            if product.price is None:
+                logger.warning(f"Не удалось найти цену для товара {article}")
+            if product.rating is None:
+                logger.warning(f"Не удалось найти рейтинг для товара {article}")
+            
+            logger.info(f"Данные о товаре получены успешно: {product.name}, {product.price} руб., рейтинг: {product.rating}")
+            product_cache.set(article, product, source=source)
+            return product
+        else:
+            logger.warning(f"Товар с артикулом {article} не найден в ответе API")
+            return None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"Ошибка сети при получении данных о товаре {article}: {e}")
-        return None, None, None
+        return None
     except json.JSONDecodeError as e:
         logger.error(f"Ошибка декодирования JSON для артикула {article}: {e}")
-        return None, None, None
-    except Exception as e:
-        logger.error(f"Неожиданная ошибка при получении данных о товаре {article}: {e}")
-        return None, None, None
-
-def extract_product_name(html: str) -> Optional[str]:
-    """
-    Извлекает название товара из HTML страницы.
-    
-    Args:
-        html: HTML-код страницы
-        
-    Returns:
-        Optional[str]: Название товара или None при ошибке
-    """
-    if not html or len(html) < 100:
-        logger.warning("HTML пустой или слишком короткий для извлечения названия товара")
-        return None
-    
-    try:
-        soup = BeautifulSoup(html, 'lxml')
-        
-        # 1. Поиск по заголовку H1
-        h1 = soup.find('h1', class_='product-page__title')
-        if h1:
-            name = h1.get_text().strip()
-            if name and len(name) > 3 and not '{{:~t(' in name:
-                logger.info(f"Название товара извлечено из H1: {name}")
-                return name
-        
-        # 2. Поиск в мета-тегах
-        meta_title = soup.find('meta', property='og:title')
-        if meta_title and meta_title.get('content'):
-            name = meta_title.get('content').strip()
-            if name and len(name) > 3 and not '{{:~t(' in name:
-                logger.info(f"Название товара извлечено из мета-тега og:title: {name}")
-                return name
-        
-        # 3. Поиск в JSON-LD
-        script_tags = soup.find_all('script', type='application/ld+json')
-        for script in script_tags:
-            try:
-                json_data = json.loads(script.string)
-                if isinstance(json_data, dict) and 'name' in json_data:
-                    name = json_data['name']
-                    if name and len(name) > 3 and not '{{:~t(' in name:
-                        logger.info(f"Название товара извлечено из JSON-LD: {name}")
-                        return name
-            except (json.JSONDecodeError, TypeError, AttributeError):
-                continue
-        
-        # 4. Поиск по шаблонам в HTML (для случаев, когда структура сайта изменилась)
-        patterns = [
-            r'<h1[^>]*class="[^"]*product-page__title[^"]*"[^>]*>(.*?)</h1>',
-            r'<meta property="og:title" content="([^"]+)"',
-            r'"name":\s*"([^"]+)"',
-            r'<span itemprop="name">([^<]+)</span>'
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, html)
-            if matches:
-                for match in matches:
-                    name = match.strip()
-                    # Проверяем, что название не шаблонное и не пустое
-                    if name and len(name) > 3 and not '{{:~t(' in name:
-                        logger.info(f"Название товара извлечено по шаблону {pattern}: {name}")
-                        return name
-        
-        logger.warning("Не удалось извлечь название товара из HTML")
-        return None
-    
-    except Exception as e:
-        logger.error(f"Ошибка при извлечении названия товара из HTML: {e}")
-        return None
-
-def extract_price(html: str) -> Optional[float]:
-    """
-    Извлекает цену товара из HTML страницы.
-    
-    Args:
-        html: HTML-код страницы
-        
-    Returns:
-        Optional[float]: Цена товара или None при ошибке
-    """
-    if not html or len(html) < 100:
-        logger.warning("HTML пустой или слишком короткий для извлечения цены")
-        return None
-    
-    try:
-        soup = BeautifulSoup(html, 'lxml')
-        
-        # 1. Поиск по классу price-block__final-price
-        price_element = soup.find('ins', class_='price-block__final-price')
-        if price_element:
-            price_text = price_element.get_text().strip()
-            # Убираем все неразрывные пробелы и символы валюты
-            price_text = price_text.replace('\xa0', '').replace('&nbsp;', '').replace(' ', '').replace('₽', '').replace('руб', '')
-            try:
-                price = float(price_text)
-                logger.info(f"Цена извлечена из элемента price-block__final-price: {price}")
-                return price
-            except ValueError:
-                logger.warning(f"Не удалось преобразовать текст '{price_text}' в число")
-        
-        # 2. Поиск в div.price-block
-        price_block = soup.find('div', class_='price-block')
-        if price_block:
-            # Ищем все числа в блоке с ценой
-            price_texts = re.findall(r'(\d[\d\s]*)\s*₽', price_block.get_text())
-            if price_texts:
-                for price_text in price_texts:
-                    price_text = price_text.replace('\xa0', '').replace('&nbsp;', '').replace(' ', '')
-                    try:
-                        price = float(price_text)
-                        logger.info(f"Цена найдена в блоке price-block: {price}")
-                        return price
-                    except ValueError:
-                        continue
-        
-        # 3. Поиск в исходном HTML с учетом &nbsp;
-        price_patterns = [
-            r'(\d[\d\s&nbsp;]*)\s*₽',
-            r'price-block__final-price[^>]*>([^<]+)',
-            r'final-price[^>]*>([^<]+)',
-            r'"finalPrice":(\d+)',
-            r'"price":(\d+)',
-            r'<meta property="product:price:amount" content="(\d+\.?\d*)'
-        ]
-        
-        for pattern in price_patterns:
-            matches = re.findall(pattern, html)
-            if matches:
-                for match in matches:
-                    # Очистка текста от неразрывных пробелов и других символов
-                    price_text = match.replace('\xa0', '').replace('&nbsp;', '').replace(' ', '').replace('₽', '').replace('руб', '')
-                    try:
-                        price_value = float(price_text)
-                        if price_value > 10:  # Проверка на адекватность цены
-                            logger.info(f"Цена найдена по шаблону {pattern}: {price_value}")
-                            return price_value
-                    except ValueError:
-                        continue
-        
-        # 4. Поиск в JSON данных на странице
-        script_tags = soup.find_all('script', type='application/ld+json')
-        for script in script_tags:
-            try:
-                json_data = json.loads(script.string)
-                if isinstance(json_data, dict):
-                    # Проверяем различные пути для цены
-                    if 'offers' in json_data and isinstance(json_data['offers'], dict) and 'price' in json_data['offers']:
-                        price = float(json_data['offers']['price'])
-                        if price > 10:
-                            logger.info(f"Цена найдена в JSON-LD (offers.price): {price}")
-                            return price
-                    elif 'price' in json_data:
-                        price = float(json_data['price'])
-                        if price > 10:
-                            logger.info(f"Цена найдена в JSON-LD (price): {price}")
-                            return price
-            except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
-                continue
-        
-        logger.warning("Не удалось извлечь цену из HTML")
         return None
-    
     except Exception as e:
-        logger.error(f"Ошибка при извлечении цены из HTML: {e}")
-        return None
-
-def extract_rating(html: str) -> Optional[float]:
-    """
-    Извлекает рейтинг товара из HTML страницы.
-    
-    Args:
-        html: HTML-код страницы
-        
-    Returns:
-        Optional[float]: Рейтинг товара или None при ошибке
-    """
-    if not html or len(html) < 100:
-        logger.warning("HTML пустой или слишком короткий для извлечения рейтинга")
-        return None
-    
-    try:
-        soup = BeautifulSoup(html, 'lxml')
-        
-        # 1. Поиск по классу product-page__reviews-icon
-        rating_elem = soup.find('p', class_='product-page__reviews-icon')
-        if rating_elem:
-            # Вытаскиваем весь текст из элемента
-            rating_text = rating_elem.get_text().strip()
-            logger.info(f"Найден элемент рейтинга: {rating_text}")
-            
-            # Ищем числа с запятой или точкой (рейтинг)
-            rating_match = re.search(r'([\d.,]+)', rating_text)
-            if rating_match:
-                try:
-                    rating = float(rating_match.group(1).replace(',', '.'))
-                    logger.info(f"Рейтинг извлечен из элемента product-page__reviews-icon: {rating}")
-                    return rating
-                except ValueError:
-                    logger.warning(f"Не удалось преобразовать рейтинг '{rating_match.group(1)}' в число")
-        
-        # 2. Поиск в блоке с отзывами
-        reviews_block = soup.find('div', class_='product-page__reviews-blocks')
-        if reviews_block:
-            rating_texts = re.findall(r'([\d.,]+)', reviews_block.get_text())
-            if rating_texts:
-                for rating_text in rating_texts:
-                    try:
-                        rating = float(rating_text.replace(',', '.'))
-                        if 0 <= rating <= 5:  # Проверка на адекватность рейтинга
-                            logger.info(f"Рейтинг найден в блоке reviews-blocks: {rating}")
-                            return rating
-                    except ValueError:
-                        continue
-        
-        # 3. Поиск в исходном HTML
-        rating_patterns = [
-            r'rating":\s*"?([\d.]+)"?',
-            r'reviewRating":\s*"?([\d.]+)"?',
-            r'<meta itemprop="ratingValue" content="([\d.]+)"',
-            r'<span class="[^"]*star[^"]*"[^>]*>([\d.,]+)</span>'
-        ]
-        
-        for pattern in rating_patterns:
-            matches = re.findall(pattern, html)
-            if matches:
-                for match in matches:
-                    try:
-                        rating = float(match.replace(',', '.'))
-                        if 0 <= rating <= 5:  # Проверка на адекватность рейтинга
-                            logger.info(f"Рейтинг найден по шаблону {pattern}: {rating}")
-                            return rating
-                    except ValueError:
-                        continue
-        
-        # 4. Поиск в JSON данных на странице
-        script_tags = soup.find_all('script', type='application/ld+json')
-        for script in script_tags:
-            try:
-                json_data = json.loads(script.string)
-                if isinstance(json_data, dict):
-                    # Проверяем различные пути для рейтинга
-                    if 'aggregateRating' in json_data and isinstance(json_data['aggregateRating'], dict) and 'ratingValue' in json_data['aggregateRating']:
-                        rating = float(json_data['aggregateRating']['ratingValue'])
-                        if 0 <= rating <= 5:
-                            logger.info(f"Рейтинг найден в JSON-LD (aggregateRating.ratingValue): {rating}")
-                            return rating
-                    elif 'rating' in json_data:
-                        rating = float(json_data['rating'])
-                        if 0 <= rating <= 5:
-                            logger.info(f"Рейтинг найден в JSON-LD (rating): {rating}")
-                            return rating
-            except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
-                continue
-        
-        logger.warning("Не удалось извлечь рейтинг из HTML")
-        return None
-    
-    except Exception as e:
-        logger.error(f"Ошибка при извлечении рейтинга из HTML: {e}")
+        logger.error(f"Неожиданная ошибка при получении данных о товаре {article}: {e}")
         return None
 
 async def test_simple(article: str):
@@ -2611,30 +1231,29 @@ async def test_simple(article: str):
     """
     print(f"Тестирование получения данных для артикула {article}")
     
-    # Проверяем, доступен ли интернет
-    if not check_internet_connection():
+    # Одна проверка сети и хостов тем же монитором, что используют обработчики
+    await health_monitor.probe_once()
+    if not health_monitor.is_online():
         print("❌ Интернет недоступен")
         return
     
-    # Проверяем доступность хостов Wildberries
-    hosts_status = check_wildberries_hosts()
     print("\nСтатус хостов Wildberries:")
-    for host, status in hosts_status.items():
+    for host, status in health_monitor.hosts_status().items():
         print(f"- {host}: {'✅ Доступен' if status else '❌ Недоступен'}")
     
     # Получаем данные о товаре
     print("\nПолучение данных о товаре:")
-    result = get_wb_product_data(article)
+    result = await get_wb_product_data(article)
     
     if isinstance(result, dict) and 'error' in result:
         print(f"❌ Ошибка: {result['error']}")
     elif result:
         print("✅ Данные успешно получены:")
         print(f"Артикул: {article}")
-        print(f"Название: {result.get('name', 'Не найдено')}")
-        print(f"Цена: {result.get('price', 'Не найдена')} ₽")
-        print(f"Рейтинг: {result.get('rating', 'Не найден')}")
-        print(f"URL: {result.get('url', f'https://www.wildberries.ru/catalog/{article}/detail.aspx')}")
+        print(f"Название: {result.name}")
+        print(f"Цена: {result.price if result.price is not None else 'Не найдена'} ₽")
+        print(f"Рейтинг: {result.rating if result.rating is not None else 'Не найден'}")
+        print(f"URL: {result.url}")
     else:
         print("❌ Не удалось получить данные о товаре")
     
@@ -2647,146 +1266,6 @@ def check_syntax():
     print("Синтаксис файла корректен!")
     return True
 
-async def find_similar_products(article: str, max_price: float = None, min_rating: float = None) -> List[Dict]:
-    """
-    Ищет похожие товары дешевле указанного артикула
-    
-    Args:
-        article: Артикул товара
-        max_price: Максимальная цена
-        min_rating: Минимальный рейтинг
-        
-    Returns:
-        List[Dict]: Список словарей с данными о похожих товарах
-    """
-    try:
-        logger.info(f"Начинаю поиск похожих товаров для артикула {article}")
-        
-        # Проверка корректности артикула
-        if not article or not article.strip():
-            logger.warning("Получен пустой артикул товара")
-            return []
-            
-        # Проверка, что артикул состоит только из цифр
-        if not article.isdigit():
-            logger.warning(f"Артикул {article} содержит недопустимые символы")
-            return []
-        
-        # Получаем данные о текущем товаре
-        original_product = get_wb_product_data(article)
-        
-        if not original_product or isinstance(original_product, dict) and 'error' in original_product:
-            logger.warning(f"Не удалось получить данные о товаре {article}")
-            return []
-            
-        # Извлекаем название и категорию товара
-        original_name = original_product.get('name', f"Товар {article}")
-        original_price = original_product.get('price', 0)
-        
-        # Если максимальная цена не установлена, используем 90% от текущей
-        if not max_price:
-            max_price = original_price * 0.9
-        
-        # Устанавливаем минимальный рейтинг, если он не указан
-        if not min_rating:
-            min_rating = 4.0
-            
-        logger.info(f"Параметры поиска: max_price={max_price}, min_rating={min_rating}")
-            
-        # Извлекаем ключевые слова из названия товара
-        keywords = extract_keywords(original_name)
-        
-        if not keywords:
-            logger.warning(f"Не удалось извлечь ключевые слова из названия: {original_name}")
-            return []
-            
-        logger.info(f"Извлеченные ключевые слова: {', '.join(keywords)}")
-        
-        # Формируем запрос для поиска похожих товаров
-        search_query = ' '.join(keywords[:4])  # Используем первые 4 ключевых слова
-        
-        # Проверяем наличие подключения к серверам Wildberries
-        hosts_status = check_wildberries_hosts()
-        
-        # Список для хранения найденных товаров
-        found_products = []
-        
-        # Пробуем использовать API поиска, если доступно
-        if hosts_status.get("wildberries.ru"):
-            try:
-                # URL для поискового API Wildberries
-                search_url = f"https://search.wb.ru/exactmatch/ru/common/v4/search?query={search_query}"
-                
-                scraper = create_scraper_instance() if create_scraper_instance else requests.Session()
-                
-                # Добавляем пользовательский агент, если это простой сеанс requests
-                if isinstance(scraper, requests.Session):
-                    scraper.headers.update({
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-                        "Accept": "application/json"
-                    })
-                
-                response = scraper.get(search_url, timeout=15)
-                
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        
-                        # Обрабатываем результаты поиска
-                        if 'data' in data and 'products' in data['data']:
-                            products = data['data']['products']
-                            
-                            for product in products:
-                                try:
-                                    # Извлекаем данные о товаре
-                                    product_id = str(product.get('id'))
-                                    
-                                    # Пропускаем текущий товар
-                                    if product_id == article:
-                                        logger.debug(f"Пропускаем текущий товар {product_id}")
-                                        continue
-                                        
-                                    # Проверяем наличие цены
-                                    if 'priceU' in product:
-                                        price = int(product['priceU']) / 100
-                                    elif 'salePriceU' in product:
-                                        price = int(product['salePriceU']) / 100
-                                    else:
-                                        logger.debug(f"Товар {product_id} пропущен: цена не найдена")
-                                        continue
-                                        
-                                    # Если цена выше максимальной, пропускаем
-                                    if price >= max_price:
-                                        logger.debug(f"Товар {product_id} пропущен: цена {price} выше максимальной {max_price}")
-                                        continue
-                                        
-                                    # Получаем рейтинг
-                                    rating = product.get('rating', 0)
-                                    
-                                    # Если рейтинг ниже минимального, пропускаем
-                                    if rating < min_rating:
-                                        logger.debug(f"Товар {product_id} пропущен: рейтинг {rating} ниже минимального {min_rating}")
-                                        continue
-                                        
-                                    # Добавляем товар в список найденных
-                                    found_products.append({
-                                        'article': product_id,
-                                        'name': product.get('name', f"Товар {product_id}"),
-                                        'price': price,
-                                        'rating': rating,
-                                        'url': f"https://www.wildberries.ru/catalog/{product_id}/detail.aspx"
-                                    })
-                                except Exception as e:
-                                    logger.warning(f"Ошибка при обработке товара из поиска: {e}")
-                                    continue
-                    except json.JSONDecodeError:
-                        logger.warning("Ошибка декодирования JSON-ответа от API поиска")
-            except Exception as e:
-                logger.warning(f"Ошибка при запросе к API поиска: {e}")
-    except Exception as e:
-        logger.error(f"Ошибка при поиске похожих товаров: {str(e)}", exc_info=True)
-        return []
-
 async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обработчик кнопок обратного вызова
@@ -2868,17 +1347,15 @@ async def handle_similar_cheaper_button(update: Update, context: ContextTypes.DE
                 parse_mode="Markdown"
             )
             return
+        recent_products.remember(update.effective_user.id, article)
             
-        # Используем импортированную функцию для поиска похожих товаров дешевле
-        # Так как функция синхронная, запускаем её в отдельном потоке, чтобы не блокировать бота
-        loop = asyncio.get_event_loop()
-        similar_product = await loop.run_in_executor(
-            None,
-            lambda: find_similar_cheaper_products(
-                article=article,
-                min_rating=4.5,  # Минимальный рейтинг 4.5
-                min_feedbacks=20  # Минимальное количество отзывов 20
-            )
+        # Поисковые запросы выполняются одновременно, поэтому ответ приходит
+        # за время самого медленного запроса, а не за их сумму
+        similar_product = await find_similar_cheaper_products(
+            article=article,
+            min_rating=4.5,  # Минимальный рейтинг 4.5
+            min_feedbacks=20,  # Минимальное количество отзывов 20
+            source=product_data  # Карточка уже получена, повторно не запрашиваем
         )
         
         # Проверяем, найден ли подходящий товар
@@ -2891,18 +1368,18 @@ async def handle_similar_cheaper_button(update: Update, context: ContextTypes.DE
             
         # Формируем сообщение с результатом, используя функцию форматирования
         message_text = format_product_message(
-            name=similar_product.get('name'),
-            price=similar_product.get('price'),
-            rating=similar_product.get('rating'),
-            brand=similar_product.get('brand'),
-            seller=similar_product.get('seller'),
-            url=similar_product.get('url'),
+            name=similar_product.name,
+            price=similar_product.price,
+            rating=similar_product.rating,
+            brand=similar_product.brand,
+            seller=similar_product.seller,
+            url=similar_product.url,
             is_original=False
         )
         
         # Добавляем информацию об отзывах, если она есть
-        if 'feedbacks' in similar_product:
-            message_text += f"💬 *Отзывы:* {similar_product.get('feedbacks')}\n"
+        if similar_product.feedbacks is not None:
+            message_text += f"💬 *Отзывы:* {similar_product.feedbacks}\n"
         
         # Отправляем сообщение с результатом
         await query.edit_message_text(
@@ -2919,6 +1396,7 @@ async def handle_similar_cheaper_button(update: Update, context: ContextTypes.DE
             parse_mode="Markdown"
         )
 
+@observe_handler("similar_command")
 async def similar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обработчик команды /similar для поиска похожих товаров
@@ -2965,17 +1443,20 @@ async def similar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             except ValueError:
                 pass
         
+        # Получаем данные об исходном товаре один раз: они нужны и для поиска, и для сравнения цен
+        original_product = await get_wb_product_data(article)
+        if not isinstance(original_product, Product):
+            original_product = None
+        else:
+            recent_products.remember(update.effective_user.id, article)
+        
         # Используем импортированную функцию для поиска похожих товаров дешевле
-        # Так как функция синхронная, запускаем её в отдельном потоке, чтобы не блокировать бота
-        loop = asyncio.get_event_loop()
-        similar_product = await loop.run_in_executor(
-            None,
-            lambda: find_similar_cheaper_products(
-                article=article,
-                max_price_percent=max_price_percent,
-                min_rating=min_rating,
-                min_feedbacks=min_feedbacks
-            )
+        similar_product = await find_similar_cheaper_products(
+            article=article,
+            max_price_percent=max_price_percent,
+            min_rating=min_rating,
+            min_feedbacks=min_feedbacks,
+            source=original_product
         )
         
         # Проверяем, найден ли подходящий товар
@@ -2989,32 +1470,30 @@ async def similar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
             return
             
-        # Получаем данные об исходном товаре для сравнения
-        original_product = await get_wb_product_data(article)
         original_price = 0
         
-        if original_product and not isinstance(original_product, dict):
+        if original_product is not None:
             # Получаем цену исходного товара
-            original_price = original_product.get('price', 0)
+            original_price = original_product.price or 0
         
         # Формируем сообщение с результатом
-        cheaper_price = similar_product.get('price', 0)
+        cheaper_price = similar_product.price or 0
         discount_percent = 0
         
         if original_price > 0 and cheaper_price > 0:
             discount_percent = int((1 - cheaper_price/original_price) * 100)
         
-        message_text = f"📦 *Похожий товар дешевле:* {similar_product.get('name')}\n"
-        message_text += f"💰 *Цена:* {similar_product.get('price')} ₽"
+        message_text = f"📦 *Похожий товар дешевле:* {similar_product.name}\n"
+        message_text += f"💰 *Цена:* {similar_product.price} ₽"
         
         if discount_percent > 0:
             message_text += f" (дешевле на {discount_percent}%)\n"
         else:
             message_text += "\n"
             
-        message_text += f"⭐️ *Рейтинг:* {similar_product.get('rating')}\n"
-        message_text += f"💬 *Отзывы:* {similar_product.get('feedbacks')}\n"
-        message_text += f"🔗 [Ссылка на товар]({similar_product.get('url')})"
+        message_text += f"⭐️ *Рейтинг:* {similar_product.rating}\n"
+        message_text += f"💬 *Отзывы:* {similar_product.feedbacks}\n"
+        message_text += f"🔗 [Ссылка на товар]({similar_product.url})"
         
         # Отправляем сообщение с результатом
         await loading_message.edit_text(
@@ -3030,6 +1509,7 @@ async def similar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             "Пожалуйста, попробуйте позже или обратитесь к администратору."
         )
 
+@observe_handler("handle_gpt_message")
 async def handle_gpt_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обрабатывает сообщения для ChatGPT
@@ -3056,25 +1536,6 @@ async def handle_gpt_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
         # Получаем ID пользователя
         user_id = update.effective_user.id
         
-        # Проверяем лимит запросов
-        now = datetime.now()
-        today = now.date()
-        
-        # Инициализируем список запросов для пользователя
-        if user_id not in gpt_user_requests:
-            gpt_user_requests[user_id] = []
-            
-        # Очищаем запросы, сделанные не сегодня
-        gpt_user_requests[user_id] = [ts for ts in gpt_user_requests[user_id] if ts.date() == today]
-        
-        # Проверяем количество запросов за день
-        if len(gpt_user_requests[user_id]) >= MAX_GPT_REQUESTS_PER_DAY:
-            await update.message.reply_text(
-                f"Вы достигли лимита запросов к ChatGPT на сегодня ({MAX_GPT_REQUESTS_PER_DAY}).\n"
-                "Пожалуйста, попробуйте завтра."
-            )
-            return
-        
         # Извлекаем текст запроса
         if context.args:
             # Если это команда /ask или /chatgpt, текст будет в context.args
@@ -3099,6 +1560,25 @@ async def handle_gpt_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 "Например: /ask Что такое Wildberries?"
             )
             return
+        
+        # Сводка о последних просмотренных товарах из кеша (без запросов к Wildberries)
+        product_context = build_product_context(recent_products.articles(user_id), product_cache)
+        cache_scope = context_scope(OPENAI_MODEL, product_context)
+        
+        # Ответ на такой же вопрос из кеша не расходует лимит запросов
+        cached_reply = gpt_cache.get(query_text, scope=cache_scope)
+        if cached_reply is not None:
+            await update.message.reply_text(cached_reply)
+            logger.info(f"Пользователь {user_id} получил ответ ChatGPT из кеша")
+            return
+        
+        # Проверяем количество запросов за день
+        if gpt_quota.remaining(user_id) <= 0:
+            await update.message.reply_text(
+                f"Вы достигли лимита запросов к ChatGPT на сегодня ({MAX_GPT_REQUESTS_PER_DAY}).\n"
+                "Пожалуйста, попробуйте завтра."
+            )
+            return
             
         # Отправляем сообщение о начале обработки
         processing_message = await update.message.reply_text(
@@ -3106,41 +1586,26 @@ async def handle_gpt_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         
         try:
-            # Создаем клиента OpenAI
-            client = OpenAI(api_key=OPENAI_API_KEY)
-            
-            # Отправляем запрос к API
-            response = client.chat.completions.create(
+            # Ответ приходит потоком и по мере генерации дописывается в сообщение о загрузке
+            messages = [{"role": "system", "content": CHATGPT_SYSTEM_PROMPT}]
+            if product_context:
+                messages.append({"role": "system", "content": product_context})
+            messages.append({"role": "user", "content": query_text})
+            chunks = stream_chat(
+                messages,
                 model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": CHATGPT_SYSTEM_PROMPT},
-                    {"role": "user", "content": query_text}
-                ],
                 max_tokens=500,
                 temperature=0.7
             )
-            
-            # Получаем ответ от ChatGPT
-            reply_content = response.choices[0].message.content
-            
-            # Ограничиваем длину ответа
-            if len(reply_content) > MAX_GPT_RESPONSE_LENGTH:
-                reply_content = reply_content[:MAX_GPT_RESPONSE_LENGTH] + "..."
+            reply_content = await stream_to_message(processing_message, chunks, MAX_GPT_RESPONSE_LENGTH)
+            if reply_content != EMPTY_REPLY:
+                gpt_cache.set(query_text, reply_content, scope=cache_scope)
             
             # Записываем запрос в лимит
-            gpt_user_requests[user_id].append(now)
-            
-            # Удаляем сообщение о загрузке
-            try:
-                await processing_message.delete()
-            except Exception as e:
-                logger.warning(f"Не удалось удалить сообщение о загрузке: {e}")
-            
-            # Отправляем ответ пользователю
-            await update.message.reply_text(reply_content)
+            remaining = gpt_quota.consume(user_id)
             
             # Логируем информацию о запросе
-            logger.info(f"Пользователь {user_id} получил ответ от ChatGPT. Осталось запросов: {MAX_GPT_REQUESTS_PER_DAY - len(gpt_user_requests[user_id])}")
+            logger.info(f"Пользователь {user_id} получил ответ от ChatGPT. Осталось запросов: {remaining}")
         
         except Exception as e:
             logger.error(f"Ошибка при запросе к OpenAI API: {str(e)}", exc_info=True)
@@ -3150,7 +1615,7 @@ async def handle_gpt_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
             )
             
             try:
-                # Пытаемся удалить сообщение о загрузке
+                # Пытаемся удалить сообщение о загрузке (вместе с частью ответа, если она была показана)
                 await processing_message.delete()
             except:
                 pass
@@ -3183,14 +1648,10 @@ async def clean_cache(context: ContextTypes.DEFAULT_TYPE) -> None:
     try:
         logger.info("Начинаю плановую очистку кэша...")
         
-        # Очистка запросов ChatGPT
-        for user_id in list(gpt_user_requests.keys()):
-            today = datetime.now().date()
-            # Оставляем только запросы за сегодня
-            gpt_user_requests[user_id] = [ts for ts in gpt_user_requests[user_id] if ts.date() == today]
-            # Если запросов не осталось, удаляем пользователя из словаря
-            if not gpt_user_requests[user_id]:
-                del gpt_user_requests[user_id]
+        # Удаляем записи пользователей, не упирающихся в лимит запросов
+        for limiter in user_limiters.values():
+            limiter.evict_idle()
+        logger.info(f"Лимиты пользователей: запросы {request_limiter.stats()}, ChatGPT {gpt_quota.stats()}")
         
         # Очистка временных файлов
         tmp_dir = os.getenv("TMP_DIR", "tmp")
@@ -3209,10 +1670,29 @@ async def clean_cache(context: ContextTypes.DEFAULT_TYPE) -> None:
                 except Exception as e:
                     logger.warning(f"Ошибка при удалении файла {file_path}: {e}")
         
+        # Кеш товаров ограничен по объему и сам удаляет устаревшие записи, здесь только статистика
+        logger.info(f"Статистика кеша товаров: {product_cache.stats()}")
+        logger.info(f"Статистика кеша ChatGPT: {gpt_cache.stats()}")
+        
+        # Очереди обновлений по чатам (см. update_processor)
+        processor = context.application.update_processor
+        if hasattr(processor, "stats"):
+            logger.info(f"Обработка обновлений: {processor.stats()}")
+        
+        # Удаляем устаревшие записи из постоянного хранилища
+        if product_cache.store is not None:
+            removed = await asyncio.to_thread(product_cache.store.vacuum)
+            logger.info(f"Удалено устаревших записей из хранилища товаров: {removed}")
+        
+        # Текущая допустимая частота запросов по хостам Wildberries
+        logger.info(f"Скорость запросов по хостам: {rate_limiter.stats()}")
+        logger.info(f"Пул процессов: {cpu_pool.stats()}")
+        
         logger.info("Очистка кэша завершена")
     except Exception as e:
         logger.error(f"Ошибка при очистке кэша: {e}", exc_info=True)
     
+@observe_handler("search_command")
 async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обработчик команды /search для поиска товаров на Wildberries
@@ -3238,9 +1718,6 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             f"🔍 Ищу товары по запросу: \"{search_query}\"..."
         )
         
-        # Создаем безопасный клиент для запросов
-        scraper = create_scraper_instance()
-        
         # Выполняем поисковый запрос на Wildberries
         try:
             # Кодируем запрос для URL
@@ -3249,8 +1726,15 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             
             # Выполняем запрос с поддержкой прокси
             try:
-                # Используем нашу функцию с поддержкой прокси
-                response = search_with_proxy(search_url)
+                # Общий асинхронный клиент сам пробует прокси и fallback без него
+                response = await get_http_client().get(search_url, timeout=10)
+                
+                if response.status != 200:
+                    logger.error(f"Ошибка при поиске на Wildberries: HTTP {response.status}")
+                    await searching_message.edit_text(
+                        f"Не удалось выполнить поиск на Wildberries. Попробуйте позже."
+                    )
+                    return
                 
                 # Парсим ответ
                 search_data = response.json()
@@ -3268,21 +1752,18 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 # Формируем сообщение с результатами
                 result_message = f"📋 Результаты поиска по запросу \"{search_query}\":\n\n"
                 
-                for i, product in enumerate(products, 1):
-                    # Получаем основные данные о товаре
-                    article = product.get('id', 'Нет артикула')
-                    name = product.get('name', 'Без названия')
-                    brand = product.get('brand', 'Без бренда')
-                    price = product.get('salePriceU', 0) / 100  # Цена в копейках
-                    rating = product.get('rating', 0)
+                for i, card in enumerate(products, 1):
+                    # Карточки поиска нормализуются так же, как карточки card.wb.ru
+                    product = Product.from_card(card)
+                    price = f"{product.price:.0f} ₽" if product.price is not None else "не указана"
                     
                     # Добавляем информацию о товаре
-                    result_message += f"{i}. *{name}*\n"
-                    result_message += f"   Бренд: {brand}\n"
-                    result_message += f"   Цена: {price:.0f} ₽\n"
-                    result_message += f"   Рейтинг: {rating}/5\n"
-                    result_message += f"   Артикул: {article}\n"
-                    result_message += f"   [Посмотреть на WB](https://www.wildberries.ru/catalog/{article}/detail.aspx)\n\n"
+                    result_message += f"{i}. *{product.name}*\n"
+                    result_message += f"   Бренд: {product.brand or 'Без бренда'}\n"
+                    result_message += f"   Цена: {price}\n"
+                    result_message += f"   Рейтинг: {product.rating or 0}/5\n"
+                    result_message += f"   Артикул: {product.article}\n"
+                    result_message += f"   [Посмотреть на WB]({product.url})\n\n"
                 
                 # Добавляем ссылку на все результаты
                 result_message += f"[Все результаты на Wildberries](https://www.wildberries.ru/catalog/0/search.aspx?search={encoded_query})"
@@ -3297,13 +1778,13 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     disable_web_page_preview=True
                 )
                 
-            except requests.RequestException as e:
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 logger.error(f"Ошибка при поиске на Wildberries: {str(e)}", exc_info=True)
                 await searching_message.edit_text(
                     f"Не удалось выполнить поиск на Wildberries. Попробуйте позже."
                 )
                 
-        except requests.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Ошибка при поиске на Wildberries: {str(e)}", exc_info=True)
             await searching_message.edit_text(
                 f"Не удалось выполнить поиск на Wildberries. Попробуйте позже."
@@ -3316,7 +1797,14 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             "Пожалуйста, попробуйте позже или обратитесь к администратору."
         )
     
-async def get_wb_product_data(article: str) -> Optional[Dict[str, Any]]:
+async def get_wb_product_data(article: str) -> Union[Product, Dict[str, str], None]:
+    """
+    Получает данные о товаре; одновременные запросы одного артикула
+    объединяются в один (см. _get_wb_product_data)
+    """
+    return await product_wb_flight.do(str(article), lambda: _get_wb_product_data(article))
+
+async def _get_wb_product_data(article: str) -> Union[Product, Dict[str, str], None]:
     """
     Получает данные о товаре по артикулу из Wildberries API
     
@@ -3324,57 +1812,33 @@ async def get_wb_product_data(article: str) -> Optional[Dict[str, Any]]:
         article: Артикул товара
         
     Returns:
-        Словарь с данными о товаре или None при ошибке
+        Товар, словарь {"error": текст} при недоступности Wildberries или None при ошибке
     """
     try:
         # Проверяем кеш
-        if article in product_cache:
-            data, timestamp = product_cache[article]
-            # Проверяем, не устарели ли данные
-            if time.time() - timestamp < CACHE_LIFETIME * 3600:  # Переводим часы в секунды
-                logger.info(f"Данные о товаре {article} получены из кеша")
-                return data
-        
-        # Проверяем доступность интернета
-        if not check_internet_connection():
+        cached = await product_cache.aget(article)
+        if cached is not None:
+            logger.info(f"Данные о товаре {article} получены из кеша")
+            return cached
+        
+        # Проверяем доступность интернета (состояние обновляется в фоне)
+        if not health_monitor.is_online():
             logger.warning("Интернет недоступен")
             return {"error": "Интернет недоступен. Пожалуйста, проверьте подключение и попробуйте снова."}
         
         # Проверяем доступность хостов Wildberries
-        hosts_status = check_wildberries_hosts()
-        if not any(hosts_status.values()):
+        if not health_monitor.any_host_up():
             logger.warning("Все хосты Wildberries недоступны")
             return {"error": "Сервис Wildberries временно недоступен. Пожалуйста, попробуйте позже."}
         
-        # Используем нашу функцию с поддержкой прокси
-        # Так как функция синхронная, запускаем её в отдельном потоке
-        loop = asyncio.get_event_loop()
-        product_data = await loop.run_in_executor(
-            None,
-            lambda: get_product_details_with_proxy(article)
-        )
+        # Пакетный загрузчик карточек, card v1 и страница товара с хеджированием
+        source, product = await fetch_product(article)
         
-        if not product_data:
+        if product is None:
             return None
         
-        # Преобразуем данные в нужный формат
-        price = 0
-        if 'salePriceU' in product_data and product_data['salePriceU']:
-            price = float(product_data['salePriceU']) / 100
-        elif 'priceU' in product_data and product_data['priceU']:
-            price = float(product_data['priceU']) / 100
-        
-        result = {
-            'name': product_data.get('name', ''),
-            'brand': product_data.get('brand', ''),
-            'price': price,
-            'rating': product_data.get('reviewRating', 0),
-            'feedbacks': product_data.get('feedbacks', 0),
-            'article': article,
-            'url': f"https://www.wildberries.ru/catalog/{article}/detail.aspx"
-        }
-        
-        return result
+        product_cache.set(article, product, source=source)
+        return product
         
     except Exception as e:
         logger.error(f"Ошибка при получении данных о товаре {article}: {str(e)}")
@@ -3438,86 +1902,6 @@ def format_product_message(name: str, price: Optional[float] = None, rating: Opt
     
     return message
 
-def get_product_details_with_proxy(article: str) -> Optional[Dict[str, Any]]:
-    """
-    Получает данные о товаре с использованием прокси и fallback
-    
-    Args:
-        article: Артикул товара
-        
-    Returns:
-        Dict: Данные о товаре или None при ошибке
-    """
-    from find_similar import get_product_details as original_get_product_details
-    
-    logger.info(f"Получение данных о товаре {article}" + 
-               (f" через прокси {PROXY_IP}:{PROXY_PORT}" if PROXY_ENABLED else ""))
-    
-    # Если прокси не включен, просто используем оригинальную функцию
-    if not PROXY_ENABLED:
-        return original_get_product_details(article)
-    
-    # Создаем scraper для запросов
-    scraper = cloudscraper.create_scraper(
-        browser={
-            'browser': 'chrome',
-            'platform': 'windows',
-            'desktop': True
-        }
-    )
-    
-    # Настраиваем заголовки
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "application/json, text/plain, */*",
-        "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
-    }
-    
-    # Настраиваем прокси
-    try:
-        scraper.proxies = PROXIES
-    except Exception as e:
-        logger.error(f"Ошибка при настройке прокси: {str(e)}")
-        # В случае ошибки используем оригинальную функцию
-        return original_get_product_details(article)
-    
-    # API URL для получения данных о товаре
-    api_url = f"https://card.wb.ru/cards/v2/detail?appType=1&curr=rub&dest=-6972066&spp=30&nm={article}"
-    
-    try:
-        # Выполняем запрос через прокси
-        logger.info(f"Запрос к {api_url} через прокси {PROXY_IP}:{PROXY_PORT}")
-        response = scraper.get(api_url, headers=headers, timeout=15)
-        
-        if response.status_code == 200:
-            logger.info(f"Успешно получены данные через прокси для артикула {article}")
-            # Успешный ответ через прокси, используем оригинальную функцию для парсинга
-            # Данные уже должны быть в кеше
-            return original_get_product_details(article)
-        else:
-            logger.warning(f"Ошибка при запросе через прокси: HTTP {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.warning(f"Ошибка при запросе через прокси: {str(e)}")
-    
-    # Если запрос через прокси не удался, пробуем без прокси
-    logger.info(f"Запрос к {api_url} без прокси (fallback)")
-    try:
-        # Убираем прокси для fallback запроса
-        scraper.proxies = None
-        response = scraper.get(api_url, headers=headers, timeout=15)
-        
-        if response.status_code == 200:
-            logger.info(f"Успешно получены данные без прокси для артикула {article}")
-            # Успешный ответ без прокси, используем оригинальную функцию для парсинга
-            return original_get_product_details(article)
-        else:
-            logger.warning(f"Ошибка при запросе без прокси: HTTP {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.warning(f"Ошибка при запросе без прокси: {str(e)}")
-    
-    # Если оба запроса не удались, используем оригинальную функцию
-    return original_get_product_details(article)
-    
 def search_with_proxy(url, headers=None, timeout=10):
     """
     Выполняет поисковый запрос с использованием прокси и fallback
@@ -3537,35 +1921,9 @@ def search_with_proxy(url, headers=None, timeout=10):
             "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
         }
         
-    # Создаем сессию
-    session = requests.Session()
-    session.headers.update(headers)
-    
-    # Добавляем прокси, если включен
-    if PROXY_ENABLED:
-        logger.info(f"Настройка прокси {PROXY_IP}:{PROXY_PORT} для запроса")
-        session.proxies = PROXIES
-    
-    try:
-        # Попытка с прокси (если включен)
-        logger.info(f"Выполняю запрос к {url}" + 
-                  (f" через прокси {PROXY_IP}:{PROXY_PORT}" if PROXY_ENABLED and session.proxies else ""))
-        
-        response = session.get(url, timeout=timeout)
-        response.raise_for_status()
-        return response
-    except requests.exceptions.RequestException as e:
-        logger.warning(f"Ошибка при запросе через прокси: {str(e)}")
-        
-        # Если прокси включен и возникла ошибка, пробуем без прокси
-        if PROXY_ENABLED and session.proxies:
-            logger.info(f"Пробую запрос к {url} без прокси (fallback)")
-            session.proxies = None
-            
-            # Повторный запрос без прокси
-            response = session.get(url, timeout=timeout)
-            response.raise_for_status()
-            return response
-        # Если прокси не использовался или ошибка в fallback, пробрасываем исключение
-        raise
+    # Прокси выбирается из пула, при ошибках - другой прокси, затем запрос напрямую
+    logger.info(f"Выполняю запрос к {url}")
+    response = request_sync("GET", url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response
     
\ No newline at end of file
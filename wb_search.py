@@ -4,8 +4,15 @@ import json
 import re
 import random
 import time
+import asyncio
 from typing import List, Dict, Any, Optional, Union
 
+import aiohttp
+
+from http_client import get_http_client, request_sync
+from single_flight import SingleFlight, ThreadSingleFlight
+from product import Product
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -17,6 +24,9 @@ logger = logging.getLogger(__name__)
 MAX_RETRIES = 3
 DEFAULT_RESULTS_COUNT = 4
 
+THROTTLE_BACKOFF_MIN = 1.0  # Пауза после 429 на первой попытке, секунды (удваивается с каждой попыткой)
+THROTTLE_BACKOFF_MAX = 3.0
+
 # Список User-Agent для рандомизации
 USER_AGENTS = [
     # Chrome на Windows
@@ -45,25 +55,21 @@ def get_random_user_agent() -> str:
     """
     return random.choice(USER_AGENTS)
 
-def search_products(query: str, page: int = 1, results_count: int = DEFAULT_RESULTS_COUNT, 
-                    use_proxy: bool = False, proxy_list: List[str] = None) -> List[Dict[str, Any]]:
+# URL API поиска
+SEARCH_URL = "https://search.wb.ru/exactmatch/ru/common/v9/search"
+
+def build_search_params(query: str, page: int = 1) -> Dict[str, Any]:
     """
-    Поиск товаров на Wildberries
+    Формирует параметры запроса к API поиска
     
     Args:
         query: Поисковый запрос
         page: Номер страницы результатов (начиная с 1)
-        results_count: Количество результатов, которые надо вернуть
-        use_proxy: Использовать ли прокси для запроса
-        proxy_list: Список прокси для использования (если use_proxy=True)
         
     Returns:
-        List[Dict]: Список словарей с данными о товарах
+        Dict: Параметры запроса
     """
-    logger.info(f"Поиск товаров по запросу: '{query}', страница {page}")
-    
-    # Параметры запроса к API
-    params = {
+    return {
         "ab_testing": "false",
         "appType": "1",
         "curr": "rub",
@@ -77,12 +83,15 @@ def search_products(query: str, page: int = 1, results_count: int = DEFAULT_RESU
         "spp": "30",
         "suppressSpellcheck": "false"
     }
+
+def build_search_headers() -> Dict[str, str]:
+    """
+    Формирует заголовки запроса к API поиска с рандомным User-Agent
     
-    # URL API поиска
-    url = "https://search.wb.ru/exactmatch/ru/common/v9/search"
-    
-    # Заголовки запроса с рандомным User-Agent
-    headers = {
+    Returns:
+        Dict: Заголовки запроса
+    """
+    return {
         "User-Agent": get_random_user_agent(),
         "Accept": "application/json, text/plain, */*",
         "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
@@ -90,19 +99,100 @@ def search_products(query: str, page: int = 1, results_count: int = DEFAULT_RESU
         "Origin": "https://www.wildberries.ru",
         "Referer": "https://www.wildberries.ru/",
     }
+
+def parse_search_product(product: Dict[str, Any]) -> Product:
+    """
+    Преобразует товар из ответа API поиска в Product
     
-    # Список для хранения результатов
-    results = []
+    Карточки поиска нормализуются так же, как карточки card.wb.ru (см. Product.from_card):
+    цена из sizes[].price.product, затем salePriceU/priceU.
     
-    # Настройка прокси, если требуется
-    proxies = None
-    if use_proxy and proxy_list and len(proxy_list) > 0:
-        proxy = random.choice(proxy_list)
-        proxies = {
-            "http": proxy,
-            "https": proxy
-        }
-        logger.info(f"Используется прокси: {proxy}")
+    Args:
+        product: Товар из ответа API
+        
+    Returns:
+        Product: Данные о товаре
+    """
+    return Product.from_card(product)
+
+def parse_search_response(data: Dict[str, Any], query: str, results_count: int) -> Optional[List[Product]]:
+    """
+    Извлекает товары из JSON-ответа API поиска
+    
+    Args:
+        data: Разобранный JSON-ответ
+        query: Поисковый запрос (для логирования)
+        results_count: Количество результатов, которые надо вернуть
+        
+    Returns:
+        Optional[List[Product]]: Список товаров или None, если товаров в ответе нет
+    """
+    # Отладочное логирование структуры ответа (только первый товар)
+    if 'data' in data and 'products' in data['data'] and len(data['data']['products']) > 0:
+        first_product = data['data']['products'][0]
+        logger.debug(f"Структура первого товара: {json.dumps(first_product, ensure_ascii=False, indent=2)[:500]}...")
+    
+    # Проверяем наличие товаров в ответе
+    if 'data' in data and 'products' in data['data']:
+        results = [parse_search_product(product) for product in data['data']['products'][:results_count]]
+        logger.info(f"Найдено {len(results)} товаров по запросу '{query}'")
+        return results
+    
+    logger.warning(f"Нет товаров в ответе API для запроса: '{query}'")
+    return None
+
+# Одинаковые одновременные поисковые запросы выполняются один раз
+_search_flight = ThreadSingleFlight("search")
+_search_async_flight = SingleFlight("search")
+
+def throttle_backoff(attempt: int) -> float:
+    """
+    Возвращает паузу перед повтором после ответа 429
+    
+    Пауза случайная (чтобы повторы разных запросов не совпадали) и удваивается
+    с каждой попыткой.
+    
+    Args:
+        attempt: Номер неудачной попытки (с 0)
+        
+    Returns:
+        float: Пауза в секундах
+    """
+    return random.uniform(THROTTLE_BACKOFF_MIN, THROTTLE_BACKOFF_MAX) * 2 ** attempt
+
+def search_products(query: str, page: int = 1, results_count: int = DEFAULT_RESULTS_COUNT, 
+                    use_proxy: bool = False, proxy_list: List[str] = None) -> List[Product]:
+    """
+    Поиск товаров на Wildberries; одновременные вызовы с тем же запросом,
+    страницей и количеством результатов объединяются в один (см. _search_products)
+    """
+    return _search_flight.do(
+        (query, page, results_count),
+        lambda: _search_products(query, page, results_count, use_proxy, proxy_list)
+    )
+
+def _search_products(query: str, page: int = 1, results_count: int = DEFAULT_RESULTS_COUNT, 
+                     use_proxy: bool = False, proxy_list: List[str] = None) -> List[Product]:
+    """
+    Поиск товаров на Wildberries (синхронная версия для запуска из консоли)
+    
+    В обработчиках бота используйте search_products_async: эта функция
+    блокирует поток на время запроса и пауз между попытками.
+    
+    Args:
+        query: Поисковый запрос
+        page: Номер страницы результатов (начиная с 1)
+        results_count: Количество результатов, которые надо вернуть
+        use_proxy: Использовать ли прокси для запроса (из общего пула, см. http_client.request_sync)
+        proxy_list: Не используется, оставлен для совместимости: прокси выбираются из общего пула
+        
+    Returns:
+        List[Product]: Найденные товары
+    """
+    logger.info(f"Поиск товаров по запросу: '{query}', страница {page}")
+    
+    params = build_search_params(query, page)
+    headers = build_search_headers()
     
     try:
         # Делаем запрос с повторными попытками
@@ -111,12 +201,15 @@ def search_products(query: str, page: int = 1, results_count: int = DEFAULT_RESU
                 # При каждой попытке обновляем User-Agent
                 headers["User-Agent"] = get_random_user_agent()
                 
-                response = requests.get(
-                    url, 
-                    params=params, 
-                    headers=headers, 
-                    timeout=10,
-                    proxies=proxies
+                # Прокси из общего пула с запросом напрямую при ошибках; частоту запросов
+                # к search.wb.ru регулирует общий ограничитель
+                response = request_sync(
+                    "GET",
+                    SEARCH_URL,
+                    use_proxy=use_proxy,
+                    params=params,
+                    headers=headers,
+                    timeout=10
                 )
                 
                 # Явно устанавливаем кодировку
@@ -124,117 +217,17 @@ def search_products(query: str, page: int = 1, results_count: int = DEFAULT_RESU
                 
                 # Проверяем успешность запроса
                 if response.status_code == 200:
-                    # Парсим JSON-ответ
-                    data = response.json()
-                    
-                    # Отладочное логирование структуры ответа (только первый товар)
-                    if 'data' in data and 'products' in data['data'] and len(data['data']['products']) > 0:
-                        first_product = data['data']['products'][0]
-                        logger.debug(f"Структура первого товара: {json.dumps(first_product, ensure_ascii=False, indent=2)[:500]}...")
-                    
-                    # Проверяем наличие товаров в ответе
-                    if 'data' in data and 'products' in data['data']:
-                        products = data['data']['products']
-                        
-                        # Обрабатываем каждый товар
-                        for product in products[:results_count]:
-                            product_id = product.get('id')
-                            
-                            # Улучшенный алгоритм получения цены с учетом структуры из Parsing.ini
-                            price = 0
-                            
-                            # 1. Проверяем цену внутри sizes->price->product (согласно Parsing.ini)
-                            if 'sizes' in product and product['sizes'] and len(product['sizes']) > 0:
-                                for size in product['sizes']:
-                                    if 'price' in size and 'product' in size['price']:
-                                        size_price = size['price']['product']
-                                        if isinstance(size_price, (int, float)) and size_price > 0:
-                                            # Цена обычно хранится в копейках
-                                            price = float(size_price) / 100
-                                            break
-                            
-                            # 2. Если цену не нашли, ищем в других полях
-                            if price <= 0:
-                                price_fields = [
-                                    ('salePriceU', 100),  # Основное поле с ценой со скидкой в копейках
-                                    ('priceU', 100),      # Основное поле с ценой в копейках
-                                    ('salePrice', 1),     # Цена со скидкой в рублях
-                                    ('price', 1)          # Цена в рублях
-                                ]
-                                
-                                # Проверяем основные поля цены
-                                for field, divisor in price_fields:
-                                    if field in product and product[field] and isinstance(product[field], (int, float)) and product[field] > 0:
-                                        price = float(product[field]) / divisor
-                                        if price > 10:  # Минимальная проверка на реалистичность цены
-                                            break
-                                
-                                # Проверяем вложенные структуры, если цена еще не найдена или нереалистична
-                                if price <= 10:
-                                    # Проверяем в extended
-                                    if 'extended' in product and product['extended']:
-                                        for field, divisor in price_fields:
-                                            if field in product['extended'] and product['extended'][field] and isinstance(product['extended'][field], (int, float)) and product['extended'][field] > 0:
-                                                price = float(product['extended'][field]) / divisor
-                                                if price > 10:
-                                                    break
-                                    
-                                    # Проверяем в sale
-                                    if price <= 10 and 'sale' in product and product['sale']:
-                                        for field, divisor in price_fields:
-                                            if field in product['sale'] and product['sale'][field] and isinstance(product['sale'][field], (int, float)) and product['sale'][field] > 0:
-                                                price = float(product['sale'][field]) / divisor
-                                                if price > 10:
-                                                    break
-                            
-                            # Улучшенное получение рейтинга
-                            rating = 0
-                            if 'reviewRating' in product and product['reviewRating'] and isinstance(product['reviewRating'], (int, float)):
-                                rating = float(product['reviewRating'])
-                            elif 'rating' in product and product['rating'] and isinstance(product['rating'], (int, float)):
-                                rating = float(product['rating'])
-                                
-                            # Более надежное получение отзывов
-                            feedbacks = 0
-                            feedback_fields = ['feedbacks', 'feedbackCount', 'reviewCount', 'totalReviews']
-                            for field in feedback_fields:
-                                if field in product and product[field] and isinstance(product[field], (int, float)):
-                                    feedbacks = int(product[field])
-                                    break
-                            
-                            # Формируем данные о товаре с улучшенной обработкой пустых полей
-                            product_data = {
-                                'id': product_id,
-                                'name': product.get('name', 'Товар без названия'),
-                                'price': price,
-                                'brand': product.get('brand', 'Бренд не указан'),
-                                'rating': rating,
-                                'feedbacks': feedbacks,
-                                'url': f"https://www.wildberries.ru/catalog/{product_id}/detail.aspx",
-                                'pic_url': get_product_image_url(product)
-                            }
-                            
-                            results.append(product_data)
-                        
-                        logger.info(f"Найдено {len(results)} товаров по запросу '{query}'")
-                        
-                        # Добавляем случайную задержку от 0.5 до 2 секунд
-                        delay = random.uniform(0.5, 2.0)
-                        logger.debug(f"Задержка после запроса: {delay:.2f} сек")
-                        time.sleep(delay)
-                        
-                        return results
-                    else:
-                        logger.warning(f"Нет товаров в ответе API для запроса: '{query}'")
+                    results = parse_search_response(response.json(), query, results_count)
+                    if results is None:
                         return []
+                    
+                    return results
                 
                 elif response.status_code == 429:
+                    # Ограничитель снижает скорость не чаще раза в секунду, поэтому повтор ждет паузу
                     logger.warning(f"Слишком много запросов (429). Попытка {attempt + 1}/{MAX_RETRIES}")
                     if attempt < MAX_RETRIES - 1:
-                        # Увеличиваем задержку с каждой попыткой (от 1 до 3 секунд)
-                        delay = 1 * (attempt + 1) + random.uniform(0, 2)
-                        logger.debug(f"Задержка перед повторной попыткой: {delay:.2f} сек")
-                        time.sleep(delay)
+                        time.sleep(throttle_backoff(attempt))
                     continue
                 
                 else:
@@ -261,18 +254,103 @@ def search_products(query: str, page: int = 1, results_count: int = DEFAULT_RESU
         logger.error(f"Непредвиденная ошибка при поиске товаров: {e}")
         return []
 
-def get_product_image_url(product: Dict[str, Any]) -> str:
+async def search_products_async(query: str, page: int = 1, results_count: int = DEFAULT_RESULTS_COUNT, 
+                                use_proxy: bool = True, proxy_list: List[str] = None) -> List[Product]:
+    """
+    Асинхронный поиск товаров; одновременные вызовы с тем же запросом,
+    страницей и количеством результатов объединяются в один (см. _search_products_async)
+    """
+    return await _search_async_flight.do(
+        (query, page, results_count),
+        lambda: _search_products_async(query, page, results_count, use_proxy, proxy_list)
+    )
+
+async def _search_products_async(query: str, page: int = 1, results_count: int = DEFAULT_RESULTS_COUNT, 
+                                 use_proxy: bool = True, proxy_list: List[str] = None) -> List[Product]:
+    """
+    Асинхронный поиск товаров на Wildberries
+    
+    Все паузы выполняются через asyncio.sleep, поэтому поиск одного пользователя
+    не блокирует обработку сообщений других. Отмена задачи (CancelledError)
+    не перехватывается и прерывает поиск на любом шаге, включая паузу перед повтором.
+    
+    Args:
+        query: Поисковый запрос
+        page: Номер страницы результатов (начиная с 1)
+        results_count: Количество результатов, которые надо вернуть
+        use_proxy: Использовать ли прокси для запроса
+        proxy_list: Список прокси (если не задан, используется прокси общего клиента)
+        
+    Returns:
+        List[Product]: Найденные товары
+    """
+    logger.info(f"Поиск товаров по запросу: '{query}', страница {page}")
+    
+    params = build_search_params(query, page)
+    client = get_http_client()
+    
+    # Явно выбранный прокси из списка, иначе прокси общего клиента
+    proxy = None
+    if use_proxy and proxy_list:
+        proxy = random.choice(proxy_list)
+        logger.info(f"Используется прокси: {proxy}")
+    
+    try:
+        for attempt in range(MAX_RETRIES):
+            is_last_attempt = attempt == MAX_RETRIES - 1
+            try:
+                response = await client.get(
+                    SEARCH_URL,
+                    params=params,
+                    headers=build_search_headers(),
+                    timeout=10,
+                    use_proxy=use_proxy,
+                    proxy=proxy
+                )
+                
+                if response.status == 200:
+                    results = parse_search_response(response.json(), query, results_count)
+                    return results or []
+                
+                if response.status == 429:
+                    # Ограничитель снижает скорость не чаще раза в секунду, поэтому повтор ждет паузу
+                    logger.warning(f"Слишком много запросов (429). Попытка {attempt + 1}/{MAX_RETRIES}")
+                    if not is_last_attempt:
+                        await asyncio.sleep(throttle_backoff(attempt))
+                    continue
+                
+                logger.error(f"Ошибка API: HTTP {response.status} для запроса: '{query}'")
+            
+            except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+                logger.error(f"Ошибка при запросе к API: {e}")
+            
+            if is_last_attempt:
+                return []
+            # Задержка перед повторной попыткой
+            await asyncio.sleep(random.uniform(1, 3))
+        
+        # Если все попытки неудачны
+        logger.error(f"Исчерпаны все попытки запроса для '{query}'")
+        return []
+    
+    except asyncio.CancelledError:
+        logger.info(f"Поиск по запросу '{query}' отменен")
+        raise
+    except Exception as e:
+        logger.error(f"Непредвиденная ошибка при поиске товаров: {e}")
+        return []
+
+def get_product_image_url(product_id: Union[str, int]) -> str:
     """
     Формирует URL изображения товара
     
     Args:
-        product: Словарь с данными о товаре
+        product_id: Артикул товара
         
     Returns:
         str: URL изображения товара
     """
     try:
-        product_id = product.get('id')
         if not product_id:
             return ""
         
@@ -291,88 +369,81 @@ def get_product_image_url(product: Dict[str, Any]) -> str:
         logger.error(f"Ошибка при формировании URL изображения: {e}")
         return ""
 
+# Ключевые слова поискового намерения (порядок задает приоритет)
+SEARCH_KEYWORDS = [
+    # Русский
+    'найди', 'найти', 'поищи', 'поиск', 'ищу',
+    'покажи', 'хочу купить', 'хочу найти', 'где купить',
+    'подбери', 'посоветуй', 'подскажи', 'помоги найти',
+    # Английский
+    'find', 'search', 'looking for', 'show me',
+    'want to buy', 'where to buy', 'recommend', 'suggest'
+]
+
+# Начала шаблонов, после которых идет запрос (порядок задает приоритет)
+QUERY_PREFIXES = [
+    # Русские шаблоны
+    r'найди', r'поищи', r'найти', r'ищу', r'покажи',
+    r'хочу\s+купить', r'хочу\s+найти', r'где\s+купить',
+    r'подбери', r'посоветуй', r'подскажи', r'помоги\s+найти',
+    # Английские шаблоны
+    r'find', r'search\s+for', r'looking\s+for', r'show\s+me',
+    r'want\s+to\s+buy', r'where\s+to\s+buy', r'recommend',
+]
+QUERY_CHARS = r'[\w\s\d\-.,"\'«»]'
+
+# Наличие любого ключевого слова проверяется одним выражением
+SEARCH_KEYWORDS_RE = re.compile(r'\b(?:' + '|'.join(re.escape(keyword) for keyword in SEARCH_KEYWORDS) + r')\b')
+KEYWORD_PATTERNS = [re.compile(r'\b' + re.escape(keyword) + r'\b') for keyword in SEARCH_KEYWORDS]
+# Шаблоны проверяются по очереди: каждый начинается с литерала, и re ищет его
+# быстрым поиском подстроки, что дешевле одного выражения с альтернативами
+QUERY_PATTERNS = [re.compile(prefix + r'\s+(' + QUERY_CHARS + '+)') for prefix in QUERY_PREFIXES]
+TRAILING_PUNCTUATION_RE = re.compile(r'[.,!?:;]$')
+
 def extract_search_query(text: str) -> Optional[str]:
     """
     Извлекает поисковый запрос из текста пользователя
     
+    Текст переводится в нижний регистр один раз, все выражения собираются при импорте модуля.
+    
     Args:
         text: Текст сообщения пользователя
         
     Returns:
         Optional[str]: Поисковый запрос или None, если запрос не найден
     """
-    # Списки ключевых слов и фраз для разных языков
-    search_keywords = [
-        # Русский
-        r'найди', r'найти', r'поищи', r'поиск', r'ищу', 
-        r'покажи', r'хочу купить', r'хочу найти', r'где купить',
-        r'подбери', r'посоветуй', r'подскажи', r'помоги найти',
-        # Английский
-        r'find', r'search', r'looking for', r'show me', 
-        r'want to buy', r'where to buy', r'recommend', r'suggest'
-    ]
-    
-    # Шаблоны для извлечения запроса после ключевых слов
-    patterns = [
-        # Русские шаблоны
-        r'найди\s+([\w\s\d\-.,"\'«»]+)',
-        r'поищи\s+([\w\s\d\-.,"\'«»]+)',
-        r'найти\s+([\w\s\d\-.,"\'«»]+)',
-        r'ищу\s+([\w\s\d\-.,"\'«»]+)',
-        r'покажи\s+([\w\s\d\-.,"\'«»]+)',
-        r'хочу\s+купить\s+([\w\s\d\-.,"\'«»]+)',
-        r'хочу\s+найти\s+([\w\s\d\-.,"\'«»]+)',
-        r'где\s+купить\s+([\w\s\d\-.,"\'«»]+)',
-        r'подбери\s+([\w\s\d\-.,"\'«»]+)',
-        r'посоветуй\s+([\w\s\d\-.,"\'«»]+)',
-        r'подскажи\s+([\w\s\d\-.,"\'«»]+)',
-        r'помоги\s+найти\s+([\w\s\d\-.,"\'«»]+)',
-        # Английские шаблоны
-        r'find\s+([\w\s\d\-.,"\'«»]+)',
-        r'search\s+for\s+([\w\s\d\-.,"\'«»]+)',
-        r'looking\s+for\s+([\w\s\d\-.,"\'«»]+)',
-        r'show\s+me\s+([\w\s\d\-.,"\'«»]+)',
-        r'want\s+to\s+buy\s+([\w\s\d\-.,"\'«»]+)',
-        r'where\s+to\s+buy\s+([\w\s\d\-.,"\'«»]+)',
-        r'recommend\s+([\w\s\d\-.,"\'«»]+)',
-    ]
-    
-    # Проверяем наличие ключевых слов
-    has_search_keyword = False
-    for keyword in search_keywords:
-        if re.search(fr'\b{keyword}\b', text.lower()):
-            has_search_keyword = True
-            break
-    
-    # Если есть ключевое слово, пытаемся извлечь запрос
-    if has_search_keyword:
-        for pattern in patterns:
-            match = re.search(pattern, text.lower())
-            if match:
-                query = match.group(1).strip()
-                # Очищаем от знаков препинания в конце
-                query = re.sub(r'[.,!?:;]$', '', query)
-                return query
-    
-    # Если не нашли по шаблонам, но есть ключевое слово, пробуем простой алгоритм
-    if has_search_keyword:
-        for keyword in search_keywords:
-            parts = re.split(fr'\b{keyword}\b', text.lower(), maxsplit=1)
-            if len(parts) > 1 and parts[1].strip():
-                query = parts[1].strip()
+    lowered = text.lower()
+    
+    # Без ключевого слова поискового намерения нет
+    if not SEARCH_KEYWORDS_RE.search(lowered):
+        return None
+    
+    # Извлекаем запрос по первому подходящему шаблону
+    for pattern in QUERY_PATTERNS:
+        match = pattern.search(lowered)
+        if match:
+            query = match.group(1).strip()
+            # Очищаем от знаков препинания в конце
+            return TRAILING_PUNCTUATION_RE.sub('', query)
+    
+    # Если не нашли по шаблонам, берем текст после первого вхождения ключевого слова
+    for pattern in KEYWORD_PATTERNS:
+        match = pattern.search(lowered)
+        if match:
+            query = lowered[match.end():].strip()
+            if query:
                 # Очищаем от знаков препинания в конце
-                query = re.sub(r'[.,!?:;]$', '', query)
-                return query
+                return TRAILING_PUNCTUATION_RE.sub('', query)
     
     # Возвращаем None, если запрос не найден
     return None
 
-def format_search_results(results: List[Dict[str, Any]], include_images: bool = False) -> str:
+def format_search_results(results: List[Product], include_images: bool = False) -> str:
     """
     Форматирует результаты поиска для отображения в Telegram
     
     Args:
-        results: Список словарей с данными о товарах
+        results: Найденные товары
         include_images: Включать ли URL изображений в результат
         
     Returns:
@@ -384,12 +455,12 @@ def format_search_results(results: List[Dict[str, Any]], include_images: bool =
     formatted_text = "🔍 *Результаты поиска:*\n\n"
     
     for i, product in enumerate(results):
-        name = product.get('name', 'Название неизвестно')
-        price = product.get('price', 0)
-        brand = product.get('brand', 'Бренд неизвестен')
-        rating = product.get('rating', 0)
-        feedbacks = product.get('feedbacks', 0)
-        url = product.get('url', '')
+        name = product.name
+        price = product.price
+        brand = product.brand
+        rating = product.rating
+        feedbacks = product.feedbacks
+        url = product.url
         
         # Форматируем цену с улучшенной проверкой
         if price and price > 10:  # Проверка на реалистичность цены
@@ -423,7 +494,7 @@ def format_search_results(results: List[Dict[str, Any]], include_images: bool =
             rating_text = "⭐ Рейтинг: ☆☆☆☆☆ нет оценок\n"
         
         # Форматируем бренд с проверкой
-        brand_text = f"🏭 Бренд: {brand}\n" if brand and brand != 'Бренд не указан' else ""
+        brand_text = f"🏭 Бренд: {brand}\n" if brand else ""
         
         # Формируем сообщение для товара
         product_text = (
@@ -435,8 +506,9 @@ def format_search_results(results: List[Dict[str, Any]], include_images: bool =
         )
         
         # Добавляем URL изображения, если нужно
-        if include_images and product.get('pic_url'):
-            product_text += f"🖼 [Фото товара]({product.get('pic_url')})\n"
+        pic_url = get_product_image_url(product.article) if include_images else ""
+        if pic_url:
+            product_text += f"🖼 [Фото товара]({pic_url})\n"
         
         formatted_text += product_text + "\n"
     
@@ -465,17 +537,17 @@ if __name__ == "__main__":
         if results:
             first_product = results[0]
             print("\n📌 Детали первого найденного товара:")
-            print(f"ID: {first_product.get('id')}")
-            print(f"Название: {first_product.get('name')}")
-            print(f"Цена: {first_product.get('price')}")
-            print(f"Бренд: {first_product.get('brand')}")
-            print(f"Рейтинг: {first_product.get('rating')}")
-            print(f"Отзывы: {first_product.get('feedbacks')}")
-            print(f"URL: {first_product.get('url')}")
+            print(f"ID: {first_product.article}")
+            print(f"Название: {first_product.name}")
+            print(f"Цена: {first_product.price}")
+            print(f"Бренд: {first_product.brand}")
+            print(f"Рейтинг: {first_product.rating}")
+            print(f"Отзывы: {first_product.feedbacks}")
+            print(f"URL: {first_product.url}")
             
-            # Пытаемся вывести все доступные поля
+            # Выводим все поля товара
             print("\n🔍 Все поля первого товара:")
-            for key, value in first_product.items():
+            for key, value in first_product.to_dict().items():
                 print(f"{key}: {value}")
         
         # Выводим форматированные результаты
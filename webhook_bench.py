@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Измерение пропускной способности режима webhook без сети.
+
+Скрипт поднимает фейковый Telegram: локальный HTTP-сервер с методами Bot API
+(getMe, setWebhook, sendMessage), и webhook-сервер бота с простым обработчиком,
+который имитирует работу (случайная пауза около --handler-delay) и отвечает в чат.
+Фейковый Telegram отправляет обновления в webhook, считает время до получения всех
+ответов и проверяет, что ответы в каждый чат пришли в порядке отправки сообщений.
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+import itertools
+
+import aiohttp
+from aiohttp import web
+from telegram import Update
+from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters
+
+from webhook_server import WebhookServer, SECRET_HEADER
+from update_processor import ChatOrderedUpdateProcessor
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("webhook_bench")
+
+FAKE_TOKEN = "123456:fake-token"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class FakeTelegram:
+    """Локальный сервер с методами Bot API, нужными боту"""
+
+    def __init__(self):
+        self.sent = 0  # Сообщений, отправленных ботом
+        self.all_sent = asyncio.Event()
+        self.expected = 0
+        self.out_of_order = 0  # Ответов, пришедших в чат раньше ответа на предыдущее сообщение
+        self._last_reply = {}  # Номер последнего обновления, на которое ответили в чате
+        self._message_ids = itertools.count(1)
+        self._runner = None
+
+    async def start(self) -> int:
+        """Запускает сервер и возвращает его порт"""
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        return self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": BOT_USER})
+        if method == "sendMessage":
+            data = await request.post() if request.content_type != "application/json" else await request.json()
+            self.sent += 1
+            chat_id = int(data["chat_id"])
+            update_id = int(data.get("text", "").rsplit(" ", 1)[-1])
+            if update_id < self._last_reply.get(chat_id, 0):
+                self.out_of_order += 1
+            self._last_reply[chat_id] = update_id
+            if self.sent >= self.expected:
+                self.all_sent.set()
+            return web.json_response({"ok": True, "result": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": data.get("text", ""),
+            }})
+        return web.json_response({"ok": True, "result": True})
+
+
+def make_update(update_id: int, chats: int) -> dict:
+    """Создает обновление с текстовым сообщением от одного из chats пользователей"""
+    chat_id = 1000 + update_id % chats
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"},
+            "text": f"сообщение {update_id}",
+        },
+    }
+
+
+async def run_bench(args: argparse.Namespace) -> dict:
+    """
+    Выполняет измерение
+
+    Args:
+        args: Аргументы командной строки
+
+    Returns:
+        dict: Результаты измерения
+    """
+    telegram = FakeTelegram()
+    telegram.expected = args.updates
+    api_port = await telegram.start()
+
+    async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        # Разное время обработки: без очереди чата ответы перемешались бы
+        await asyncio.sleep(random.uniform(0.5, 1.5) * args.handler_delay)
+        await update.message.reply_text(update.message.text)
+
+    processor = ChatOrderedUpdateProcessor(args.concurrency, max_pending=args.queue_size)
+    application = (
+        ApplicationBuilder()
+        .token(FAKE_TOKEN)
+        .base_url(f"http://127.0.0.1:{api_port}/bot")
+        .concurrent_updates(processor)
+        .connection_pool_size(max(args.concurrency, 8))
+        .updater(None)
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, echo))
+
+    server = WebhookServer(application, path="/telegram", queue_size=args.queue_size)
+    await application.initialize()
+    await application.start()
+    port = await server.start("127.0.0.1", 0)
+    url = f"http://127.0.0.1:{port}/telegram"
+
+    retries = 0
+    pending = iter(range(1, args.updates + 1))
+
+    async def deliver(session: aiohttp.ClientSession) -> None:
+        # Как Telegram: одно соединение отправляет обновления по очереди и повторяет их при ошибке
+        nonlocal retries
+        for update_id in pending:
+            body = json.dumps(make_update(update_id, args.chats))
+            while True:
+                async with session.post(url, data=body, headers={SECRET_HEADER: server.secret,
+                                                                 "Content-Type": "application/json"}) as response:
+                    if response.status == 200:
+                        break
+                retries += 1
+                await asyncio.sleep(0.05)
+
+    started = time.monotonic()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.connections)) as session:
+        await asyncio.gather(*(deliver(session) for _ in range(args.connections)))
+        accepted = time.monotonic() - started
+
+        # Запрос с неверным секретом должен быть отклонен
+        async with session.post(url, data="{}", headers={SECRET_HEADER: "wrong"}) as response:
+            bad_secret_status = response.status
+
+    await asyncio.wait_for(telegram.all_sent.wait(), timeout=args.timeout)
+    elapsed = time.monotonic() - started
+
+    await server.stop()
+    stats = server.stats()
+    processor_stats = processor.stats()
+    await application.stop()
+    await application.shutdown()
+    await telegram.stop()
+
+    return {
+        "updates": args.updates,
+        "elapsed": elapsed,
+        "accepted_in": accepted,
+        "throughput": args.updates / elapsed,
+        "retries_503": retries,
+        "bad_secret_status": bad_secret_status,
+        "out_of_order": telegram.out_of_order,
+        "server": stats,
+        "processor": processor_stats,
+    }
+
+
+def parse_arguments():
+    """
+    Парсит аргументы командной строки
+
+    Returns:
+        Объект с аргументами командной строки
+    """
+    parser = argparse.ArgumentParser(description='Измерение пропускной способности webhook-сервера бота без сети')
+    parser.add_argument('--updates', type=int, default=2000, help='Количество обновлений')
+    parser.add_argument('--chats', type=int, default=200, help='Количество разных чатов')
+    parser.add_argument('--concurrency', type=int, default=32, help='Обновлений, обрабатываемых одновременно')
+    parser.add_argument('--queue-size', type=int, default=1000, help='Размер очереди обновлений')
+    parser.add_argument('--connections', type=int, default=40,
+                        help='Одновременных соединений фейкового Telegram (max_connections)')
+    parser.add_argument('--handler-delay', type=float, default=0.05,
+                        help='Имитация работы обработчика в секундах')
+    parser.add_argument('--timeout', type=float, default=300, help='Максимальное время ожидания ответов')
+    return parser.parse_args()
+
+
+def main():
+    """
+    Основная функция программы
+    """
+    args = parse_arguments()
+    print(f"Обновлений: {args.updates}, чатов: {args.chats}, одновременно: {args.concurrency}, очередь: {args.queue_size}, "
+          f"соединений: {args.connections}, пауза обработчика: {args.handler_delay} сек")
+    result = asyncio.run(run_bench(args))
+    print(f"Обработано за {result['elapsed']:.2f} сек ({result['throughput']:.0f} обновлений/сек)")
+    print(f"Все обновления приняты за {result['accepted_in']:.2f} сек, повторов после 503: {result['retries_503']}")
+    print(f"Ответ на неверный секрет: HTTP {result['bad_secret_status']}")
+    print(f"Ответов не по порядку: {result['out_of_order']}")
+    print(f"Сервер: {result['server']}")
+    print(f"Обработчик обновлений: {result['processor']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Прием обновлений Telegram через webhook.
+
+Встроенный aiohttp-сервер принимает POST-запросы Telegram, проверяет секретный
+токен (заголовок X-Telegram-Bot-Api-Secret-Token) и передает обновления в
+update_processor приложения, который решает, сколько обновлений выполнять
+одновременно (см. update_processor). Принятых, но еще не обработанных обновлений
+может быть не больше WEBHOOK_QUEUE_SIZE. Если места нет дольше QUEUE_PUT_TIMEOUT,
+сервер отвечает 503, и Telegram повторяет доставку позже: при перегрузке
+обновления ждут у Telegram, а не в памяти бота.
+
+Режим включается переменной WEBHOOK_URL (публичный адрес бота, например
+https://bot.example.com); обновления принимаются по пути WEBHOOK_PATH.
+"""
+
+import os
+import hmac
+import signal
+import asyncio
+import logging
+import secrets
+from typing import Any, Dict, Optional, Set
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from metrics import MetricFamily, registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Если не задан, генерируется при запуске
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))  # Соединений Telegram к боту (1-100)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+QUEUE_PUT_TIMEOUT = 1.0  # Сколько ждать места в очереди, прежде чем ответить 503
+DRAIN_TIMEOUT = 10.0  # Сколько ждать обработки очереди при остановке
+
+
+class WebhookServer:
+    """
+    HTTP-сервер для приема обновлений с ограничением числа необработанных обновлений.
+
+    Каждое принятое обновление обрабатывается в отдельной задаче через
+    update_processor приложения. Задача не занимает обработчик, пока ждет очереди
+    своего чата, поэтому сообщения одного чата не задерживают остальные чаты.
+    """
+
+    def __init__(self, application: Application, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+                 queue_size: int = WEBHOOK_QUEUE_SIZE):
+        self.application = application
+        self.path = path
+        self.secret = secret or secrets.token_urlsafe(32)
+        self.queue_size = queue_size
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.received = 0  # Принято обновлений
+        self.rejected = 0  # Отклонено запросов с неверным секретом или телом
+        self.overloaded = 0  # Отвечено 503 из-за заполненной очереди
+        self.processed = 0  # Обработано обновлений
+
+    async def start(self, host: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT) -> int:
+        """
+        Запускает HTTP-сервер
+
+        Args:
+            host: Адрес для прослушивания
+            port: Порт (0 - любой свободный)
+
+        Returns:
+            int: Порт, на котором запущен сервер
+        """
+        self._slots = asyncio.Semaphore(self.queue_size)
+
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        # Адрес из публичного API AppRunner (порт 0 заменяется выбранным системой)
+        port = self._runner.addresses[0][1]
+        logger.info(f"Webhook-сервер запущен на {host}:{port}{self.path}, "
+                    f"очередь до {self.queue_size} обновлений")
+        return port
+
+    async def stop(self) -> None:
+        """Останавливает прием и дожидается обработки принятых обновлений"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=DRAIN_TIMEOUT)
+            if pending:
+                logger.warning(f"Не обработано обновлений при остановке: {len(pending)}")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        """Принимает обновление от Telegram"""
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.rejected += 1
+            return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except Exception as e:
+            self.rejected += 1
+            logger.warning(f"Некорректное обновление в webhook: {e}")
+            return web.Response(status=400)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), QUEUE_PUT_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Telegram повторит доставку: обновление не теряется
+            self.overloaded += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        self.received += 1
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update) -> None:
+        """Обрабатывает обновление и освобождает место в очереди"""
+        try:
+            await self.application.update_processor.process_update(update, self.application.process_update(update))
+            self.processed += 1
+        except Exception as e:
+            logger.error(f"Ошибка при обработке обновления из webhook: {e}", exc_info=True)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает размер очереди и счетчики обновлений"""
+        return {
+            "in_flight": len(self._tasks),
+            "received": self.received,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "overloaded": self.overloaded,
+        }
+
+
+def collect_webhook_metrics(server: WebhookServer) -> list:
+    """Возвращает метрики webhook-сервера для /metrics"""
+    stats = server.stats()
+    return [
+        MetricFamily(f"bot_webhook_{name}_total", "counter", documentation, (), [((), stats[name])])
+        for name, documentation in (("received", "Обновления, полученные через webhook"),
+                                    ("processed", "Обработанные обновления"),
+                                    ("rejected", "Запросы с неверным секретом или телом"),
+                                    ("overloaded", "Обновления, отклоненные из-за перегрузки (503)"))
+    ] + [MetricFamily("bot_webhook_in_flight", "gauge", "Обновления в обработке", (), [((), stats["in_flight"])])]
+
+
+async def run_webhook(application: Application, url: str = WEBHOOK_URL) -> None:
+    """
+    Запускает бота в режиме webhook и работает до SIGINT/SIGTERM
+
+    Выполняет те же шаги, что и Application.run_polling: initialize, post_init,
+    start, а при остановке - stop, post_stop, shutdown, post_shutdown.
+
+    Args:
+        application: Приложение с зарегистрированными обработчиками
+        url: Публичный адрес бота (без пути)
+    """
+    server = WebhookServer(application)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: остановка по KeyboardInterrupt
+            pass
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=url.rstrip("/") + server.path,
+            secret_token=server.secret,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+        await application.start()
+        await server.start()
+        metrics_registry.register_collector("webhook", lambda: collect_webhook_metrics(server))
+        try:
+            await stop_event.wait()
+        finally:
+            metrics_registry.unregister_collector("webhook")
+            logger.info(f"Остановка webhook-сервера: {server.stats()}")
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+    finally:
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)